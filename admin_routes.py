@@ -3,9 +3,14 @@ from functools import wraps
 from dotenv import load_dotenv
 from flask import (
     Blueprint, render_template, request, redirect, url_for,
-    session, flash, current_app
+    session, flash, current_app, jsonify
 )
 from models import db, Doctor
+import mail_queue
+import reminder_engine
+import call_reminders
+import temp_janitor
+from medibot import get_medibot
 
 # Use a hard-to-guess prefix for security
 admin_prefix = os.getenv('ADMIN_URL_PREFIX', '/admin')
@@ -72,6 +77,37 @@ def reject_doctor(doctor_id):
     flash(f'Application for Dr. {doctor_name} was rejected and deleted.', 'success')
     return redirect(url_for('admin.dashboard'))
 
+@admin.route('/metrics/mail')
+@admin_required
+def mail_metrics():
+    return jsonify(mail_queue.metrics())
+
+@admin.route('/metrics/reminders')
+@admin_required
+def reminder_metrics():
+    return jsonify(reminder_engine.metrics())
+
+@admin.route('/metrics/call-reminders')
+@admin_required
+def call_reminder_metrics():
+    return jsonify(call_reminders.metrics())
+
+@admin.route('/metrics/temp-uploads')
+@admin_required
+def temp_upload_metrics():
+    return jsonify(temp_janitor.metrics())
+
+@admin.route('/metrics/medibot')
+@admin_required
+def medibot_metrics():
+    return jsonify(get_medibot(current_app._get_current_object()).metrics())
+
+@admin.route('/metrics/ai-gateway')
+@admin_required
+def ai_gateway_metrics():
+    gateway = get_medibot(current_app._get_current_object()).gateway
+    return jsonify(gateway.metrics() if gateway else {})
+
 @admin.route('/logout')
 def logout():
     session.pop('admin_logged_in', None)
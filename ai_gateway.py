@@ -0,0 +1,211 @@
+""" Admission control for the upstream AI calls: per-session rate limits, bounded concurrency,
+hard timeouts and a circuit breaker, with fast rejections the routes turn into 429/503 responses.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Used when the AI_* / PROMPT_RATE_* settings are not configured
+DEFAULT_MAX_CONCURRENT = 8
+DEFAULT_QUEUE_TIMEOUT_SECONDS = 1.0
+DEFAULT_TIMEOUT_SECONDS = 30
+DEFAULT_RATE_PER_MINUTE = 6
+DEFAULT_BURST = 3
+DEFAULT_BREAKER_FAILURES = 5
+DEFAULT_BREAKER_RESET_SECONDS = 30
+# Retry-After when the model provider itself rate-limits us
+UPSTREAM_RETRY_AFTER_SECONDS = 10
+# Idle buckets are full again and can be dropped; checked once this many sessions are tracked
+MAX_IDLE_BUCKETS = 10000
+
+class GatewayRejected(Exception):
+    """ A prompt the gateway refused or gave up on; `status` and `retry_after` go into the HTTP response. """
+
+    def __init__(self, reason, status, retry_after=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.status = status
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """ `burst` prompts at once, refilled at `rate_per_second`. """
+
+    def __init__(self, rate_per_second, burst, now):
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.tokens = burst
+        # The caller's clock reading, so the first take() never sees negative elapsed time
+        self.updated = now
+
+    def take(self, now):
+        """ 0 if a token was taken, else the seconds until one is available. """
+        self.tokens = min(self.burst, self.tokens + max(now - self.updated, 0) * self.rate_per_second)
+        self.updated = max(now, self.updated)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate_per_second
+
+    def idle(self, now):
+        return self.tokens + (now - self.updated) * self.rate_per_second >= self.burst
+
+class CircuitBreaker:
+    """ Opens after `failure_threshold` consecutive upstream failures and rejects calls for `reset_seconds`;
+    then lets a single trial call through (half-open), which closes it again on success.
+    """
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == 'open':
+                remaining = self.opened_at + self.reset_seconds - time.monotonic()
+                if remaining > 0:
+                    raise GatewayRejected('circuit_open', 503, math.ceil(remaining))
+                self.state = 'half_open'
+            if self.state == 'half_open':
+                if self._trial_running:
+                    raise GatewayRejected('circuit_half_open', 503, 1)
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """ A trial call that ended without an upstream verdict (e.g. the client left) frees the slot. """
+        with self._lock:
+            self._trial_running = False
+
+# Errors that mean the provider itself is unhealthy; matched by class name anywhere in the error's hierarchy
+UPSTREAM_FAILURES = ('ResourceExhausted', 'TooManyRequests', 'DeadlineExceeded', 'Timeout', 'ReadTimeout', 'ConnectTimeout',
+                     'ConnectionError', 'ServerError', 'ServiceUnavailable', 'RetryError')
+
+def _is_upstream_failure(error):
+    """ Transport errors, timeouts, provider rate limits and 5xx answers; a bad request or a blocked answer is not. """
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if any(cls.__name__ in UPSTREAM_FAILURES for cls in type(error).__mro__):
+        return True
+    code = getattr(error, 'code', None)
+    return isinstance(code, int) and code >= 500
+
+def _upstream_rejection(error):
+    """ Upstream errors worth a specific status; matched by name so the gateway does not import the Google SDK. """
+    name = type(error).__name__
+    if name in ('ResourceExhausted', 'TooManyRequests'):
+        return GatewayRejected('upstream_rate_limited', 429, UPSTREAM_RETRY_AFTER_SECONDS)
+    if name in ('DeadlineExceeded', 'TimeoutError', 'Timeout', 'ReadTimeout'):
+        return GatewayRejected('upstream_timeout', 504)
+    return None
+
+class AIGateway:
+    """ Wraps every upstream AI call of this process. """
+
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT, queue_timeout_seconds=DEFAULT_QUEUE_TIMEOUT_SECONDS,
+                 timeout_seconds=DEFAULT_TIMEOUT_SECONDS, rate_per_minute=DEFAULT_RATE_PER_MINUTE, burst=DEFAULT_BURST,
+                 breaker_failures=DEFAULT_BREAKER_FAILURES, breaker_reset_seconds=DEFAULT_BREAKER_RESET_SECONDS):
+        self.max_concurrent = max_concurrent
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.timeout_seconds = timeout_seconds
+        self.rate_per_second = rate_per_minute / 60.0
+        self.burst = burst
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset_seconds)
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._active = 0
+        self._metrics = {'admitted': 0, 'rate_limited': 0, 'shed_busy': 0, 'circuit_rejected': 0,
+                         'upstream_calls': 0, 'upstream_failures': 0, 'upstream_rate_limited': 0,
+                         'upstream_timeouts': 0, 'request_errors': 0, 'peak_active': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._metrics[name] += 1
+
+    def check_rate(self, session_key):
+        """ Takes a token from the session's bucket, or raises a 429 rejection with the wait until the next one. """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(session_key)
+            if bucket is None:
+                if len(self._buckets) >= MAX_IDLE_BUCKETS:
+                    self._buckets = {key: b for key, b in self._buckets.items() if not b.idle(now)}
+                bucket = self._buckets[session_key] = TokenBucket(self.rate_per_second, self.burst, now)
+            wait = bucket.take(now)
+            self._metrics['rate_limited' if wait else 'admitted'] += 1
+        if wait:
+            raise GatewayRejected('rate_limited', 429, math.ceil(wait))
+
+    def request_options(self):
+        """ Per-call options for the Gemini SDK: its own deadline, so a hung call frees its slot. """
+        return {'timeout': self.timeout_seconds}
+
+    @contextmanager
+    def upstream(self):
+        """ Holds one of the process's upstream slots around a model call, guarded by the circuit breaker.
+
+        Sheds the call with 429 if no slot frees up within the queue timeout.
+        """
+        try:
+            self.breaker.before_call()
+        except GatewayRejected:
+            self._count('circuit_rejected')
+            raise
+        if not self._slots.acquire(timeout=self.queue_timeout_seconds):
+            self.breaker.release_trial()
+            self._count('shed_busy')
+            raise GatewayRejected('busy', 429, 1)
+        with self._lock:
+            self._active += 1
+            self._metrics['upstream_calls'] += 1
+            self._metrics['peak_active'] = max(self._metrics['peak_active'], self._active)
+        try:
+            yield
+        except GeneratorExit:
+            self.breaker.release_trial()
+            raise
+        except Exception as e:
+            if not _is_upstream_failure(e):
+                # The provider answered, so the breaker learns nothing; a half-open trial slot is freed
+                self.breaker.release_trial()
+                self._count('request_errors')
+                raise
+            self.breaker.record_failure()
+            self._count('upstream_failures')
+            rejection = _upstream_rejection(e)
+            if rejection is None:
+                raise
+            self._count('upstream_rate_limited' if rejection.status == 429 else 'upstream_timeouts')
+            raise rejection from e
+        else:
+            self.breaker.record_success()
+        finally:
+            with self._lock:
+                self._active -= 1
+            self._slots.release()
+
+    def metrics(self):
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot.update(active=self._active, max_concurrent=self.max_concurrent, tracked_sessions=len(self._buckets))
+        snapshot.update(circuit_state=self.breaker.state, consecutive_failures=self.breaker.failures)
+        return snapshot
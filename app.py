@@ -1,152 +1,140 @@
 import os
-import atexit
-import glob
-from flask import Flask, session, request, current_app
-from flask_socketio import SocketIO, emit, join_room, leave_room
+from flask import Flask
 from flask_migrate import Migrate
 from dotenv import load_dotenv
-from apscheduler.schedulers.background import BackgroundScheduler
 import os
 from dotenv import load_dotenv
  # make sure environment vars are loaded
 
 load_dotenv()
 
-from extensions import db, mail
-from models import Message
-from scheduler import send_call_reminders, send_medication_reminders
+from extensions import db, mail, socketio
+from scheduler import start_jobs
+from mail_queue import start_mail_dispatcher
+from temp_janitor import start_temp_janitor
+from call_presence import create_participant_store
+from offload import blocking_sqlite_creator
+from socket_events import register_socket_handlers
+from watermark import OUTPUT_FORMATS
 
-app = Flask(__name__)
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# --- App Configuration ---
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-app.config['GOOGLE_API_KEY'] = os.getenv('GOOGLE_API_KEY')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'caresync.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER')
-app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
-app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'True').lower() in ['true', 'on', '1']
-app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
-app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
-
-# --- Initialize Extensions ---
-db.init_app(app)
-mail.init_app(app)
-migrate = Migrate(app, db)
-socketio = SocketIO(app)
-
-# --- Import and Register Blueprints ---
-from auth_routes import auth as auth_blueprint
-from main_routes import main as main_blueprint
-from doctor_routes import doctors as doctor_blueprint
-from admin_routes import admin as admin_blueprint
-from messaging_routes import messaging as messaging_blueprint
-from video_call_routes import video_call as video_call_blueprint
-from blood_bank_routes import blood_bank as blood_bank_blueprint
-from prescription_routes import prescription as prescription_blueprint
-from reminder_routes import reminder as reminder_blueprint
-from history_routes import history as history_blueprint
-# ADDED: Import for the new dashboard blueprint
-from dashboard_routes import dashboard as dashboard_blueprint
-
-app.register_blueprint(auth_blueprint)
-app.register_blueprint(main_blueprint)
-app.register_blueprint(doctor_blueprint)
-app.register_blueprint(admin_blueprint)
-app.register_blueprint(messaging_blueprint)
-app.register_blueprint(video_call_blueprint)
-app.register_blueprint(blood_bank_blueprint)
-app.register_blueprint(prescription_blueprint)
-app.register_blueprint(reminder_blueprint)
-app.register_blueprint(history_blueprint)
-# ADDED: Register the new dashboard blueprint
-app.register_blueprint(dashboard_blueprint)
-
-# --- Socket.IO Event Handlers ---
-
-@socketio.on('join_call_room')
-def handle_join_call_room(data):
-    call_id = data.get('call_id')
-    if not call_id: return
-    room = f"call_{call_id}"
-    join_room(room)
-    clients_in_room = list(socketio.server.manager.get_participants(request.namespace, room))
-    if len(clients_in_room) == 2:
-        emit('peers_ready', {'initiator_sid': request.sid}, to=room)
-
-@socketio.on('webrtc_signal')
-def handle_webrtc_signal(data):
-    call_id = data.get('call_id')
-    if not call_id: return
-    room = f"call_{call_id}"
-    emit('webrtc_signal', {'from_sid': request.sid, 'payload': data.get('payload')}, to=room, include_self=False)
-
-@socketio.on('share_document')
-def handle_share_document(data):
-    call_id = data.get('call_id')
-    if not call_id: return
-    room = f"call_{call_id}"
-    emit('document_shared', {'urls': data.get('urls')}, to=room, include_self=False)
-
-@socketio.on('leave_call_room')
-def handle_leave_call_room(data):
-    call_id = data.get('call_id')
-    if not call_id: return
-    room = f"call_{call_id}"
-    leave_room(room)
-    emit('peer_left', {'sid': request.sid}, to=room)
-    with app.app_context():
-        clients_in_room = list(socketio.server.manager.get_participants(request.namespace, room))
-        if len(clients_in_room) == 0:
-            temp_folder = os.path.join(current_app.root_path, 'temp_uploads')
-            files_to_delete = glob.glob(os.path.join(temp_folder, f"call_{call_id}_*.png"))
-            for f in files_to_delete:
-                try:
-                    os.remove(f)
-                    print(f"--- CLEANUP: Deleted temporary file: {f} ---")
-                except OSError as e:
-                    print(f"--- ERROR: Failed to delete file {f}: {e} ---")
-
-@socketio.on('disconnect')
-def handle_disconnect():
-    pass
-
-@socketio.on('join_chat')
-def handle_join_chat(data):
-    conversation_id = data['conversation_id']
-    room = f"chat_{conversation_id}"
-    join_room(room)
-
-@socketio.on('send_message')
-def handle_send_message(data):
-    with app.app_context():
-        conversation_id = data['conversation_id']
-        text = data['text']
-        sender_type = data['sender_type']
-        room = f'chat_{conversation_id}'
-        new_message = Message(conversation_id=conversation_id, sender_type=sender_type, text=text)
-        db.session.add(new_message)
-        db.session.commit()
-        emit('new_message', { 'conversation_id': conversation_id, 'text': text, 'sender_type': sender_type, 'timestamp': new_message.timestamp.isoformat() }, to=room, include_self=False)
-
-# --- Scheduler Setup ---
-scheduler = BackgroundScheduler()
-
-def start_jobs(the_app):
-    # register jobs once
-    scheduler.add_job(send_call_reminders, "interval", seconds=60, args=[the_app])
-    scheduler.add_job(send_medication_reminders, "interval", seconds=60, args=[the_app])
-    scheduler.start()
-    atexit.register(lambda: scheduler.shutdown(wait=False))
+def create_app(async_mode=None):
+    """ Builds and configures the Flask app; `async_mode` selects the Socket.IO server (threading, eventlet, gevent). """
+    app = Flask(__name__)
+
+    # --- App Configuration ---
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+    app.config['GOOGLE_API_KEY'] = os.getenv('GOOGLE_API_KEY')
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'caresync.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER')
+    app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
+    app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'True').lower() in ['true', 'on', '1']
+    app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
+    app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
+    # Background outbox dispatcher: worker threads and emails sent per SMTP connection
+    app.config['MAIL_QUEUE_WORKERS'] = int(os.getenv('MAIL_QUEUE_WORKERS', 2))
+    app.config['MAIL_QUEUE_BATCH_SIZE'] = int(os.getenv('MAIL_QUEUE_BATCH_SIZE', 20))
+    # Minutes before a video call at which both sides get a reminder, e.g. "1440,60,1"
+    app.config['CALL_REMINDER_LEAD_MINUTES'] = [int(m) for m in os.getenv('CALL_REMINDER_LEAD_MINUTES', '1440,60,1').split(',') if m.strip()]
+    # Socket.IO client manager shared by all workers, e.g. redis://localhost:6379/0; unset = single process
+    app.config['SOCKETIO_MESSAGE_QUEUE'] = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+    # Processes watermarking documents shared in calls
+    app.config['DOCUMENT_WORKERS'] = int(os.getenv('DOCUMENT_WORKERS', os.cpu_count() or 2))
+    # Limits on shared documents; pages render one at a time at no more than DOCUMENT_RENDER_DPI
+    app.config['DOCUMENT_MAX_PAGES'] = int(os.getenv('DOCUMENT_MAX_PAGES', 30))
+    app.config['DOCUMENT_MAX_BYTES'] = int(os.getenv('DOCUMENT_MAX_BYTES', 25 * 1024 * 1024))
+    app.config['DOCUMENT_RENDER_DPI'] = int(os.getenv('DOCUMENT_RENDER_DPI', 150))
+    # Shared pages are sent as webp or jpeg at this quality, lowered until a page fits the byte budget
+    app.config['DOCUMENT_IMAGE_FORMAT'] = os.getenv('DOCUMENT_IMAGE_FORMAT', 'webp').lower()
+    if app.config['DOCUMENT_IMAGE_FORMAT'] not in OUTPUT_FORMATS:
+        raise RuntimeError(f"Unsupported DOCUMENT_IMAGE_FORMAT {app.config['DOCUMENT_IMAGE_FORMAT']!r}; use one of {', '.join(OUTPUT_FORMATS)}.")
+    app.config['DOCUMENT_IMAGE_QUALITY'] = int(os.getenv('DOCUMENT_IMAGE_QUALITY', 80))
+    app.config['DOCUMENT_PAGE_MAX_BYTES'] = int(os.getenv('DOCUMENT_PAGE_MAX_BYTES', 400 * 1024))
+    app.config['DOCUMENT_THUMBNAIL_SIZE'] = int(os.getenv('DOCUMENT_THUMBNAIL_SIZE', 320))
+    # Rendered pages never change under their random names, so clients may cache them this long
+    app.config['DOCUMENT_CACHE_SECONDS'] = int(os.getenv('DOCUMENT_CACHE_SECONDS', 3600))
+    # temp_uploads/ files are deleted this long after being written, or oldest first past the quota
+    app.config['TEMP_UPLOAD_TTL_SECONDS'] = int(os.getenv('TEMP_UPLOAD_TTL_SECONDS', 2 * 60 * 60))
+    app.config['TEMP_UPLOAD_QUOTA_BYTES'] = int(os.getenv('TEMP_UPLOAD_QUOTA_BYTES', 1024 * 1024 * 1024))
+    # MediBot answers to text prompts are reused for this long; PROMPT_CACHE_PERSISTENT also keeps them in the database
+    app.config['PROMPT_CACHE_TTL_SECONDS'] = int(os.getenv('PROMPT_CACHE_TTL_SECONDS', 6 * 60 * 60))
+    app.config['PROMPT_CACHE_MAX_ENTRIES'] = int(os.getenv('PROMPT_CACHE_MAX_ENTRIES', 1000))
+    app.config['PROMPT_CACHE_PERSISTENT'] = os.getenv('PROMPT_CACHE_PERSISTENT', 'False').lower() in ['true', 'on', '1']
+    # Upstream AI calls: concurrent calls per process, how long a prompt may wait for a slot before it is
+    # shed with 429, the model's own deadline, and the circuit breaker's failure count and cool-down
+    app.config['AI_MAX_CONCURRENT'] = int(os.getenv('AI_MAX_CONCURRENT', 8))
+    app.config['AI_QUEUE_TIMEOUT_SECONDS'] = float(os.getenv('AI_QUEUE_TIMEOUT_SECONDS', 1))
+    app.config['AI_TIMEOUT_SECONDS'] = float(os.getenv('AI_TIMEOUT_SECONDS', 30))
+    app.config['AI_BREAKER_FAILURES'] = int(os.getenv('AI_BREAKER_FAILURES', 5))
+    app.config['AI_BREAKER_RESET_SECONDS'] = int(os.getenv('AI_BREAKER_RESET_SECONDS', 30))
+    # MediBot prompts per user or doctor: a burst of PROMPT_BURST, refilled at PROMPT_RATE_PER_MINUTE
+    app.config['PROMPT_RATE_PER_MINUTE'] = float(os.getenv('PROMPT_RATE_PER_MINUTE', 6))
+    app.config['PROMPT_BURST'] = int(os.getenv('PROMPT_BURST', 3))
+    # Images attached to MediBot prompts are downsampled to this many pixels on the long side
+    app.config['PROMPT_IMAGE_MAX_DIMENSION'] = int(os.getenv('PROMPT_IMAGE_MAX_DIMENSION', 1536))
+    # threading for the dev server; serve.py sets eventlet or gevent
+    app.config['SOCKETIO_ASYNC_MODE'] = async_mode or os.getenv('SOCKETIO_ASYNC_MODE', 'threading')
+    if app.config['SOCKETIO_ASYNC_MODE'] in ('eventlet', 'gevent'):
+        # Monkeypatching cannot make the sqlite3 C extension cooperative; its calls run on native threads instead
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'creator': blocking_sqlite_creator(os.path.join(basedir, 'caresync.db'))}
+
+    # --- Initialize Extensions ---
+    db.init_app(app)
+    mail.init_app(app)
+    # Batch mode lets migrations alter SQLite tables (it rebuilds them behind the scenes)
+    Migrate(app, db, render_as_batch=True)
+    register_socket_handlers(socketio)
+    socketio.init_app(app, message_queue=app.config['SOCKETIO_MESSAGE_QUEUE'], async_mode=app.config['SOCKETIO_ASYNC_MODE'])
+    # Who is in each call room, visible to every worker when a message queue is configured
+    app.extensions['call_participants'] = create_participant_store(app.config['SOCKETIO_MESSAGE_QUEUE'])
+
+    # --- Import and Register Blueprints ---
+    from auth_routes import auth as auth_blueprint
+    from main_routes import main as main_blueprint
+    from doctor_routes import doctors as doctor_blueprint
+    from admin_routes import admin as admin_blueprint
+    from messaging_routes import messaging as messaging_blueprint
+    from video_call_routes import video_call as video_call_blueprint
+    from blood_bank_routes import blood_bank as blood_bank_blueprint
+    from prescription_routes import prescription as prescription_blueprint
+    from reminder_routes import reminder as reminder_blueprint
+    from history_routes import history as history_blueprint
+    # ADDED: Import for the new dashboard blueprint
+    from dashboard_routes import dashboard as dashboard_blueprint
+
+    app.register_blueprint(auth_blueprint)
+    app.register_blueprint(main_blueprint)
+    app.register_blueprint(doctor_blueprint)
+    app.register_blueprint(admin_blueprint)
+    app.register_blueprint(messaging_blueprint)
+    app.register_blueprint(video_call_blueprint)
+    app.register_blueprint(blood_bank_blueprint)
+    app.register_blueprint(prescription_blueprint)
+    app.register_blueprint(reminder_blueprint)
+    app.register_blueprint(history_blueprint)
+    # ADDED: Register the new dashboard blueprint
+    app.register_blueprint(dashboard_blueprint)
+
+    # `flask check-query-plans`: verifies the hot queries are served by indexes
+    from query_audit import check_query_plans_command
+    app.cli.add_command(check_query_plans_command)
+
+    return app
 
 if __name__ == '__main__':
     from dotenv import load_dotenv
     load_dotenv()  # load .env once at runtime
+    app = create_app()
 
-    # only start jobs in the reloader's main process
+    # only start jobs in the reloader's main process; set RUN_SCHEDULER=false when
+    # a standalone `python scheduler.py` process runs them instead
     if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
-        start_jobs(app)
+        if os.getenv('RUN_SCHEDULER', 'true').lower() == 'true':
+            start_jobs(app)
+        start_mail_dispatcher(app)
+        start_temp_janitor(app)
 
     certfile = os.getenv('SSL_CERTFILE')
     keyfile = os.getenv('SSL_KEYFILE')
@@ -0,0 +1,90 @@
+""" Compares the watermark renderer with the previous implementation: per-page latency and peak memory.
+
+    python bench_watermark.py --pages 20 --width 1654 --height 2339
+
+Each variant runs in a fresh process so peak RSS is not shared between them.
+The page size defaults to A4 rendered at 200 dpi.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from PIL import Image
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TEXT = "Viewed by Dr. Example Name 2026-01-01 12:00:00"
+
+def baseline_revision():
+    """ The last commit before the cached renderer, i.e. the parent of the commit that added watermark_mask(). """
+    commits = subprocess.run(['git', 'log', '--reverse', '--format=%H', '-S', 'def watermark_mask', '--', 'watermark.py'],
+                             cwd=HERE, check=True, capture_output=True, text=True).stdout.split()
+    if not commits:
+        sys.exit("Cannot find the cached renderer in git history; pass --baseline REV")
+    return commits[0] + '^'
+
+def export_baseline(revision, out_dir):
+    """ Writes watermark.py as of `revision` to `out_dir`, so the old renderer is imported rather than copied. """
+    source = subprocess.run(['git', 'show', f'{revision}:watermark.py'],
+                            cwd=HERE, check=True, capture_output=True, text=True).stdout
+    with open(os.path.join(out_dir, 'watermark.py'), 'w') as f:
+        f.write(source)
+
+def run_variant(variant, pages, width, height, baseline_dir=None):
+    """ Watermarks `pages` fresh pages in this process; returns timings and peak RSS. """
+    if variant == 'legacy':
+        # Shadow this checkout's watermark.py with the exported one
+        sys.path.insert(0, baseline_dir)
+    from watermark import apply_watermark
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    for _ in range(pages):
+        page = Image.new('RGB', (width, height), 'white')
+        started = time.perf_counter()
+        if variant == 'legacy':
+            # The old pipeline also flattened back to RGB before saving
+            apply_watermark(page, TEXT).convert('RGB')
+        else:
+            apply_watermark(page, TEXT)
+        timings.append(time.perf_counter() - started)
+    return {
+        'first_page_ms': timings[0] * 1000,
+        'mean_page_ms': sum(timings[1:] or timings) / len(timings[1:] or timings) * 1000,
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'base_rss_mb': base_rss / 1024,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--width', type=int, default=1654)
+    parser.add_argument('--height', type=int, default=2339)
+    parser.add_argument('--baseline', help="git revision of the previous renderer (default: the commit before the cached one)")
+    parser.add_argument('--variant', choices=['legacy', 'cached'], help=argparse.SUPPRESS)
+    parser.add_argument('--baseline-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.pages, args.width, args.height, args.baseline_dir)))
+        return
+
+    revision = args.baseline or baseline_revision()
+    print(f"{args.pages} pages of {args.width}x{args.height}, baseline {revision}")
+    print(f"{'renderer':<10}{'first page':>12}{'per page':>12}{'peak RSS':>12}")
+    with tempfile.TemporaryDirectory() as baseline_dir:
+        export_baseline(revision, baseline_dir)
+        for variant in ('legacy', 'cached'):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--variant', variant, '--baseline-dir', baseline_dir,
+                 '--pages', str(args.pages), '--width', str(args.width), '--height', str(args.height)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output)
+            print(f"{variant:<10}{result['first_page_ms']:>10.1f}ms{result['mean_page_ms']:>10.1f}ms{result['peak_rss_mb']:>10.1f}MB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+import threading
+from math import radians, cos, sin, asin, sqrt, floor
+from sqlalchemy import func
+from extensions import db
+from models import BloodBank
+
+try:
+    import numpy as np
+except ImportError: # NumPy is optional; fall back to the per-row haversine path
+    np = None
+
+# Cell size of the lat/lng grid in degrees (~55 km at the equator).
+CELL_DEG = 0.5
+KM_PER_DEG_LAT = 111.32
+EARTH_RADIUS_KM = 6371
+
+def haversine(lat1, lon1, lat2, lon2):
+    """ Calculate the distance between two points on Earth in kilometers. """
+    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+    c = 2 * asin(sqrt(a))
+    return c * EARTH_RADIUS_KM
+
+def _cell(lat, lng):
+    return (int(floor(lat / CELL_DEG)), int(floor(lng / CELL_DEG)))
+
+class BloodBankIndex:
+    """ Grid index over blood bank coordinates for nearest-neighbour lookups. """
+
+    def __init__(self, rows, version=None):
+        self.version = version
+        self.ids = []
+        self.lats = []
+        self.lngs = []
+        self.cells = {}
+        for bank_id, lat, lng in rows:
+            if lat is None or lng is None:
+                continue
+            pos = len(self.ids)
+            self.ids.append(bank_id)
+            self.lats.append(lat)
+            self.lngs.append(lng)
+            self.cells.setdefault(_cell(lat, lng), []).append(pos)
+        self.positions = {bank_id: pos for pos, bank_id in enumerate(self.ids)}
+        if np is not None:
+            # Columnar copy of the coordinates so a request is one vectorized pass.
+            self.id_col = np.array(self.ids, dtype=np.int64)
+            self.lat_col = np.radians(np.array(self.lats, dtype=np.float64))
+            self.lng_col = np.radians(np.array(self.lngs, dtype=np.float64))
+            self.cos_lat_col = np.cos(self.lat_col)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _distances(self, lat, lng, positions):
+        return [(self.ids[p], haversine(lat, lng, self.lats[p], self.lngs[p])) for p in positions]
+
+    def _distances_np(self, lat, lng, positions=None):
+        """ Distances from (lat, lng) to every bank at `positions` (all banks when None). """
+        lat_col, lng_col, cos_lat_col = self.lat_col, self.lng_col, self.cos_lat_col
+        if positions is not None:
+            positions = np.asarray(positions, dtype=np.intp)
+            lat_col, lng_col, cos_lat_col = lat_col[positions], lng_col[positions], cos_lat_col[positions]
+        lat, lng = radians(lat), radians(lng)
+        a = np.sin((lat_col - lat) / 2) ** 2 + cos(lat) * cos_lat_col * np.sin((lng_col - lng) / 2) ** 2
+        return positions, 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    def _top_np(self, lat, lng, k, positions=None):
+        """ The `k` closest of `positions`, using argpartition instead of a full sort. """
+        positions, dist = self._distances_np(lat, lng, positions)
+        if k < len(dist):
+            top = np.argpartition(dist, k - 1)[:k]
+        else:
+            top = np.arange(len(dist))
+        top = top[np.argsort(dist[top], kind='stable')]
+        ids = self.id_col if positions is None else self.id_col[positions]
+        return list(zip(ids[top].tolist(), dist[top].tolist()))
+
+    def _allowed_positions(self, allowed):
+        return [self.positions[i] for i in allowed if i in self.positions]
+
+    def _ring(self, center, ring):
+        """ Yields the cells on the square ring `ring` cells away from `center`. """
+        ci, cj = center
+        if ring == 0:
+            yield center
+            return
+        for dj in range(-ring, ring + 1):
+            yield (ci - ring, cj + dj)
+            yield (ci + ring, cj + dj)
+        for di in range(-ring + 1, ring):
+            yield (ci + di, cj - ring)
+            yield (ci + di, cj + ring)
+
+    def _ring_min_km(self, lat, ring):
+        """ Lower bound on the distance to anything outside the first `ring` rings. """
+        if ring == 0:
+            return 0.0
+        # Longitude degrees shrink towards the poles; use the narrowest row in reach.
+        edge_lat = min(abs(lat) + ring * CELL_DEG, 89.0)
+        km_per_deg_lng = KM_PER_DEG_LAT * cos(radians(edge_lat))
+        # Great circles cut slightly inside parallels, hence the small safety margin.
+        return 0.95 * (ring - 1) * CELL_DEG * min(KM_PER_DEG_LAT, km_per_deg_lng)
+
+    def within(self, lat, lng, radius_km, allowed=None):
+        """ All banks within `radius_km`, as (id, distance) sorted by distance. """
+        dlat = radius_km / KM_PER_DEG_LAT
+        dlng = radius_km / max(KM_PER_DEG_LAT * cos(radians(min(abs(lat) + dlat, 89.0))), 1e-6)
+        lat_lo, lng_lo = _cell(lat - dlat, lng - dlng)
+        lat_hi, lng_hi = _cell(lat + dlat, lng + dlng)
+        candidates = []
+        for i in range(lat_lo, lat_hi + 1):
+            for j in range(lng_lo, lng_hi + 1):
+                candidates.extend(self.cells.get((i, j), ()))
+        if allowed is not None:
+            candidates = [p for p in candidates if self.ids[p] in allowed]
+        if np is not None:
+            positions, dist = self._distances_np(lat, lng, candidates)
+            inside = dist <= radius_km
+            positions, dist = positions[inside], dist[inside]
+            order = np.argsort(dist, kind='stable')
+            return list(zip(self.id_col[positions[order]].tolist(), dist[order].tolist()))
+        results = [(bank_id, d) for bank_id, d in self._distances(lat, lng, candidates) if d <= radius_km]
+        results.sort(key=lambda x: x[1])
+        return results
+
+    def nearest(self, lat, lng, k, radius_km=None, allowed=None):
+        """ The `k` closest banks (optionally within `radius_km`), sorted by distance. """
+        if radius_km is not None:
+            return self.within(lat, lng, radius_km, allowed)[:k]
+        if not self.cells or k <= 0:
+            return []
+        center = _cell(lat, lng)
+        # Rings beyond this one cannot contain any indexed bank.
+        max_ring = max(max(abs(i - center[0]), abs(j - center[1])) for i, j in self.cells)
+        best = []
+        ring = 0
+        while ring <= max_ring:
+            positions = []
+            for cell in self._ring(center, ring):
+                positions.extend(self.cells.get(cell, ()))
+            if allowed is not None:
+                positions = [p for p in positions if self.ids[p] in allowed]
+            if positions:
+                # The grid picks the candidates; NumPy ranks each ring's batch in one pass when available.
+                best.extend(self._top_np(lat, lng, k, positions) if np is not None else self._distances(lat, lng, positions))
+                best.sort(key=lambda x: x[1])
+                best = best[:k]
+            # Stop once the k-th best is closer than anything in the next ring could be.
+            if len(best) >= k and best[-1][1] <= self._ring_min_km(lat, ring + 1):
+                break
+            ring += 1
+        return best
+
+    def rank(self, lat, lng, allowed=None):
+        """ Every indexed bank (optionally restricted to `allowed` ids) sorted by distance. """
+        positions = None if allowed is None else self._allowed_positions(allowed)
+        if np is not None:
+            return self._top_np(lat, lng, len(self.ids), positions)
+        if positions is None:
+            positions = range(len(self.ids))
+        results = self._distances(lat, lng, positions)
+        results.sort(key=lambda x: x[1])
+        return results
+
+# --- Process-wide index, rebuilt when the blood_bank table changes ---
+_index = None
+_index_lock = threading.Lock()
+
+def dataset_version():
+    """ Cheap signature of the blood_bank table used to detect reloads. """
+    count, max_id, last_update = db.session.query(
+        func.count(BloodBank.id), func.max(BloodBank.id), func.max(BloodBank.updated_at)
+    ).one()
+    return f"{count}-{max_id or 0}-{last_update.timestamp() if last_update else 0:.0f}"
+
+def get_index(version=None):
+    """ Returns the current index, rebuilding it if the table has changed. """
+    global _index
+    if version is None:
+        version = dataset_version()
+    if _index is not None and _index.version == version:
+        return _index
+    with _index_lock:
+        if _index is None or _index.version != version:
+            rows = db.session.query(BloodBank.id, BloodBank.latitude, BloodBank.longitude).all()
+            _index = BloodBankIndex(rows, version=version)
+    return _index
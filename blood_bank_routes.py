@@ -1,87 +1,154 @@
-from flask import Blueprint, render_template, session, redirect, url_for, request, jsonify
+import hashlib
+from flask import Blueprint, render_template, session, redirect, url_for, request, jsonify, make_response
 from models import BloodBank
-from sqlalchemy import func, or_
-from math import radians, cos, sin, asin, sqrt
+from sqlalchemy import or_
+from blood_bank_index import get_index, dataset_version
+from blood_bank_search import get_search_index
 
 blood_bank = Blueprint('blood_bank', __name__)
 
-def haversine(lat1, lon1, lat2, lon2):
-    """ Calculate the distance between two points on Earth in kilometers. """
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a))
-    r = 6371 # Radius of earth in kilometers.
-    return c * r
-
 @blood_bank.route('/blood-banks')
 def list_page():
     if 'user_id' not in session and 'doctor_id' not in session:
         return redirect(url_for('auth.login'))
     return render_template('blood_banks.html')
 
-# In blood_bank_routes.py
+# Every column exposed by the API; `distance` is added when a location is given.
+BANK_FIELDS = (
+    'id', 'name', 'state', 'district', 'city', 'address', 'pincode', 'contact_no',
+    'mobile', 'helpline', 'fax', 'email', 'website', 'nodal_officer',
+    'nodal_officer_contact', 'nodal_officer_mobile', 'nodal_officer_email',
+    'nodal_officer_qualification', 'category', 'blood_components_available',
+    'apheresis_available', 'service_time', 'license_no', 'license_obtain_date',
+    'renewal_date', 'latitude', 'longitude',
+)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Distance at which a search match's relevance is halved when ranking by location.
+DISTANCE_SCALE_KM = 25
+
+def _etag_for(version):
+    """ ETag for the current request, keyed on the dataset version and the query string. """
+    key = f"{version}|{request.path}|{request.query_string.decode('utf-8', 'replace')}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def _not_modified(etag):
+    if etag in request.if_none_match:
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+    return None
+
+def _cacheable(payload, etag):
+    response = jsonify(payload)
+    response.set_etag(etag)
+    # Always revalidate, but a matching ETag turns the reload into an empty 304.
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def _fetch_rows(columns, ids):
+    """ Selected columns for `ids`, returned in the same order as `ids`. """
+    if not ids:
+        return []
+    rows = {row.id: row for row in BloodBank.query.with_entities(*columns).filter(BloodBank.id.in_(ids))}
+    return [rows[bank_id] for bank_id in ids if bank_id in rows]
 
 @blood_bank.route('/api/blood-banks')
 def get_blood_banks():
     if 'user_id' not in session and 'doctor_id' not in session:
         return jsonify({"error": "Unauthorized"}), 401
 
-    search_term = request.args.get('search', '').lower()
     user_lat = request.args.get('lat', type=float)
     user_lng = request.args.get('lng', type=float)
-    
-    query = BloodBank.query
-
-    if search_term:
-        query = query.filter(or_(
-            func.lower(BloodBank.name).contains(search_term),
-            func.lower(BloodBank.city).contains(search_term),
-            func.lower(BloodBank.district).contains(search_term),
-            func.lower(BloodBank.state).contains(search_term)
-        ))
-
-    all_banks = query.all()
-    
+    if user_lat is not None and not -90 <= user_lat <= 90:
+        return jsonify({"error": "lat must be between -90 and 90"}), 400
+    if user_lng is not None and not -180 <= user_lng <= 180:
+        return jsonify({"error": "lng must be between -180 and 180"}), 400
+
+    # The importer runs in its own process, so the version is read from the table (one aggregate
+    # query per request); a matching ETag then skips the search, the ranking and the row loads.
+    version = dataset_version()
+    etag = _etag_for(version)
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+
+    search_term = request.args.get('search', '').strip()
+    # Optional nearest-neighbour limits, only meaningful together with lat/lng
+    radius_km = request.args.get('radius_km', type=float)
+    k = request.args.get('k', type=int)
+    has_location = user_lat is not None and user_lng is not None
+
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    cursor = request.args.get('cursor', '')
+    if cursor and not cursor.isdigit():
+        return jsonify({"error": "Invalid cursor"}), 400
+    cursor = int(cursor or 0)
+
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()] or list(BANK_FIELDS)
+    unknown = [f for f in fields if f not in BANK_FIELDS and f != 'distance']
+    if unknown:
+        return jsonify({"error": f"Unknown fields: {', '.join(unknown)}"}), 400
+    columns = [BloodBank.id] + [getattr(BloodBank, f) for f in fields if f not in ('id', 'distance')]
+
+    # Ranked search over name/city/district/state, tolerant of prefixes and typos
+    matches = get_search_index(version).search(search_term) if search_term else None
+
+    distances = {}
+    if has_location:
+        # Rank ids only; full rows are loaded for the requested page alone.
+        index = get_index(version)
+        allowed = set(matches) if matches is not None else None
+        if k or radius_km:
+            ranked = index.nearest(user_lat, user_lng, k or len(index), radius_km, allowed)
+        else:
+            ranked = index.rank(user_lat, user_lng, allowed)
+        distances = dict(ranked)
+        if matches:
+            # Blend text relevance with proximity so a close weak match can still beat a far strong one.
+            ranked.sort(key=lambda x: -matches[x[0]] / (1 + x[1] / DISTANCE_SCALE_KM))
+        ordered_ids = [bank_id for bank_id, _ in ranked]
+        if not (k or radius_km):
+            # Banks without coordinates still show up, after the ranked ones
+            if matches is not None:
+                ordered_ids.extend(sorted((i for i in matches if i not in index.positions), key=lambda i: (-matches[i], i)))
+            else:
+                unlocated = BloodBank.query.with_entities(BloodBank.id).filter(
+                    or_(BloodBank.latitude.is_(None), BloodBank.longitude.is_(None))
+                ).order_by(BloodBank.id)
+                ordered_ids.extend(bank_id for (bank_id,) in unlocated)
+    elif matches is not None:
+        ordered_ids = sorted(matches, key=lambda i: (-matches[i], i))
+
+    if has_location or matches is not None:
+        # The cursor is an offset into the ranked ids.
+        page = _fetch_rows(columns, ordered_ids[cursor:cursor + limit])
+        next_cursor = str(cursor + limit) if cursor + limit < len(ordered_ids) else None
+    else:
+        # Keyset pagination on the primary key; the cursor is the last id seen.
+        page = BloodBank.query.with_entities(*columns).filter(BloodBank.id > cursor).order_by(BloodBank.id).limit(limit + 1).all()
+        next_cursor = str(page[limit - 1].id) if len(page) > limit else None
+        page = page[:limit]
+
     results = []
-    for bank in all_banks:
-        # --- MODIFIED: Include all fields from the database ---
-        bank_data = {
-            'id': bank.id,
-            'name': bank.name,
-            'state': bank.state,
-            'district': bank.district,
-            'city': bank.city,
-            'address': bank.address,
-            'pincode': bank.pincode,
-            'contact_no': bank.contact_no,
-            'mobile': bank.mobile,
-            'helpline': bank.helpline,
-            'fax': bank.fax,
-            'email': bank.email,
-            'website': bank.website,
-            'nodal_officer': bank.nodal_officer,
-            'nodal_officer_contact': bank.nodal_officer_contact,
-            'nodal_officer_mobile': bank.nodal_officer_mobile,
-            'nodal_officer_email': bank.nodal_officer_email,
-            'nodal_officer_qualification': bank.nodal_officer_qualification,
-            'category': bank.category,
-            'blood_components_available': bank.blood_components_available,
-            'apheresis_available': bank.apheresis_available,
-            'service_time': bank.service_time,
-            'license_no': bank.license_no,
-            'license_obtain_date': bank.license_obtain_date,
-            'renewal_date': bank.renewal_date,
-            'latitude': bank.latitude,
-            'longitude': bank.longitude,
-            'distance': None
-        }
-        if user_lat and user_lng and bank.latitude and bank.longitude:
-            bank_data['distance'] = haversine(user_lat, user_lng, bank.latitude, bank.longitude)
+    for row in page:
+        bank_data = {f: getattr(row, f) for f in fields if f != 'distance'}
+        if 'distance' in fields:
+            bank_data['distance'] = distances.get(row.id)
         results.append(bank_data)
 
-    if user_lat and user_lng:
-        results.sort(key=lambda x: x['distance'] if x['distance'] is not None else float('inf'))
-    
-    return jsonify(results)
\ No newline at end of file
+    return _cacheable({'results': results, 'next_cursor': next_cursor}, etag)
+
+@blood_bank.route('/api/blood-banks/<int:bank_id>')
+def get_blood_bank(bank_id):
+    if 'user_id' not in session and 'doctor_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    etag = _etag_for(dataset_version())
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+
+    bank = BloodBank.query.get_or_404(bank_id)
+    return _cacheable({f: getattr(bank, f) for f in BANK_FIELDS}, etag)
@@ -0,0 +1,158 @@
+import re
+import threading
+from bisect import bisect_left
+from extensions import db
+from models import BloodBank
+from blood_bank_index import dataset_version
+
+# Searchable columns and how much a match in each one counts.
+FIELD_WEIGHTS = (('name', 1.0), ('city', 0.8), ('district', 0.7), ('state', 0.6))
+
+# How a query token matching a vocabulary token is scored.
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.9
+SUBSTRING_SCORE = 0.7
+FUZZY_SCORE = 0.6
+FUZZY_MIN_SIMILARITY = 0.45
+# Edit-distance fallback: terms this long allow one edit, and two from EDIT_TWO_MIN_LENGTH on.
+EDIT_MIN_LENGTH = 4
+EDIT_TWO_MIN_LENGTH = 8
+
+_token_re = re.compile(r"[a-z0-9]+")
+
+def tokenize(text):
+    return _token_re.findall(text.lower()) if text else []
+
+def trigrams(token, padded=True):
+    if padded:
+        token = f"${token}$"
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+def edit_distance(a, b, limit):
+    """ Edits (insert, delete, substitute, swap adjacent) turning a into b, or limit + 1 once it exceeds limit. """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+class BloodBankSearchIndex:
+    """ Token/prefix/trigram index over blood bank name, city, district and state. """
+
+    def __init__(self, rows, version=None):
+        self.version = version
+        # token -> {bank id: best field weight the token appears in}
+        self.postings = {}
+        for row in rows:
+            for field, weight in FIELD_WEIGHTS:
+                for token in tokenize(getattr(row, field)):
+                    docs = self.postings.setdefault(token, {})
+                    if docs.get(row.id, 0) < weight:
+                        docs[row.id] = weight
+        self.vocabulary = sorted(self.postings)
+        self.padded_grams = {}
+        self.plain_grams = {}
+        for token in self.vocabulary:
+            for gram in trigrams(token):
+                self.padded_grams.setdefault(gram, set()).add(token)
+            for gram in trigrams(token, padded=False):
+                self.plain_grams.setdefault(gram, set()).add(token)
+
+    def _prefix_matches(self, term):
+        i = bisect_left(self.vocabulary, term)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(term):
+            yield self.vocabulary[i]
+            i += 1
+
+    def _term_matches(self, term):
+        """ Vocabulary tokens matching one query term, with their match score. """
+        matches = {}
+        for token in self._prefix_matches(term):
+            matches[token] = EXACT_SCORE if token == term else PREFIX_SCORE
+        if len(term) < 3:
+            return matches
+
+        # Substring matches: every plain trigram of the term must occur in the token.
+        grams = trigrams(term, padded=False)
+        candidates = None
+        for gram in grams:
+            tokens = self.plain_grams.get(gram, set())
+            candidates = tokens if candidates is None else candidates & tokens
+            if not candidates:
+                break
+        for token in candidates or ():
+            if token not in matches and term in token:
+                matches[token] = SUBSTRING_SCORE
+
+        # Typo tolerance: Jaccard similarity of padded trigrams.
+        grams = trigrams(term)
+        shared = {}
+        for gram in grams:
+            for token in self.padded_grams.get(gram, ()):
+                shared[token] = shared.get(token, 0) + 1
+        for token, count in shared.items():
+            if token in matches:
+                continue
+            # A padded token of length n has n trigrams.
+            similarity = count / (len(grams) + len(token) - count)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                matches[token] = FUZZY_SCORE * similarity
+        if len(term) < EDIT_MIN_LENGTH:
+            return matches
+
+        # A swapped pair in a short word ("dehli", "pnue") leaves too few shared trigrams; fall back to
+        # edit distance against tokens sharing a trigram or the first letter.
+        limit = 2 if len(term) >= EDIT_TWO_MIN_LENGTH else 1
+        for token in set(shared).union(self._prefix_matches(term[0])):
+            if token in matches:
+                continue
+            distance = edit_distance(term, token, limit)
+            if distance <= limit:
+                matches[token] = FUZZY_SCORE * (1 - distance / len(term))
+        return matches
+
+    def search(self, text):
+        """ {bank id: score in (0, 1]} for banks matching every term of `text`. """
+        terms = list(dict.fromkeys(tokenize(text)))
+        if not terms:
+            return {}
+        scores = None
+        for term in terms:
+            term_scores = {}
+            for token, match_score in self._term_matches(term).items():
+                for bank_id, weight in self.postings[token].items():
+                    score = match_score * weight
+                    if term_scores.get(bank_id, 0) < score:
+                        term_scores[bank_id] = score
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {bank_id: s + term_scores[bank_id] for bank_id, s in scores.items() if bank_id in term_scores}
+            if not scores:
+                return {}
+        return {bank_id: s / len(terms) for bank_id, s in scores.items()}
+
+# --- Process-wide search index, rebuilt when the blood_bank table changes ---
+_index = None
+_index_lock = threading.Lock()
+
+def get_search_index(version=None):
+    """ Returns the current search index, rebuilding it if the table has changed. """
+    global _index
+    if version is None:
+        version = dataset_version()
+    if _index is not None and _index.version == version:
+        return _index
+    with _index_lock:
+        if _index is None or _index.version != version:
+            rows = db.session.query(BloodBank.id, BloodBank.name, BloodBank.city, BloodBank.district, BloodBank.state).all()
+            _index = BloodBankSearchIndex(rows, version=version)
+    return _index
@@ -0,0 +1,88 @@
+import threading
+
+try:
+    import redis
+except ImportError:  # Only needed when SOCKETIO_MESSAGE_QUEUE points at Redis
+    redis = None
+
+# Membership of an abandoned call is forgotten after this long in Redis.
+PRESENCE_TTL_SECONDS = 6 * 60 * 60
+
+class LocalParticipantStore:
+    """ In-process participant sets; correct only while a single worker serves all sockets. """
+
+    def __init__(self):
+        self._calls = {}
+        self._sids = {}
+        self._lock = threading.Lock()
+
+    def join(self, call_id, sid):
+        """ Adds `sid` to the call and returns how many participants it now has. """
+        with self._lock:
+            members = self._calls.setdefault(str(call_id), set())
+            members.add(sid)
+            self._sids.setdefault(sid, set()).add(str(call_id))
+            return len(members)
+
+    def leave(self, call_id, sid):
+        """ Removes `sid` from the call and returns how many participants remain. """
+        with self._lock:
+            members = self._calls.get(str(call_id), set())
+            members.discard(sid)
+            if not members:
+                self._calls.pop(str(call_id), None)
+            calls = self._sids.get(sid, set())
+            calls.discard(str(call_id))
+            if not calls:
+                self._sids.pop(sid, None)
+            return len(members)
+
+    def calls_of(self, sid):
+        with self._lock:
+            return list(self._sids.get(sid, ()))
+
+class RedisParticipantStore:
+    """ Participant sets kept in Redis so every worker sees the same call membership. """
+
+    def __init__(self, url, prefix='caresync:call'):
+        if redis is None:
+            raise RuntimeError("The 'redis' package is required when SOCKETIO_MESSAGE_QUEUE is a Redis URL.")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _call_key(self, call_id):
+        return f"{self.prefix}:{call_id}:participants"
+
+    def _sid_key(self, sid):
+        return f"{self.prefix}:sid:{sid}"
+
+    def join(self, call_id, sid):
+        # SADD and SCARD run in one MULTI, so two peers joining at once never both see a count of 1
+        pipe = self.client.pipeline()
+        pipe.sadd(self._call_key(call_id), sid)
+        pipe.expire(self._call_key(call_id), PRESENCE_TTL_SECONDS)
+        pipe.sadd(self._sid_key(sid), str(call_id))
+        pipe.expire(self._sid_key(sid), PRESENCE_TTL_SECONDS)
+        pipe.scard(self._call_key(call_id))
+        return pipe.execute()[-1]
+
+    def leave(self, call_id, sid):
+        pipe = self.client.pipeline()
+        pipe.srem(self._call_key(call_id), sid)
+        pipe.srem(self._sid_key(sid), str(call_id))
+        pipe.scard(self._call_key(call_id))
+        return pipe.execute()[-1]
+
+    def calls_of(self, sid):
+        return [call_id.decode() for call_id in self.client.smembers(self._sid_key(sid))]
+
+def create_participant_store(message_queue=None):
+    """ Matches the Socket.IO client manager: shared in Redis when the sockets are, local when there is one process.
+
+    Other message queues (e.g. amqp://) would leave each worker counting only its own sockets, so they are refused.
+    """
+    if not message_queue:
+        return LocalParticipantStore()
+    if message_queue.startswith(('redis://', 'rediss://')):
+        return RedisParticipantStore(message_queue)
+    raise RuntimeError(f"Call participants can only be shared through Redis; unsupported SOCKETIO_MESSAGE_QUEUE {message_queue!r}.")
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models import VideoCall, User, Doctor, JobCheckpoint
+from mail_queue import enqueue_mail
+from job_stats import record_conflict, run_values, snapshot
+
+# Lead times used when CALL_REMINDER_LEAD_MINUTES is not configured: a day, an hour and a minute before.
+DEFAULT_LEAD_MINUTES = (24 * 60, 60, 1)
+
+def _checkpoint_name(lead):
+    return f"call_reminder_{lead}m"
+
+def _describe_lead(lead):
+    if lead % (24 * 60) == 0:
+        count, unit = lead // (24 * 60), 'day'
+    elif lead % 60 == 0:
+        count, unit = lead // 60, 'hour'
+    else:
+        count, unit = lead, 'minute'
+    return f"{count} {unit}" if count == 1 else f"{count} {unit}s"
+
+def _send(call, user, doctor, lead):
+    starts_in = _describe_lead(lead)
+    subject = 'Reminder: Your Video Call is about to start!' if lead <= 5 else f"Reminder: Your Video Call starts in {starts_in}"
+    enqueue_mail(subject, [user.email],
+        f"Hello {user.full_name},\n\nThis is a reminder that your video call with Dr. {doctor.full_name} is starting in {starts_in}. The 'Join Call' button becomes active at the scheduled time.")
+    enqueue_mail(subject, [doctor.email],
+        f"Hello Dr. {doctor.full_name},\n\nThis is a reminder that your video call with {user.full_name} is starting in {starts_in}. The 'Join Call' button becomes active at the scheduled time.")
+
+def _load_checkpoints(leads, now):
+    """ Each lead's high-water mark; a lead seen for the first time starts from now rather than replaying history. """
+    names = {_checkpoint_name(lead): lead for lead in leads}
+    stored = {c.name: c.high_water for c in JobCheckpoint.query.filter(JobCheckpoint.name.in_(names))}
+    for name in names:
+        if name not in stored:
+            db.session.add(JobCheckpoint(name=name, high_water=now))
+            stored[name] = now
+    return {lead: stored[name] for name, lead in names.items()}
+
+def due_calls_query(leads, marks, now):
+    """ Approved calls, not yet started, with a reminder for any lead due in (its mark, now]; None if no window is open. """
+    windows = [
+        and_(VideoCall.scheduled_time > marks[lead] + timedelta(minutes=lead),
+             VideoCall.scheduled_time <= now + timedelta(minutes=lead))
+        for lead in leads if marks[lead] < now
+    ]
+    if not windows:
+        return None
+    return db.session.query(VideoCall, User, Doctor).join(
+        User, User.id == VideoCall.user_id
+    ).join(
+        Doctor, Doctor.id == VideoCall.doctor_id
+    ).filter(
+        VideoCall.status == 'Approved',
+        VideoCall.scheduled_time > now,
+        or_(*windows),
+    )
+
+def process_call_reminders(leads=DEFAULT_LEAD_MINUTES, interval_seconds=None):
+    """ Reminds both sides of every approved call whose reminder time for any lead fell in (high-water mark, now].
+
+    Calls that have already started are skipped. The marks advance in the same transaction that queues the
+    emails, so a delayed or crashed tick catches up on the next one without sending anything twice.
+    """
+    now = datetime.now()
+    try:
+        marks = _load_checkpoints(leads, now)
+        db.session.flush()
+    except IntegrityError:
+        # Another process created the checkpoints first; pick them up next tick.
+        db.session.rollback()
+        return 0
+    query = due_calls_query(leads, marks, now)
+    rows = query.all() if query is not None else []
+
+    sent_by_lead = {}
+    lateness_by_lead = {}
+    shortest = min(leads)
+    for call, user, doctor in rows:
+        for lead in leads:
+            due_at = call.scheduled_time - timedelta(minutes=lead)
+            if not (marks[lead] < due_at <= now):
+                continue
+            _send(call, user, doctor, lead)
+            if lead == shortest:
+                call.reminder_sent = True
+            sent_by_lead[lead] = sent_by_lead.get(lead, 0) + 1
+            lateness = (now - due_at).total_seconds()
+            lateness_by_lead[lead] = max(lateness_by_lead.get(lead, lateness), lateness)
+
+    # Compare-and-swap on the old mark: if another process advanced it meanwhile, drop this tick's work.
+    # The counters ride on the same UPDATE, so they commit exactly when the mark does.
+    for lead in leads:
+        # How far this tick ran from its intended spacing (GC pauses, slow jobs, restarts)
+        skew = (now - marks[lead]).total_seconds() - interval_seconds if interval_seconds and marks[lead] < now else None
+        advanced = db.session.execute(
+            update(JobCheckpoint)
+            .where(JobCheckpoint.name == _checkpoint_name(lead), JobCheckpoint.high_water == marks[lead])
+            .values(high_water=now, **run_values(sent_by_lead.get(lead, 0), lateness=lateness_by_lead.get(lead), skew=skew))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not advanced:
+            db.session.rollback()
+            record_conflict([_checkpoint_name(lead) for lead in leads])
+            return 0
+    db.session.commit()
+    return sum(sent_by_lead.values())
+
+def metrics():
+    """ Totals and per-lead counters from the checkpoint rows, the same whichever process serves the request. """
+    checkpoints = JobCheckpoint.query.filter(JobCheckpoint.name.like('call_reminder_%')).all()
+    latest = max(checkpoints, key=lambda c: c.high_water, default=None)
+    return {
+        'ticks': max((c.runs for c in checkpoints), default=0),
+        'sent': sum(c.sent for c in checkpoints),
+        'skipped_ticks': max((c.conflicts for c in checkpoints), default=0),
+        'last_tick': latest.high_water.isoformat() if latest else None,
+        'last_tick_skew_seconds': latest.last_skew_seconds if latest else None,
+        'max_lateness_seconds': max((c.max_lateness_seconds for c in checkpoints if c.max_lateness_seconds is not None),
+                                    default=None),
+        'leads': {c.name: snapshot(c) for c in checkpoints},
+    }
@@ -0,0 +1,150 @@
+import atexit
+import threading
+import time
+from collections import deque
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import OperationalError
+from extensions import db, socketio
+from models import Message
+
+FLUSH_INTERVAL_SECONDS = 0.05
+MAX_BATCH_SIZE = 200
+RETRY_DELAY_SECONDS = 1
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+def stored_messages_query(keys):
+    """ Stored messages in any of the keys' conversations with any of their client ids; callers keep the exact pairs. """
+    return select(Message.conversation_id, Message.client_id, Message.id).where(
+        Message.conversation_id.in_({conversation_id for conversation_id, client_id in keys}),
+        Message.client_id.in_({client_id for conversation_id, client_id in keys}))
+
+class ChatWriteBuffer:
+    """ Write-behind store for chat messages: handlers enqueue, one thread inserts in micro-batches.
+
+    A single flusher keeps insertion order, so message ids follow the order messages were received.
+    Each row is keyed by its conversation and client id, so a message the client resends before its
+    ack arrives is stored only once. Messages that cannot be stored are reported to their room with
+    a message_failed event.
+    """
+
+    def __init__(self, app, flush_interval=FLUSH_INTERVAL_SECONDS, max_batch=MAX_BATCH_SIZE):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='chat-write-buffer', daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        with self._lock:
+            self._pending.append(row)
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self._wake.set()
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        # Whatever arrived after the thread's last pass
+        self.flush()
+
+    def _take_batch(self):
+        with self._lock:
+            return [self._pending.popleft() for _ in range(min(len(self._pending), self.max_batch))]
+
+    def _requeue(self, batch):
+        with self._lock:
+            self._pending.extendleft(reversed(batch))
+
+    def _insert(self, rows):
+        db.session.execute(
+            insert(Message).on_conflict_do_nothing(index_elements=['conversation_id', 'client_id']), rows)
+
+    def _persist(self, batch):
+        """ Inserts the batch in one transaction and returns (conversation id, client id) -> message id. """
+        try:
+            self._insert(batch)
+            db.session.commit()
+        except Exception as e:
+            # One bad row (e.g. an unknown conversation) must not hold back the rest.
+            db.session.rollback()
+            self.app.logger.warning(f"Chat batch insert failed, retrying row by row: {e}")
+            for row in batch:
+                try:
+                    self._insert([row])
+                    db.session.commit()
+                except OperationalError:
+                    # The database itself is unavailable; the whole batch is retried later
+                    db.session.rollback()
+                    raise
+                except Exception as row_error:
+                    db.session.rollback()
+                    self.app.logger.error(f"Dropping chat message {row['client_id']}: {row_error}")
+        keys = {(row['conversation_id'], row['client_id']) for row in batch}
+        rows = db.session.execute(stored_messages_query(keys)).all()
+        return {(conversation_id, client_id): id for conversation_id, client_id, id in rows
+                if (conversation_id, client_id) in keys}
+
+    def flush(self):
+        """ Persists everything pending and acks each message to its room. Returns the number stored. """
+        return self._drain()[0]
+
+    def _drain(self):
+        """ Like flush, but returns (stored, reached_db); reached_db is False when a batch was put back for a retry. """
+        stored = 0
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return stored, True
+            try:
+                with self.app.app_context():
+                    ids = self._persist(batch)
+            except Exception as e:
+                self.app.logger.error(f"Chat write buffer could not reach the database: {e}", exc_info=True)
+                self._requeue(batch)
+                return stored, False
+            acks, failures = {}, {}
+            for row in batch:
+                key = (row['conversation_id'], row['client_id'])
+                if key in ids:
+                    acks.setdefault(row['conversation_id'], []).append({'client_id': row['client_id'], 'id': ids[key]})
+                else:
+                    failures.setdefault(row['conversation_id'], []).append(row['client_id'])
+            # One ack per room per batch: the sender stops resending, everyone learns the stored ids.
+            for conversation_id, persisted in acks.items():
+                socketio.emit('message_ack', {'conversation_id': conversation_id, 'messages': persisted},
+                              to=f"chat_{conversation_id}")
+            # Peers already got these through the relay; the sender stops resending and both sides mark them
+            for conversation_id, client_ids in failures.items():
+                socketio.emit('message_failed', {'conversation_id': conversation_id, 'client_ids': client_ids},
+                              to=f"chat_{conversation_id}")
+            stored += len(ids)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            # Back off only while the database is unreachable; a batch of rejected rows is no reason to wait
+            if not self._drain()[1]:
+                time.sleep(RETRY_DELAY_SECONDS)
+
+def get_chat_buffer(app):
+    """ The process-wide buffer, started on first use. """
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = ChatWriteBuffer(app)
+            _buffer.start()
+            atexit.register(_buffer.stop)
+    return _buffer
@@ -0,0 +1,57 @@
+import threading
+from collections import OrderedDict
+from sqlalchemy import event, inspect, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from extensions import db
+from models import Appointment, VideoCall, Prescription, PromptHistory, DashboardVersion
+
+# Dashboards kept per process; the least recently viewed is dropped first
+CACHE_MAX_USERS = 1000
+# Rows whose insert or delete changes the owner's dashboard; for updates only a status change matters
+TRACKED_MODELS = (Appointment, VideoCall, Prescription, PromptHistory)
+STATUS_MODELS = (Appointment, VideoCall)
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _changed_user_ids(session):
+    user_ids = set()
+    for obj in session.new | session.deleted:
+        if isinstance(obj, TRACKED_MODELS):
+            user_ids.add(obj.user_id)
+    for obj in session.dirty:
+        if isinstance(obj, STATUS_MODELS) and inspect(obj).attrs.status.history.has_changes():
+            user_ids.add(obj.user_id)
+    user_ids.discard(None)
+    return user_ids
+
+@event.listens_for(Session, 'after_flush')
+def _bump_dashboard_versions(session, flush_context):
+    # Runs inside the flush, so the bump commits or rolls back with the change itself, in every process.
+    # Only ORM unit-of-work writes flush: a bulk update()/delete() on a tracked model must bump the version itself
+    user_ids = _changed_user_ids(session)
+    if not user_ids:
+        return
+    bump = insert(DashboardVersion).values([{'user_id': user_id, 'version': 1} for user_id in user_ids])
+    session.connection().execute(bump.on_conflict_do_update(
+        index_elements=['user_id'], set_={'version': DashboardVersion.__table__.c.version + 1}))
+
+def dashboard_version(user_id):
+    return db.session.execute(select(DashboardVersion.version).where(DashboardVersion.user_id == user_id)).scalar() or 0
+
+def cached_dashboard(user_id, version):
+    """ This process's copy of the user's dashboard if it was built at `version`, else None. """
+    with _cache_lock:
+        entry = _cache.get(user_id)
+        if entry is None or entry[0] != version:
+            return None
+        _cache.move_to_end(user_id)
+        return entry[1]
+
+def store_dashboard(user_id, version, data):
+    with _cache_lock:
+        _cache[user_id] = (version, data)
+        _cache.move_to_end(user_id)
+        while len(_cache) > CACHE_MAX_USERS:
+            _cache.popitem(last=False)
@@ -1,7 +1,8 @@
-from flask import Blueprint, session, jsonify, abort, render_template, redirect, url_for
-from sqlalchemy import func
+from flask import Blueprint, session, jsonify, abort, render_template, redirect, url_for, request, Response
+from sqlalchemy import case, func, literal, select, union_all
 from extensions import db
 from models import User, Appointment, VideoCall, Prescription, PromptHistory
+from dashboard_cache import dashboard_version, cached_dashboard, store_dashboard
 
 # Create a new blueprint for the dashboard feature
 dashboard = Blueprint('dashboard', __name__)
@@ -16,77 +17,96 @@ def view_dashboard():
     user = User.query.get(session['user_id'])
     return render_template('dashboard.html', user=user)
 
-# API endpoint to fetch all data needed for the dashboard
-@dashboard.route('/api/dashboard-data')
-def get_dashboard_data():
-    """
-    Fetches and aggregates all health data for the logged-in user,
-    including KPIs, chart data, and AI prompt history.
-    """
-    if 'user_id' not in session:
-        abort(401) # Unauthorized
+# Part of the ETag, so a deploy that changes the payload's shape invalidates browser copies
+DASHBOARD_FORMAT = 1
+# Recent MediBot prompts shown on the dashboard
+PROMPT_HISTORY_LIMIT = 10
 
-    user_id = session['user_id']
+def dashboard_counts_query(user_id):
+    """ Every KPI and chart count of a user in one pass over their appointments, calls and prescriptions. """
+    rows = union_all(
+        select(literal('appointment').label('source'), Appointment.status.label('status')).where(Appointment.user_id == user_id),
+        select(literal('video_call'), VideoCall.status).where(VideoCall.user_id == user_id),
+        select(literal('prescription'), literal(None)).where(Prescription.user_id == user_id),
+    ).subquery()
+    is_appointment = rows.c.source == 'appointment'
+    is_call = rows.c.source == 'video_call'
 
-    # --- 1. Fetch Data for KPI Cards ---
-    total_appointments = Appointment.query.filter_by(user_id=user_id).count()
-    total_video_calls = VideoCall.query.filter_by(user_id=user_id).count()
-    # FIX: Define total_prescriptions as a local variable first
-    total_prescriptions = Prescription.query.filter_by(user_id=user_id).count()
+    def count_where(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
 
-    kpis = {
-        'totalAppointments': total_appointments,
-        'totalVideoCalls': total_video_calls,
-        'totalPrescriptions': total_prescriptions, # Now using the defined variable
-    }
+    return db.session.query(
+        count_where(is_appointment).label('appointments'),
+        count_where(is_call).label('video_calls'),
+        count_where(rows.c.source == 'prescription').label('prescriptions'),
+        count_where((is_appointment & rows.c.status.in_(['Confirmed', 'Approved'])) | (is_call & (rows.c.status == 'Approved'))).label('approved'),
+        count_where((is_appointment | is_call) & (rows.c.status == 'Pending')).label('pending'),
+        count_where((is_appointment & rows.c.status.in_(['Rejected', 'Cancelled'])) | (is_call & (rows.c.status == 'Rejected'))).label('rejected'),
+    ).select_from(rows)
 
-    # --- 2. Fetch Data for the Pie Chart ---
-    appointment_statuses = db.session.query(
-        Appointment.status, func.count(Appointment.status)
-    ).filter_by(user_id=user_id).group_by(Appointment.status).all()
+def prompt_history_query(user_id):
+    return db.session.query(
+        PromptHistory.prompt_text, PromptHistory.response_text, PromptHistory.image_url, PromptHistory.timestamp
+    ).filter_by(user_id=user_id).order_by(PromptHistory.timestamp.desc()).limit(PROMPT_HISTORY_LIMIT)
 
-    call_statuses = db.session.query(
-        VideoCall.status, func.count(VideoCall.status)
-    ).filter_by(user_id=user_id).group_by(VideoCall.status).all()
+def _build_dashboard_data(user_id):
+    counts = dashboard_counts_query(user_id).one()
 
-    chart_data = {
-        'Approved': 0,
-        'Pending': 0,
-        'Rejected/Cancelled': 0,
-        # FIX: Now correctly uses the defined local variable
-        'Prescriptions Issued': total_prescriptions
+    # --- 1. KPI Cards ---
+    kpis = {
+        'totalAppointments': counts.appointments,
+        'totalVideoCalls': counts.video_calls,
+        'totalPrescriptions': counts.prescriptions,
     }
 
-    for status, count in appointment_statuses:
-        if status in ['Confirmed', 'Approved']:
-            chart_data['Approved'] += count
-        elif status == 'Pending':
-            chart_data['Pending'] += count
-        elif status in ['Rejected', 'Cancelled']:
-            chart_data['Rejected/Cancelled'] += count
-            
-    for status, count in call_statuses:
-        if status == 'Approved':
-            chart_data['Approved'] += count
-        elif status == 'Pending':
-            chart_data['Pending'] += count
-        elif status == 'Rejected':
-            chart_data['Rejected/Cancelled'] += count
+    # --- 2. Pie Chart ---
+    chart_data = {
+        'Approved': counts.approved,
+        'Pending': counts.pending,
+        'Rejected/Cancelled': counts.rejected,
+        'Prescriptions Issued': counts.prescriptions
+    }
 
-    # --- 3. Fetch AI Prompt History ---
-    prompts = PromptHistory.query.filter_by(user_id=user_id).order_by(PromptHistory.timestamp.desc()).limit(10).all()
-    prompt_history = []
-    for p in prompts:
-        prompt_history.append({
-            'prompt': p.prompt_text,
-            'response': p.response_text,
-            'image_url': p.image_url,
-            'timestamp': p.timestamp.isoformat()
-        })
+    # --- 3. AI Prompt History ---
+    prompts = prompt_history_query(user_id).all()
+    prompt_history = [{
+        'prompt': prompt_text,
+        'response': response_text,
+        'image_url': image_url,
+        'timestamp': timestamp.isoformat()
+    } for prompt_text, response_text, image_url, timestamp in prompts]
 
-    # --- 4. Assemble and Return Final JSON Response ---
-    return jsonify({
+    return {
         'kpis': kpis,
         'chartData': chart_data,
         'promptHistory': prompt_history
-    })
\ No newline at end of file
+    }
+
+# API endpoint to fetch all data needed for the dashboard
+@dashboard.route('/api/dashboard-data')
+def get_dashboard_data():
+    """
+    Fetches and aggregates all health data for the logged-in user,
+    including KPIs, chart data, and AI prompt history.
+
+    The user's dashboard version keys both the per-process cache and the ETag, so a reload
+    with an unchanged dashboard costs one primary-key lookup and a 304.
+    """
+    if 'user_id' not in session:
+        abort(401) # Unauthorized
+
+    user_id = session['user_id']
+    version = dashboard_version(user_id)
+    etag = f"dashboard-{DASHBOARD_FORMAT}-{user_id}-{version}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        data = cached_dashboard(user_id, version)
+        if data is None:
+            data = _build_dashboard_data(user_id)
+            store_dashboard(user_id, version, data)
+        response = jsonify(data)
+    response.set_etag(etag)
+    # Private to the user, and revalidated on every load so changes show at once
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -8,6 +8,7 @@ from flask import (
 from sqlalchemy.exc import SQLAlchemyError
 # --- FIX: Import Notification model ---
 from models import db, Doctor, Appointment, User, Notification
+from notifications import push_notifications
 
 doctors = Blueprint('doctors', __name__)
 
@@ -51,14 +52,17 @@ def toggle_availability():
     })
 # --- END: New Route ---
 
+def doctor_appointments_query(doctor_id):
+    """ A doctor's appointments with their patients, soonest first (also checked by `flask check-query-plans`). """
+    return db.session.query(Appointment, User).join(User, Appointment.user_id == User.id).filter(Appointment.doctor_id == doctor_id).order_by(Appointment.appointment_datetime.asc())
+
 @doctors.route('/doctor/appointments')
 def view_appointments():
     if 'doctor_id' not in session:
         return redirect(url_for('auth.login'))
     
     doctor_id = session['doctor_id']
-    query = db.session.query(Appointment, User).join(User, Appointment.user_id == User.id).filter(Appointment.doctor_id == doctor_id).order_by(Appointment.appointment_datetime.asc())
-    all_appointments = query.all()
+    all_appointments = doctor_appointments_query(doctor_id).all()
     
     appointments_categorized = {
         'pending': [],
@@ -89,6 +93,7 @@ def update_appointment_status(appointment_id):
         return redirect(url_for('doctors.view_appointments'))
 
     action = request.form.get('action')
+    new_notification = None
     if action == 'confirm':
         appointment.status = 'Confirmed'
         flash('Appointment confirmed successfully!', 'success')
@@ -107,6 +112,8 @@ def update_appointment_status(appointment_id):
         # --- END: Create notification for user ---
     
     db.session.commit()
+    if new_notification:
+        push_notifications(new_notification)
     return redirect(url_for('doctors.view_appointments'))
 # --- START: Updated Doctor Details API ---
 @doctors.route('/doctor/<int:doctor_id>')
@@ -173,6 +180,7 @@ def book_appointment():
         # --- END: Create notification for doctor ---
 
         db.session.commit()
+        push_notifications(new_notification)
         return jsonify({'message': 'Appointment request submitted successfully!'}), 201
     except (ValueError, SQLAlchemyError):
         db.session.rollback()
@@ -0,0 +1,202 @@
+import atexit
+import json
+import os
+import queue
+import re
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from flask import current_app
+from pdf2image import pdfinfo_from_path
+from extensions import socketio
+from temp_janitor import expire_artifacts, track_artifacts
+from watermark import MAX_RENDER_DPI, render_dpi
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'watermark.py')
+# Finished jobs stay queryable this long
+FINISHED_JOB_TTL_SECONDS = 60 * 60
+# A worker that has not answered a page by then is killed and replaced
+PAGE_TIMEOUT_SECONDS = 120
+
+_pool = None
+_pool_lock = threading.Lock()
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+class DocumentWorkerPool:
+    """ Long-lived `python watermark.py` processes, each fed one page at a time over a pipe.
+
+    Plain subprocess pipes stay cooperative under eventlet/gevent monkeypatching, where
+    multiprocessing and ProcessPoolExecutor deadlock. One background task per process
+    takes pages from a shared queue, so pages run in parallel across cores.
+    """
+
+    def __init__(self, workers, page_timeout=PAGE_TIMEOUT_SECONDS):
+        self.workers = workers
+        self.page_timeout = page_timeout
+        self.tasks = queue.Queue()
+        self.processes = set()
+
+    def start(self):
+        for _ in range(self.workers):
+            socketio.start_background_task(self._run)
+
+    def submit(self, request, on_done):
+        """ Queues a render_page() call; `on_done(files, error)` runs with its reply when it finishes. """
+        self.tasks.put((request, on_done))
+
+    def stop(self):
+        for process in list(self.processes):
+            process.kill()
+
+    def _spawn(self):
+        process = subprocess.Popen([sys.executable, WORKER_SCRIPT], stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE, text=True, bufsize=1)
+        # readline() cannot time out, so a reader task hands the replies over a queue that can
+        process.replies = queue.Queue()
+        socketio.start_background_task(self._read_replies, process)
+        self.processes.add(process)
+        return process
+
+    @staticmethod
+    def _read_replies(process):
+        for line in iter(process.stdout.readline, ''):
+            process.replies.put(line)
+        process.replies.put('')
+
+    def _run(self):
+        process = None
+        while True:
+            request, on_done = self.tasks.get()
+            if process is None or process.poll() is not None:
+                process = self._spawn()
+            try:
+                process.stdin.write(json.dumps(request) + '\n')
+                process.stdin.flush()
+                try:
+                    line = process.replies.get(timeout=self.page_timeout)
+                except queue.Empty:
+                    raise RuntimeError(f"document worker gave no reply within {self.page_timeout}s")
+                if not line:
+                    raise RuntimeError("document worker exited")
+                reply = json.loads(line)
+            except Exception as e:
+                # Replace a crashed or wedged worker before the next page
+                process.kill()
+                process.wait()
+                self.processes.discard(process)
+                process = None
+                reply = {'error': str(e)}
+            try:
+                on_done(None if 'error' in reply else reply, reply.get('error'))
+            except Exception as e:
+                print(f"--- ERROR: Document job callback failed: {e} ---")
+
+def _get_pool(workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DocumentWorkerPool(workers)
+            _pool.start()
+            atexit.register(_pool.stop)
+    return _pool
+
+_PAGE_SIZE = re.compile(r'([\d.]+) x ([\d.]+) pts')
+
+def inspect_document(source_path, mimetype, dpi=MAX_RENDER_DPI):
+    """ Page count and the capped render DPI of a spooled upload, without rendering anything. """
+    if mimetype != 'application/pdf':
+        return 1, dpi
+    info = pdfinfo_from_path(source_path)
+    size = _PAGE_SIZE.match(info.get('Page size', ''))
+    page_size_pts = (float(size.group(1)), float(size.group(2))) if size else None
+    return info['Pages'], render_dpi(page_size_pts, dpi)
+
+class DocumentJob:
+    """ One shared document being watermarked page by page. """
+
+    def __init__(self, app, call_id, pages, source_path, out_dir, url_for_file, skip_sid):
+        self.app = app
+        self.id = uuid.uuid4().hex
+        self.call_id = call_id
+        self.pages = pages
+        self.source_path = source_path
+        self.out_dir = out_dir
+        self.url_for_file = url_for_file
+        self.skip_sid = skip_sid
+        self.urls = [None] * pages
+        self.thumbnails = [None] * pages
+        self.failed = []
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.finished_at is not None
+
+    def to_dict(self):
+        with self._lock:
+            return {'job_id': self.id, 'call_id': self.call_id, 'pages': self.pages, 'urls': list(self.urls),
+                    'thumbnails': list(self.thumbnails), 'failed': list(self.failed), 'done': self.done}
+
+    def page_finished(self, page_number, files, error):
+        """ Pool callback: pushes the page to the call room as soon as it is ready. """
+        event = {'job_id': self.id, 'page': page_number, 'pages': self.pages}
+        if error:
+            print(f"--- ERROR: Page {page_number} of document job {self.id} failed: {error} ---")
+            event.update(urls=[], thumbnails=[], error='Failed to process page')
+            with self._lock:
+                self.failed.append(page_number)
+        else:
+            # Hand the page to the temp upload janitor before anyone can see it
+            with self.app.app_context():
+                track_artifacts(self.out_dir, [files['filename'], files['thumbnail']], self.call_id,
+                                self.app.config.get('TEMP_UPLOAD_TTL_SECONDS'))
+            url, thumbnail = self.url_for_file(files['filename']), self.url_for_file(files['thumbnail'])
+            event.update(urls=[url], thumbnails=[thumbnail])
+            with self._lock:
+                self.urls[page_number - 1] = url
+                self.thumbnails[page_number - 1] = thumbnail
+        socketio.emit('document_shared', event, to=f"call_{self.call_id}", skip_sid=self.skip_sid)
+        with self._lock:
+            finished = sum(url is not None for url in self.urls) + len(self.failed) == self.pages
+            if finished:
+                self.finished_at = time.monotonic()
+        if finished:
+            # Every page is rendered; the spooled upload goes with the janitor's next run
+            with self.app.app_context():
+                expire_artifacts([os.path.basename(self.source_path)])
+
+def _forget_finished_jobs():
+    cutoff = time.monotonic() - FINISHED_JOB_TTL_SECONDS
+    with _jobs_lock:
+        for job_id in [job_id for job_id, job in _jobs.items() if job.done and job.finished_at < cutoff]:
+            del _jobs[job_id]
+
+def submit_document(call_id, source_path, mimetype, pages, dpi, watermark_base_text, out_dir, url_for_file, skip_sid=None, workers=None,
+                    output=None):
+    """ Queues every page of the spooled upload on the worker pool and returns the job immediately.
+
+    Pages are watermarked in parallel and each one is sent to the `call_<id>` room with
+    `document_shared` when it finishes, so the viewer sees the first page without waiting for the rest.
+    Each worker renders, stamps and writes one page before taking the next, so memory stays flat
+    whatever the page count. `output` holds render_page() encoding options (image_format, quality,
+    max_bytes, thumbnail_size).
+    """
+    _forget_finished_jobs()
+    job = DocumentJob(current_app._get_current_object(), call_id, pages, source_path, out_dir, url_for_file, skip_sid)
+    with _jobs_lock:
+        _jobs[job.id] = job
+    pool = _get_pool(workers or os.cpu_count() or 2)
+    for page_number in range(1, job.pages + 1):
+        request = {'source_path': source_path, 'mimetype': mimetype, 'page_number': page_number,
+                   'watermark_base_text': watermark_base_text, 'out_dir': out_dir, 'prefix': f"call_{call_id}",
+                   'dpi': dpi, **(output or {})}
+        pool.submit(request, lambda files, error, page_number=page_number: job.page_finished(page_number, files, error))
+    return job
+
+def get_job(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
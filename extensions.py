@@ -1,6 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_mail import Mail
+from flask_socketio import SocketIO
 
 # Create uninitialized extension objects
 db = SQLAlchemy()
-mail = Mail()
\ No newline at end of file
+mail = Mail()
+socketio = SocketIO()
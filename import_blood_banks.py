@@ -1,75 +1,195 @@
+import csv
 import json
-from app import app, db
+import os
+import re
+import sys
+from sqlalchemy import Table, Column, Index, MetaData, text
+from app import create_app
+from extensions import db
 from models import BloodBank
 
-def import_data_from_json():
-    json_file_path = 'static/data/bloodbanks-india.min.json'
+DEFAULT_SOURCE = 'static/data/bloodbanks-india.min.json'
+# The raw government CSV export is Windows-1252 encoded.
+CSV_ENCODING = 'cp1252'
+BATCH_SIZE = 500
+READ_CHUNK_SIZE = 64 * 1024
+_SEPARATORS = re.compile(r'[\s,]*')
 
-    with app.app_context():
-        # Clear the table to prevent duplicates on re-runs
-        db.session.query(BloodBank).delete()
-        db.session.commit()
-        print("Cleared existing blood bank data.")
-
-        with open(json_file_path, mode='r', encoding='utf-8') as json_file:
-            data = json.load(json_file)
-        
-        banks_to_add = []
-        print(f"Reading {len(data)} records from JSON file...")
-
-        for row in data:
-            # Safely get values, defaulting to None if key is missing or value is "N/A" or ""
-            def get_value(key):
-                val = row.get(key)
-                if val in ["N/A", ""]:
-                    return None
-                return val
+# Source column -> BloodBank column
+FIELD_MAP = (
+    ('Blood Bank Name', 'name'),
+    ('State', 'state'),
+    ('District', 'district'),
+    ('City', 'city'),
+    ('Address', 'address'),
+    ('Pincode', 'pincode'),
+    ('Contact No', 'contact_no'),
+    ('Mobile', 'mobile'),
+    ('Helpline', 'helpline'),
+    ('Fax', 'fax'),
+    ('Email', 'email'),
+    ('Website', 'website'),
+    ('Nodal Officer', 'nodal_officer'),
+    ('Contact Nodal Officer', 'nodal_officer_contact'),
+    ('Mobile Nodal Officer', 'nodal_officer_mobile'),
+    ('Email Nodal Officer', 'nodal_officer_email'),
+    ('Qualification Nodal Officer', 'nodal_officer_qualification'),
+    ('Category', 'category'),
+    ('Blood Component Available', 'blood_components_available'),
+    ('Apheresis', 'apheresis_available'),
+    ('Service Time', 'service_time'),
+    ('License #', 'license_no'),
+    ('Date License Obtained', 'license_obtain_date'),
+    ('Date of Renewal', 'renewal_date'),
+)
+# Numbers in the JSON source that are stored as text
+STRING_COLUMNS = {'pincode', 'mobile', 'nodal_officer_contact', 'nodal_officer_mobile'}
+COLUMNS = [column for _, column in FIELD_MAP] + ['latitude', 'longitude']
+# A bank is identified by its license and name; district/city tell apart the unlicensed ones.
+KEY_COLUMNS = ('license_no', 'name', 'district', 'city')
 
+def iter_json_records(path):
+    """ Yields the objects of a top-level JSON array without loading the whole file. """
+    decoder = json.JSONDecoder()
+    with open(path, mode='r', encoding='utf-8') as json_file:
+        buffer = json_file.read(READ_CHUNK_SIZE).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"{path} does not contain a JSON array")
+        pos = 1
+        while True:
+            pos = _SEPARATORS.match(buffer, pos).end()
+            if buffer.startswith(']', pos):
+                return
             try:
-                # --- FIX: Only skip a record if the 'Blood Bank Name' is missing.
-                if not get_value('Blood Bank Name'):
+                record, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The next record continues in the following chunk.
+                chunk = json_file.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    raise
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            yield record
+
+def iter_csv_records(path):
+    with open(path, mode='r', encoding=CSV_ENCODING, newline='') as csv_file:
+        for row in csv.DictReader(csv_file):
+            # The export pads some headers with spaces (' Blood Bank Name', 'Nodal Officer ').
+            yield {(key or '').strip(): value for key, value in row.items()}
+
+def iter_records(path):
+    if path.lower().endswith('.csv'):
+        return iter_csv_records(path)
+    return iter_json_records(path)
+
+def to_row(record):
+    """ Maps one source record to BloodBank column values, or None if it should be skipped. """
+    def get_value(key):
+        # Safely get values, defaulting to None if key is missing or value is "N/A" or ""
+        val = record.get(key)
+        if isinstance(val, str):
+            val = val.strip()
+        if val in ["N/A", ""]:
+            return None
+        return val
+
+    # Only skip a record if the 'Blood Bank Name' is missing.
+    if not get_value('Blood Bank Name'):
+        return None
+
+    row = {}
+    for source_key, column in FIELD_MAP:
+        value = get_value(source_key)
+        if column in STRING_COLUMNS:
+            value = str(value or '')
+        elif value is not None:
+            value = str(value)
+        row[column] = value
+    # Coordinates can be blank (None)
+    row['latitude'] = float(get_value('Latitude')) if get_value('Latitude') is not None else None
+    row['longitude'] = float(get_value('Longitude')) if get_value('Longitude') is not None else None
+    return row
+
+def _staging_table():
+    """ Per-connection temporary table with the same columns as blood_bank. """
+    live = BloodBank.__table__
+    metadata = MetaData()
+    columns = [Column(name, live.c[name].type) for name in COLUMNS]
+    staging = Table('blood_bank_staging', metadata, *columns, prefixes=['TEMPORARY'])
+    Index('ix_blood_bank_staging_key', *[staging.c[name] for name in KEY_COLUMNS])
+    return staging
+
+def _key_match(live_alias, staging_alias):
+    # IS compares NULL licenses as equal and can still use indexes in SQLite.
+    return ' AND '.join(f"{live_alias}.{c} IS {staging_alias}.{c}" for c in KEY_COLUMNS)
+
+def import_blood_banks(path=DEFAULT_SOURCE):
+    """ Streams `path` (JSON or CSV) into a staging table and merges it into blood_bank in one transaction. """
+    staging = _staging_table()
+    app = create_app()
+    with app.app_context():
+        with db.engine.connect() as conn:
+            staging.create(conn)
+            conn.commit()
+
+            # --- 1. Stream the source into the staging table in batches ---
+            seen, batch = set(), []
+            loaded = skipped = duplicates = 0
+            for record in iter_records(path):
+                try:
+                    row = to_row(record)
+                except (ValueError, TypeError) as e:
+                    print(f"Skipping a row due to data conversion error: {e}")
+                    skipped += 1
+                    continue
+                if row is None:
+                    skipped += 1
                     continue
+                key = tuple(row[c] for c in KEY_COLUMNS)
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                batch.append(row)
+                if len(batch) >= BATCH_SIZE:
+                    conn.execute(staging.insert(), batch)
+                    loaded += len(batch)
+                    batch = []
+            if batch:
+                conn.execute(staging.insert(), batch)
+                loaded += len(batch)
+            conn.commit()
+            print(f"Staged {loaded} blood banks from {path} ({skipped} skipped, {duplicates} duplicates).")
+
+            if loaded == 0:
+                print("Nothing to import; leaving existing blood bank data untouched.")
+                return
 
-                # Coordinates can now be blank (None)
-                latitude = float(row.get('Latitude')) if row.get('Latitude') else None
-                longitude = float(row.get('Longitude')) if row.get('Longitude') else None
-                
-                bank = BloodBank(
-                    name=get_value('Blood Bank Name'),
-                    state=get_value('State'),
-                    district=get_value('District'),
-                    city=get_value('City'),
-                    address=get_value('Address'),
-                    pincode=str(get_value('Pincode') or ''),
-                    contact_no=get_value('Contact No'),
-                    mobile=str(get_value('Mobile') or ''),
-                    helpline=get_value('Helpline'),
-                    fax=get_value('Fax'),
-                    email=get_value('Email'),
-                    website=get_value('Website'),
-                    nodal_officer=get_value('Nodal Officer'),
-                    nodal_officer_contact=str(get_value('Contact Nodal Officer') or ''),
-                    nodal_officer_mobile=str(get_value('Mobile Nodal Officer') or ''),
-                    nodal_officer_email=get_value('Email Nodal Officer'),
-                    nodal_officer_qualification=get_value('Qualification Nodal Officer'),
-                    category=get_value('Category'),
-                    blood_components_available=get_value('Blood Component Available'),
-                    apheresis_available=get_value('Apheresis'),
-                    service_time=get_value('Service Time'),
-                    license_no=get_value('License #'),
-                    license_obtain_date=get_value('Date License Obtained'),
-                    renewal_date=get_value('Date of Renewal'),
-                    latitude=latitude,
-                    longitude=longitude
-                )
-                banks_to_add.append(bank)
-            except (ValueError, TypeError) as e:
-                print(f"Skipping a row due to data conversion error: {e}")
-
-        print(f"Adding {len(banks_to_add)} valid blood banks to the database...")
-        db.session.bulk_save_objects(banks_to_add)
-        db.session.commit()
-        print("JSON data import complete!")
+            # --- 2. Merge into the live table atomically; readers never see it empty ---
+            column_list = ', '.join(COLUMNS)
+            changed = ' OR '.join(f"blood_bank.{c} IS NOT s.{c}" for c in COLUMNS if c not in KEY_COLUMNS)
+            with conn.begin():
+                updated = conn.execute(text(
+                    "UPDATE blood_bank SET "
+                    + ', '.join(f"{c} = s.{c}" for c in COLUMNS if c not in KEY_COLUMNS)
+                    + f", updated_at = CURRENT_TIMESTAMP FROM blood_bank_staging AS s "
+                    f"WHERE {_key_match('blood_bank', 's')} AND ({changed})"
+                )).rowcount
+                inserted = conn.execute(text(
+                    f"INSERT INTO blood_bank ({column_list}) SELECT {column_list} FROM blood_bank_staging AS s "
+                    f"WHERE NOT EXISTS (SELECT 1 FROM blood_bank AS b WHERE {_key_match('b', 's')})"
+                )).rowcount
+                deleted = conn.execute(text(
+                    f"DELETE FROM blood_bank WHERE NOT EXISTS "
+                    f"(SELECT 1 FROM blood_bank_staging AS s WHERE {_key_match('blood_bank', 's')})"
+                )).rowcount
+            print(f"Blood bank import complete: {inserted} added, {updated} updated, {deleted} removed.")
+
+def import_data_from_json():
+    import_blood_banks(DEFAULT_SOURCE)
 
 if __name__ == '__main__':
-    import_data_from_json()
\ No newline at end of file
+    source = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SOURCE
+    if not os.path.exists(source):
+        sys.exit(f"Blood bank source not found: {source}")
+    import_blood_banks(source)
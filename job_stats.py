@@ -0,0 +1,48 @@
+""" Counters of the scheduled jobs, kept on their JobCheckpoint rows rather than in the leader's memory. """
+from sqlalchemy import case, update
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models import JobCheckpoint
+
+def run_values(sent=0, failed=0, lateness=None, skew=None):
+    """ Column updates folding one run into a JobCheckpoint row; put them in the UPDATE that advances its mark. """
+    values = {'runs': JobCheckpoint.runs + 1, 'sent': JobCheckpoint.sent + sent, 'failed': JobCheckpoint.failed + failed}
+    if lateness is not None:
+        lateness = round(lateness, 3)
+        values['last_lateness_seconds'] = lateness
+        values['max_lateness_seconds'] = case((JobCheckpoint.max_lateness_seconds >= lateness, JobCheckpoint.max_lateness_seconds),
+                                              else_=lateness)
+    if skew is not None:
+        values['last_skew_seconds'] = round(skew, 3)
+    return values
+
+def ensure_checkpoint(name, now):
+    """ Creates the job's row if it does not exist yet; another process may create it first. """
+    if db.session.get(JobCheckpoint, name) is not None:
+        return
+    db.session.add(JobCheckpoint(name=name, high_water=now))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+
+def record_conflict(names):
+    db.session.execute(
+        update(JobCheckpoint)
+        .where(JobCheckpoint.name.in_(names))
+        .values(conflicts=JobCheckpoint.conflicts + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+def snapshot(checkpoint):
+    return {
+        'high_water': checkpoint.high_water.isoformat(),
+        'runs': checkpoint.runs,
+        'sent': checkpoint.sent,
+        'failed': checkpoint.failed,
+        'conflicts': checkpoint.conflicts,
+        'last_skew_seconds': checkpoint.last_skew_seconds,
+        'last_lateness_seconds': checkpoint.last_lateness_seconds,
+        'max_lateness_seconds': checkpoint.max_lateness_seconds,
+    }
@@ -0,0 +1,113 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models import SchedulerLease
+
+# A leader that stops heartbeating is replaced once its lease expires. Lease times come from the
+# database clock, so hosts with skewed clocks still agree on when a lease has expired.
+LEASE_TTL_SECONDS = 15
+HEARTBEAT_SECONDS = 5
+
+class LeaderLease:
+    """ Competes for a named lock row; calls `on_elected`/`on_revoked` as leadership is gained or lost. """
+
+    def __init__(self, app, name, on_elected, on_revoked, ttl=LEASE_TTL_SECONDS, heartbeat=HEARTBEAT_SECONDS):
+        self.app = app
+        self.name = name
+        self.on_elected = on_elected
+        self.on_revoked = on_revoked
+        self.ttl = timedelta(seconds=ttl)
+        self.heartbeat = heartbeat
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        # Monotonic time at which the last confirmed renewal was started
+        self._renewed_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def try_acquire(self):
+        """ Takes the lease if it is free or expired, or renews it if we already hold it. """
+        now = db.session.execute(select(func.current_timestamp())).scalar()
+        renewed = db.session.execute(
+            update(SchedulerLease)
+            .where(SchedulerLease.name == self.name,
+                   or_(SchedulerLease.holder == self.holder, SchedulerLease.expires_at < now))
+            .values(holder=self.holder, expires_at=now + self.ttl, heartbeat_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if renewed:
+            db.session.commit()
+            return True
+        if db.session.get(SchedulerLease, self.name) is not None:
+            db.session.rollback()
+            return False
+        # First start: create the lock row; another process may win the insert.
+        db.session.add(SchedulerLease(name=self.name, holder=self.holder, expires_at=now + self.ttl, heartbeat_at=now))
+        try:
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+            return False
+
+    def release(self):
+        """ Expires our lease immediately so a standby takes over without waiting for the TTL. """
+        db.session.execute(
+            update(SchedulerLease)
+            .where(SchedulerLease.name == self.name, SchedulerLease.holder == self.holder)
+            .values(expires_at=datetime.min)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"leader-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _step_down(self):
+        self.is_leader = False
+        self.app.logger.info(f"{self.holder} is no longer the {self.name} leader.")
+        self.on_revoked()
+
+    def _lease_running_out(self):
+        """ True once the last confirmed lease is within one heartbeat of expiring, when a standby may take over. """
+        return time.monotonic() - self._renewed_at >= self.ttl.total_seconds() - self.heartbeat
+
+    def beat(self):
+        """ One heartbeat: acquires or renews the lease and starts or stops the jobs to match. """
+        started = time.monotonic()
+        try:
+            with self.app.app_context():
+                acquired = self.try_acquire()
+        except Exception as e:
+            # A transient failure; the lease we hold is still ours until it expires.
+            self.app.logger.error(f"Lease heartbeat for {self.name} failed: {e}", exc_info=True)
+            acquired = None
+        if acquired:
+            self._renewed_at = started
+            if not self.is_leader:
+                self.is_leader = True
+                self.app.logger.info(f"{self.holder} is now the {self.name} leader.")
+                self.on_elected()
+        elif self.is_leader and (acquired is False or self._lease_running_out()):
+            self._step_down()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.beat()
+            self._stop.wait(self.heartbeat)
+        if self.is_leader:
+            self._step_down()
+            with self.app.app_context():
+                self.release()
@@ -0,0 +1,62 @@
+""" Opens many concurrent Socket.IO connections against a running server and reports how many it holds.
+
+    python loadtest_socketio.py --url http://localhost:5000 --connections 2000 --hold 30
+
+Each client connects over WebSocket, joins its own chat room and then pings the server
+periodically by joining again. Needs the optional `aiohttp` package.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import socketio
+
+async def run_client(url, index, hold, results):
+    client = socketio.AsyncClient(reconnection=False)
+    started = time.perf_counter()
+    try:
+        await client.connect(url, transports=['websocket'], wait_timeout=30)
+    except Exception as e:
+        await client.disconnect()
+        results['failed'] += 1
+        results['errors'][type(e).__name__] = results['errors'].get(type(e).__name__, 0) + 1
+        return
+    results['connect_seconds'].append(time.perf_counter() - started)
+    results['open'] += 1
+    results['peak'] = max(results['peak'], results['open'])
+    try:
+        deadline = time.monotonic() + hold
+        while time.monotonic() < deadline and client.connected:
+            await client.emit('join_chat', {'conversation_id': f"loadtest-{index}"})
+            await asyncio.sleep(5)
+        if not client.connected:
+            results['dropped'] += 1
+    finally:
+        results['open'] -= 1
+        await client.disconnect()
+
+async def main(args):
+    results = {'open': 0, 'peak': 0, 'failed': 0, 'dropped': 0, 'errors': {}, 'connect_seconds': []}
+    tasks = []
+    for index in range(args.connections):
+        tasks.append(asyncio.create_task(run_client(args.url, index, args.hold, results)))
+        if (index + 1) % args.ramp == 0:
+            await asyncio.sleep(1)
+    await asyncio.gather(*tasks)
+
+    times = sorted(results['connect_seconds'])
+    print(f"Requested connections: {args.connections}")
+    print(f"Peak concurrent:       {results['peak']}")
+    print(f"Failed to connect:     {results['failed']} {results['errors'] or ''}")
+    print(f"Dropped while held:    {results['dropped']}")
+    if times:
+        p95 = times[int(len(times) * 0.95) - 1] if len(times) >= 20 else times[-1]
+        print(f"Connect time p50/p95:  {statistics.median(times) * 1000:.0f} ms / {p95 * 1000:.0f} ms")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--hold', type=int, default=30, help="Seconds each connection stays open")
+    parser.add_argument('--ramp', type=int, default=200, help="New connections per second")
+    asyncio.run(main(parser.parse_args()))
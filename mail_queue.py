@@ -0,0 +1,186 @@
+import atexit
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session
+from extensions import db, mail
+from models import OutboxEmail
+
+MAX_ATTEMPTS = 6
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 60 * 60
+# A claimed row becomes available again if its worker dies before finishing.
+CLAIM_LEASE = timedelta(minutes=5)
+POLL_INTERVAL_SECONDS = 5
+
+_dispatcher = None
+# Batch timings of this process's dispatcher; delivery counts come from the outbox table
+_batches = {'batches': 0, 'last_batch_seconds': None}
+_batches_lock = threading.Lock()
+
+def enqueue_mail(subject, recipients, body, sender=None):
+    """ Adds an email to the outbox in the current session; it goes out once the session commits. """
+    email = OutboxEmail(
+        subject=subject,
+        sender=sender or os.getenv('MAIL_USERNAME'),
+        recipients=','.join(recipients),
+        body=body,
+        next_attempt_at=datetime.now(),
+    )
+    db.session.add(email)
+    # The dispatcher is woken once the session commits; a rollback discards the email
+    db.session.info['outbox_pending'] = db.session.info.get('outbox_pending', 0) + 1
+    return email
+
+@event.listens_for(Session, 'after_commit')
+def _wake_dispatcher(session):
+    if session.info.pop('outbox_pending', 0) and _dispatcher is not None:
+        _dispatcher.wake()
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop('outbox_pending', None)
+
+def claim_batch(limit):
+    """ Atomically leases up to `limit` due emails so no other worker or process sends them. """
+    now = datetime.now()
+    due = select(OutboxEmail.id).where(
+        OutboxEmail.status == 'pending', OutboxEmail.next_attempt_at <= now
+    ).order_by(OutboxEmail.next_attempt_at).limit(limit)
+    claimed = db.session.execute(
+        update(OutboxEmail)
+        .where(OutboxEmail.id.in_(due), OutboxEmail.next_attempt_at <= now)
+        .values(next_attempt_at=now + CLAIM_LEASE)
+        .returning(OutboxEmail.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.session.commit()
+    return claimed
+
+def _to_message(email):
+    msg = Message(email.subject, sender=email.sender, recipients=email.recipients.split(','))
+    msg.body = email.body
+    return msg
+
+def _mark_failed(email, error):
+    email.attempts += 1
+    email.last_error = str(error)[:1000]
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = 'failed'
+    else:
+        delay = min(RETRY_BASE_SECONDS * 2 ** (email.attempts - 1), RETRY_MAX_SECONDS)
+        email.next_attempt_at = datetime.now() + timedelta(seconds=delay)
+
+def dispatch_batch(limit):
+    """ Sends one claimed batch over a single SMTP connection. Returns how many were claimed. """
+    ids = claim_batch(limit)
+    if not ids:
+        return 0
+    emails = OutboxEmail.query.filter(OutboxEmail.id.in_(ids)).all()
+    started = time.perf_counter()
+    done = set()
+    try:
+        with mail.connect() as conn:
+            for email in emails:
+                try:
+                    conn.send(_to_message(email))
+                except Exception as e:
+                    _mark_failed(email, e)
+                else:
+                    email.status = 'sent'
+                    email.sent_at = datetime.now()
+                done.add(email.id)
+    except Exception as e:
+        # The connection itself failed; everything not yet attempted is retried later.
+        current_app.logger.warning(f"Mail dispatcher could not reach the SMTP server: {e}")
+        for email in emails:
+            if email.id not in done:
+                _mark_failed(email, e)
+    db.session.commit()
+    with _batches_lock:
+        _batches['batches'] += 1
+        _batches['last_batch_seconds'] = round(time.perf_counter() - started, 3)
+    return len(ids)
+
+def metrics():
+    """ Outbox totals read from the table, so every worker reports every dispatcher's work, plus the current backlog.
+
+    Only `this_process` (batch count and timing) is local to the worker serving the request.
+    """
+    counts = dict(db.session.query(OutboxEmail.status, func.count(OutboxEmail.id)).group_by(OutboxEmail.status).all())
+    # attempts counts failed sends only, and a failed row's last attempt was not retried
+    attempts = db.session.query(func.coalesce(func.sum(OutboxEmail.attempts), 0)).scalar()
+    oldest = db.session.query(func.min(OutboxEmail.created_at)).filter(OutboxEmail.status == 'pending').scalar()
+    last_error = db.session.query(OutboxEmail.last_error).filter(
+        OutboxEmail.last_error.isnot(None)
+    ).order_by(OutboxEmail.id.desc()).limit(1).scalar()
+    with _batches_lock:
+        this_process = dict(_batches, workers=_dispatcher.workers if _dispatcher else 0)
+    return {
+        'enqueued': sum(counts.values()),
+        'sent': counts.get('sent', 0),
+        'failed': counts.get('failed', 0),
+        'retried': attempts - counts.get('failed', 0),
+        'pending': counts.get('pending', 0),
+        'oldest_pending': oldest.isoformat() if oldest else None,
+        'last_error': last_error,
+        'this_process': this_process,
+    }
+
+class MailDispatcher:
+    """ Pool of background threads draining the outbox in batches. """
+
+    def __init__(self, app, workers=2, batch_size=20, poll_interval=POLL_INTERVAL_SECONDS):
+        self.app = app
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"mail-dispatcher-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            claimed = 0
+            try:
+                with self.app.app_context():
+                    claimed = dispatch_batch(self.batch_size)
+            except Exception as e:
+                self.app.logger.error(f"Mail dispatcher error: {e}", exc_info=True)
+            if claimed < self.batch_size:
+                # Caught up; sleep until new mail is committed or the next poll.
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+def start_mail_dispatcher(app):
+    global _dispatcher
+    if _dispatcher is not None:
+        return _dispatcher
+    _dispatcher = MailDispatcher(
+        app,
+        workers=app.config.get('MAIL_QUEUE_WORKERS', 2),
+        batch_size=app.config.get('MAIL_QUEUE_BATCH_SIZE', 20),
+    )
+    _dispatcher.start()
+    atexit.register(_dispatcher.stop)
+    return _dispatcher
@@ -1,26 +1,30 @@
 import os
 import uuid
 import base64
-import io
 import json # Ensure json is imported
+import time
 from datetime import datetime
 # Remove DrugInfo import if you are not using the local DB approach anymore
 # from models import DrugInfo 
 from flask import url_for 
 from flask import (
     Blueprint, render_template, session, redirect, url_for,
-    request, jsonify, current_app, flash, abort, send_from_directory
+    request, jsonify, current_app, flash, abort, send_from_directory,
+    Response, stream_with_context
 )
-from werkzeug.utils import secure_filename
-import google.generativeai as genai
-from PIL import Image, ImageDraw, ImageFont
-from pdf2image import convert_from_bytes
 import requests
 # Ensure these specific Flask components are imported
 from flask import current_app, jsonify, request, session, render_template, redirect, url_for 
 
-from extensions import db
+from extensions import db, socketio
 from models import Appointment, Doctor, User, Notification, VideoCall, PromptHistory
+from notifications import push_notifications
+from medibot import get_medibot
+from ai_gateway import GatewayRejected
+from offload import run_blocking
+from prompt_images import content_digest, prepare_prompt_image, save_prompt_image, stored_filename
+from document_jobs import inspect_document, submit_document, get_job
+from temp_janitor import track_artifacts, SPOOL_TTL_SECONDS
 # Remove DrugInfo import here too if not using local DB
 # from models import DrugInfo 
 
@@ -30,9 +34,31 @@ main = Blueprint('main', __name__)
 UPLOAD_FOLDER = 'static/uploads/ai_prompts'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
 
+# Most recent unread notifications returned by /notifications
+NOTIFICATION_PAGE_SIZE = 20
+# Rendered call document pages: full views (webp/jpg) and thumbnails (jpg)
+SHARED_PAGE_EXTENSIONS = ('.webp', '.jpg', '.png')
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# --- Queries (also checked by `flask check-query-plans`) ---
+
+def unread_notifications_query(user_id=None, doctor_id=None):
+    """ A user's (or else a doctor's) unread notifications, newest first. """
+    query = Notification.query.filter_by(is_read=False)
+    if user_id:
+        query = query.filter_by(recipient_user_id=user_id)
+    else:
+        query = query.filter_by(recipient_doctor_id=doctor_id)
+    return query.order_by(Notification.timestamp.desc())
+
+def user_appointments_query(user_id):
+    return db.session.query(Appointment, Doctor)\
+        .join(Doctor, Appointment.doctor_id == Doctor.id)\
+        .filter(Appointment.user_id == user_id)\
+        .order_by(Appointment.appointment_datetime.desc())
+
 # --- CORE ROUTES ---
 
 @main.route('/')
@@ -44,7 +70,8 @@ def home():
 @main.route('/prompt', methods=['POST'])
 def handle_prompt():
     # ...(Keep your existing handle_prompt function code here)...
-    if 'user_id' not in session and 'doctor_id' not in session:
+    # A key that is present but empty must not land everyone in one shared rate-limit bucket
+    if not session.get('user_id') and not session.get('doctor_id'):
         return jsonify({'error': 'Unauthorized'}), 401
 
     data = request.get_json()
@@ -52,66 +79,124 @@ def handle_prompt():
     base64_images = data.get('images', [])
     api_key = current_app.config.get('GOOGLE_API_KEY')
 
-    if not api_key:
+    # A MediBot already in app.extensions (e.g. with a stubbed model) needs no key
+    if not api_key and 'medibot' not in current_app.extensions:
         return jsonify({'error': 'Google API key is not configured.'}), 500
     if not prompt_text and not base64_images:
         return jsonify({'error': 'A text prompt or an image is required.'}), 400
 
+    bot = get_medibot(current_app._get_current_object())
+    if bot.gateway:
+        # Per-session rate limit, checked before any decoding or model work
+        try:
+            bot.gateway.check_rate(_prompt_session_key())
+        except GatewayRejected as e:
+            return _rejected(e)
+
     image_url_for_db = None
     try:
-        genai.configure(api_key=api_key)
-        
-        content_parts = []
-        system_instruction = (
-            "You are MediBot, a helpful AI medical assistant. "
-            "Your primary role is to answer only medical, health, and wellness-related questions. "
-            "You must strictly and politely refuse to answer any questions that are not related to these topics."
-            "dont reveal that you are not allowed to answer non-medical questions. but deny saying some small sentence like 'I'm sorry, I can only assist with medical-related inquiries."
-            "but at last if its medical related question then after  the response add this sentence 'Disclaimer: This response is for informational purposes only and should not be considered medical advice. Always consult a qualified healthcare professional for medical concerns.'"
-        )
-        content_parts.append(system_instruction)
-
-        if prompt_text:
-            content_parts.append(prompt_text)
-
+        images = []
         if base64_images:
-            os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-            user_id = session.get('user_id')
-            doctor_id = session.get('doctor_id')
-            
             b64_string = base64_images[0]
             image_bytes = base64.b64decode(b64_string)
-            img = Image.open(io.BytesIO(image_bytes))
-            content_parts.append(img)
-            
-            filename = secure_filename(f"{user_id or doctor_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.webp")
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            img.save(filepath, 'WEBP') 
-            image_url_for_db = url_for('static', filename=f'uploads/ai_prompts/{filename}')
-
-        model_name = "gemini-2.5-flash-lite" if base64_images else "gemini-2.5-flash" # Use appropriate models
-        model = genai.GenerativeModel(model_name)
-        response = model.generate_content(content_parts)
-        ai_response_text = response.text
-
-        new_prompt = PromptHistory(
-            user_id=session.get('user_id'),
-            doctor_id=session.get('doctor_id'),
-            prompt_text=prompt_text if prompt_text else "Image-based query",
-            response_text=ai_response_text,
-            image_url=image_url_for_db
-        )
-        db.session.add(new_prompt)
-        db.session.commit()
+            digest = content_digest(image_bytes)
+            # Downsampled and stripped of EXIF off the event loop; the model never sees the full-size photo
+            img = run_blocking(prepare_prompt_image, image_bytes, current_app.config['PROMPT_IMAGE_MAX_DIMENSION'])
+            images.append(img)
+
+            # Stored once per content, written while the model answers
+            socketio.start_background_task(_store_prompt_image, current_app._get_current_object(), img, digest)
+            image_url_for_db = url_for('static', filename=f'uploads/ai_prompts/{stored_filename(digest)}')
+
+        if data.get('stream'):
+            return _stream_prompt(bot, prompt_text, images, image_url_for_db)
+        # Cached, coalesced with identical in-flight prompts, or answered by the model
+        ai_response_text = bot.ask(prompt_text, images)
+        _save_prompt_history(prompt_text, ai_response_text, image_url_for_db)
 
         return jsonify({'response': ai_response_text})
-        
+
+    except GatewayRejected as e:
+        return _rejected(e)
     except Exception as e:
         current_app.logger.error(f"Error in /prompt route: {e}", exc_info=True) # Log traceback
         db.session.rollback()
         return jsonify({'error': 'An error occurred while processing your request.'}), 500
 
 
+def _store_prompt_image(app, image, digest):
+    try:
+        run_blocking(save_prompt_image, image, digest, os.path.join(app.root_path, UPLOAD_FOLDER))
+    except Exception as e:
+        app.logger.error(f"Failed to store prompt image {digest}: {e}")
+
+def _save_prompt_history(prompt_text, response_text, image_url):
+    new_prompt = PromptHistory(
+        user_id=session.get('user_id'),
+        doctor_id=session.get('doctor_id'),
+        prompt_text=prompt_text if prompt_text else "Image-based query",
+        response_text=response_text,
+        image_url=image_url
+    )
+    db.session.add(new_prompt)
+    db.session.commit()
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _prompt_session_key():
+    """ Rate-limit bucket of the signed-in user or doctor; handle_prompt() has already turned anonymous callers away. """
+    if session.get('user_id'):
+        return f"user:{session['user_id']}"
+    return f"doctor:{session['doctor_id']}"
+
+# Shown to the user when the AI gateway turns a prompt away
+GATEWAY_MESSAGES = {
+    429: 'MediBot is receiving too many questions right now. Please try again in a moment.',
+    503: 'MediBot is temporarily unavailable. Please try again shortly.',
+    504: 'MediBot took too long to answer. Please try again.',
+}
+
+def _rejected(rejection):
+    """ Fast JSON refusal for a prompt the AI gateway shed, with Retry-After when it is worth retrying. """
+    response = jsonify({'error': GATEWAY_MESSAGES.get(rejection.status, GATEWAY_MESSAGES[503]), 'reason': rejection.reason})
+    response.status_code = rejection.status
+    if rejection.retry_after:
+        response.headers['Retry-After'] = str(rejection.retry_after)
+    return response
+
+def _stream_prompt(bot, prompt_text, images, image_url):
+    """ Server-Sent Events: a `chunk` event per piece of the answer as the model writes it, then `done`
+    with the time to the first chunk and the total time. The history row is written once, at the end.
+    """
+    started = time.monotonic()
+    answer = bot.stream(prompt_text, images)
+    # Wait for the first chunk before committing to a 200, so a shed prompt still gets its 429/503
+    first_chunk = next(answer, None)
+    ttfb = time.monotonic() - started
+
+    def generate():
+        chunks = []
+        try:
+            if first_chunk is not None:
+                chunks.append(first_chunk)
+                yield _sse('chunk', {'text': first_chunk})
+            for chunk in answer:
+                chunks.append(chunk)
+                yield _sse('chunk', {'text': chunk})
+            _save_prompt_history(prompt_text, ''.join(chunks), image_url)
+            total = time.monotonic() - started
+            bot.record_stream_timing(ttfb, total)
+            yield _sse('done', {'ttfb_ms': round(ttfb * 1000), 'total_ms': round(total * 1000)})
+        except Exception as e:
+            current_app.logger.error(f"Error in streamed /prompt: {e}", exc_info=True)
+            db.session.rollback()
+            yield _sse('error', {'error': 'An error occurred while processing your request.'})
+
+    # No proxy buffering, or the chunks would arrive all at once
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # --- ALL OTHER EXISTING ROUTES ---
 # (Keeping all existing long routes here for completeness but minimizing display)
 
@@ -140,15 +225,12 @@ def get_notifications():
     if 'user_id' not in session and 'doctor_id' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    query = Notification.query.filter_by(is_read=False)
-    if 'user_id' in session:
-        query = query.filter_by(recipient_user_id=session['user_id'])
-    elif 'doctor_id' in session:
-        query = query.filter_by(recipient_doctor_id=session['doctor_id'])
-    
-    notifications = query.order_by(Notification.timestamp.desc()).all()
+    query = unread_notifications_query(session.get('user_id'), session.get('doctor_id'))
+    # Clients get new notifications pushed over Socket.IO; this is the fallback poll,
+    # so only the newest few are sent along with the total unread count.
+    notifications = query.limit(NOTIFICATION_PAGE_SIZE).all()
     return jsonify({
-        'count': len(notifications),
+        'count': query.count(),
         'notifications': [{'id': n.id, 'message': n.message} for n in notifications]
     })
 
@@ -171,11 +253,7 @@ def appointment_status():
         return redirect(url_for('auth.login'))
     
     user_id = session['user_id']
-    user_appointments = db.session.query(Appointment, Doctor)\
-        .join(Doctor, Appointment.doctor_id == Doctor.id)\
-        .filter(Appointment.user_id == user_id)\
-        .order_by(Appointment.appointment_datetime.desc())\
-        .all()
+    user_appointments = user_appointments_query(user_id).all()
     return render_template('appointment_status.html', appointments=user_appointments)
 
 @main.route('/appointment/cancel/<int:appointment_id>', methods=['POST'])
@@ -194,6 +272,7 @@ def cancel_appointment(appointment_id):
     new_notification = Notification(message=notification_message, recipient_doctor_id=appointment.doctor_id)
     db.session.add(new_notification)
     db.session.commit()
+    push_notifications(new_notification)
     return jsonify({'message': 'Appointment successfully cancelled.'}), 200
 
 @main.route('/call/<int:call_id>/upload', methods=['POST'])
@@ -229,93 +308,77 @@ def handle_secure_upload(call_id):
     # MODIFIED: Watermark text for multiple diagonals
     watermark_base_text = f"Viewed by {viewer_name} {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
     
-    processed_urls = []
-    
+    if file.mimetype != 'application/pdf' and not file.mimetype.startswith('image/'):
+        return jsonify({'error': 'Only PDF and image files can be shared'}), 400
+
+    max_bytes = current_app.config['DOCUMENT_MAX_BYTES']
+    if request.content_length and request.content_length > max_bytes:
+        return jsonify({'error': f"Documents can be at most {max_bytes // (1024 * 1024)} MB"}), 413
+
+    source_path = job = None
     try:
-        file_bytes = file.read()
-        images_to_watermark = []
-
-        if file.mimetype == 'application/pdf':
-            images_to_watermark = convert_from_bytes(file_bytes)
-        elif file.mimetype.startswith('image/'):
-            images_to_watermark.append(Image.open(io.BytesIO(file_bytes)).convert("RGBA"))
-
-        for image in images_to_watermark:
-            img_width, img_height = image.size
-            txt_layer = Image.new('RGBA', (img_width, img_height), (255, 255, 255, 0))
-            draw = ImageDraw.Draw(txt_layer)
-
-            try:
-                # Attempt to load a common bold font, adjust size for better visibility
-                font_size = int(img_width / 15) # Dynamic font size based on image width
-                font = ImageFont.truetype("arialbd.ttf", font_size) # Arial Bold
-            except IOError:
-                font = ImageFont.load_default() # Fallback
-
-            # MODIFIED: Darker grey (RGB 50, 50, 50) with some transparency (alpha 120-150 for good visibility)
-            # Alpha value depends on how subtle/prominent you want it. 120-150 is a good range.
-            watermark_fill = (50, 50, 50, 140) 
-
-            # Calculate text size once to help with positioning
-            bbox = draw.textbbox((0, 0), watermark_base_text, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-
-            # MODIFIED: Define multiple positions for diagonal watermarks
-            # This creates a grid-like diagonal pattern
-            positions = [
-                (-text_width / 2, img_height / 4 - text_height / 2), # Top-left quadrant
-                (img_width / 4, -text_height / 2),                   # Top-center (start off-screen for effect)
-                (img_width / 2 - text_width / 2, img_height / 2 - text_height / 2), # Center
-                (img_width * 3 / 4, img_height - text_height * 0.75),# Bottom-right (start off-screen for effect)
-                (img_width - text_width / 2, img_height / 4),       # Top-right quadrant
-                (img_width / 2, img_height * 3 / 4 - text_height / 2), # Bottom-center quadrant
-                (-text_width / 2, img_height * 3 / 4),               # Bottom-left quadrant
-                # Add more if you want a denser pattern
-            ]
-
-            for x, y in positions:
-                # Rotate the text for diagonal effect
-                # Create a temporary image for the rotated text
-                temp_text_img = Image.new('RGBA', (text_width + 50, text_height + 50), (255, 255, 255, 0))
-                temp_draw = ImageDraw.Draw(temp_text_img)
-                temp_draw.text((0, 0), watermark_base_text, font=font, fill=watermark_fill)
-                
-                # Rotate by -45 degrees (adjust angle as needed)
-                rotated_text_img = temp_text_img.rotate(45, expand=1) # expand=1 ensures full text is visible after rotation
-                
-                # Paste the rotated text onto the main text layer, adjusting for rotation expansion
-                # We need to calculate the new top-left corner after rotation expansion
-                rotated_width, rotated_height = rotated_text_img.size
-                
-                # Adjust paste position to roughly center the rotated text around original (x,y)
-                paste_x = int(x - (rotated_width - text_width) / 2)
-                paste_y = int(y - (rotated_height - text_height) / 2)
-
-                txt_layer.paste(rotated_text_img, (paste_x, paste_y), rotated_text_img)
-
-            watermarked_image = Image.alpha_composite(image.convert('RGBA'), txt_layer)
-
-# --- Other utility routes ---
-            filename = f"call_{call_id}_{uuid.uuid4().hex}.png"
-            filepath = os.path.join(temp_folder, filename)
-            watermarked_image.convert('RGB').save(filepath, 'PNG')
-            processed_urls.append(url_for('main.serve_temp_file', filename=filename, _external=True))
-            
-        return jsonify({'urls': processed_urls})
+        # Spool the upload to disk; the document workers render pages from it one at a time
+        source_path = os.path.join(temp_folder, f"upload_{call_id}_{uuid.uuid4().hex}")
+        file.save(source_path)
+        if os.path.getsize(source_path) > max_bytes:
+            os.remove(source_path)
+            return jsonify({'error': f"Documents can be at most {max_bytes // (1024 * 1024)} MB"}), 413
+        pages, dpi = inspect_document(source_path, file.mimetype, current_app.config['DOCUMENT_RENDER_DPI'])
+        if pages > current_app.config['DOCUMENT_MAX_PAGES']:
+            os.remove(source_path)
+            return jsonify({'error': f"Documents can have at most {current_app.config['DOCUMENT_MAX_PAGES']} pages"}), 413
+        # Only an accepted upload goes in the manifest; rejected ones are removed above
+        track_artifacts(temp_folder, [os.path.basename(source_path)], call_id, SPOOL_TTL_SECONDS)
+        url_adapter = current_app.url_map.bind_to_environ(request.environ)
+        job = submit_document(
+            call_id, source_path, file.mimetype, pages, dpi, watermark_base_text, temp_folder,
+            url_for_file=lambda filename: url_adapter.build('main.serve_temp_file', {'filename': filename}, force_external=True),
+            # The uploader's socket does not need its own document pushed back
+            skip_sid=request.form.get('sid'),
+            workers=current_app.config.get('DOCUMENT_WORKERS'),
+            output={
+                'image_format': current_app.config['DOCUMENT_IMAGE_FORMAT'],
+                'quality': current_app.config['DOCUMENT_IMAGE_QUALITY'],
+                'max_bytes': current_app.config['DOCUMENT_PAGE_MAX_BYTES'],
+                'thumbnail_size': current_app.config['DOCUMENT_THUMBNAIL_SIZE'],
+            },
+        )
+        return jsonify({'job_id': job.id, 'pages': job.pages}), 202
 
     except Exception as e:
         current_app.logger.error(f"File processing error: {e}")
+        # Once a job exists it owns the spooled file and removes it when its pages are done
+        if job is None and source_path and os.path.exists(source_path):
+            os.remove(source_path)
         return jsonify({'error': 'Failed to process file'}), 500
 
+@main.route('/call/<int:call_id>/upload/<job_id>')
+def document_job_status(call_id, job_id):
+    """ Progress of a shared document, for clients that missed the socket events. """
+    if 'user_id' not in session and 'doctor_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    call = VideoCall.query.get_or_404(call_id)
+    if call.user_id != session.get('user_id') and call.doctor_id != session.get('doctor_id'):
+        return jsonify({'error': 'Forbidden'}), 403
+    job = get_job(job_id)
+    if job is None or job.call_id != call_id:
+        abort(404)
+    return jsonify(job.to_dict())
+
 @main.route('/temp-uploads/<filename>')
 def serve_temp_file(filename):
     temp_folder = os.path.join(current_app.root_path, 'temp_uploads')
     
     # Basic security check
-    if not (filename.startswith('call_') and filename.endswith('.png') and '..' not in filename):
+    if not (filename.startswith('call_') and filename.endswith(SHARED_PAGE_EXTENSIONS) and '..' not in filename):
         abort(404)
-    return send_from_directory(temp_folder, filename)
+    # Conditional responses give ETag/304 and Range support; pages are immutable under their random names
+    response = send_from_directory(temp_folder, filename, conditional=True, max_age=current_app.config['DOCUMENT_CACHE_SECONDS'])
+    # Watermarked medical documents must not be kept by shared caches
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    return response
 
 @main.route('/picker/map')
 def picker_map():
@@ -0,0 +1,318 @@
+""" MediBot's model calls: one client per model per process, a response cache and request coalescing. """
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from extensions import db
+from models import PromptCacheEntry
+from ai_gateway import AIGateway
+from offload import run_blocking
+
+SYSTEM_INSTRUCTION = (
+    "You are MediBot, a helpful AI medical assistant. "
+    "Your primary role is to answer only medical, health, and wellness-related questions. "
+    "You must strictly and politely refuse to answer any questions that are not related to these topics."
+    "dont reveal that you are not allowed to answer non-medical questions. but deny saying some small sentence like 'I'm sorry, I can only assist with medical-related inquiries."
+    "but at last if its medical related question then after  the response add this sentence 'Disclaimer: This response is for informational purposes only and should not be considered medical advice. Always consult a qualified healthcare professional for medical concerns.'"
+)
+TEXT_MODEL = "gemini-2.5-flash"
+IMAGE_MODEL = "gemini-2.5-flash-lite"
+
+# Used when PROMPT_CACHE_* is not configured
+DEFAULT_CACHE_TTL_SECONDS = 6 * 60 * 60
+DEFAULT_CACHE_MAX_ENTRIES = 1000
+
+_create_lock = threading.Lock()
+
+def normalize_prompt(text):
+    """ Case, surrounding whitespace, runs of spaces and trailing punctuation do not change the answer. """
+    return ' '.join((text or '').lower().split()).rstrip('?!. ')
+
+def cache_key(model_name, system_instruction, prompt_text):
+    payload = json.dumps([model_name, system_instruction, normalize_prompt(prompt_text)])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def gemini_model_factory(api_key):
+    """ Configures the Gemini SDK once and returns a factory building one GenerativeModel per name. """
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel
+
+class ResponseCache:
+    """ TTL + LRU cache of answers in memory, optionally backed by the prompt_cache_entry table.
+
+    The memory tier is per process; the table survives restarts and is shared by every worker.
+    Table lookups need an app context.
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_MAX_ENTRIES, ttl_seconds=DEFAULT_CACHE_TTL_SECONDS, persistent=False):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persistent = persistent
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """ The cached answer and the tier it came from ('memory' or 'persistent'), or (None, None). """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    return entry[0], 'memory'
+                del self._entries[key]
+        if self.persistent:
+            row = db.session.get(PromptCacheEntry, key)
+            if row is not None:
+                if row.expires_at > datetime.now():
+                    self._remember(key, row.response_text, (row.expires_at - datetime.now()).total_seconds())
+                    return row.response_text, 'persistent'
+                db.session.delete(row)
+                db.session.commit()
+        return None, None
+
+    def put(self, key, model_name, text):
+        self._remember(key, text, self.ttl_seconds)
+        if self.persistent:
+            now = datetime.now()
+            try:
+                db.session.merge(PromptCacheEntry(key=key, model_name=model_name, response_text=text,
+                                                  created_at=now, expires_at=now + timedelta(seconds=self.ttl_seconds)))
+                db.session.commit()
+            except Exception as e:
+                # The answer is still served and cached in memory
+                db.session.rollback()
+                print(f"--- ERROR: Failed to persist cached MediBot answer: {e} ---")
+
+    def _remember(self, key, text, ttl_seconds):
+        with self._lock:
+            self._entries[key] = (text, time.monotonic() + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+class _InFlight:
+    """ One upstream call that identical concurrent prompts wait on. """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.text = None
+        self.error = None
+
+class MediBot:
+    """ Answers MediBot prompts through per-process model clients.
+
+    `model_factory(model_name)` builds a client with a `generate_content(parts, stream=False, request_options=None)`
+    method; pass a stub to run without Gemini. Text-only prompts are answered from the cache when possible, and
+    identical prompts arriving while one is being answered share its upstream call. Every upstream call goes
+    through `gateway` when one is given.
+    """
+
+    def __init__(self, model_factory, cache=None, gateway=None):
+        self.model_factory = model_factory
+        self.cache = cache if cache is not None else ResponseCache()
+        self.gateway = gateway
+        self._models = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._metrics = {'requests': 0, 'memory_hits': 0, 'persistent_hits': 0, 'coalesced': 0,
+                         'upstream_calls': 0, 'upstream_errors': 0, 'last_upstream_seconds': None,
+                         'streams': 0, 'stream_ttfb_seconds_sum': 0.0, 'stream_total_seconds_sum': 0.0,
+                         'last_stream_ttfb_seconds': None, 'last_stream_total_seconds': None}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._metrics[name] += amount
+
+    def model(self, model_name):
+        """ The process-wide client for `model_name`, created on first use. """
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is None:
+                model = self._models[model_name] = self.model_factory(model_name)
+            return model
+
+    def _upstream(self):
+        return self.gateway.upstream() if self.gateway else nullcontext()
+
+    def _call_options(self):
+        return {'request_options': self.gateway.request_options()} if self.gateway else {}
+
+    def _generate(self, model_name, content_parts):
+        started = time.monotonic()
+        self._count('upstream_calls')
+        try:
+            with self._upstream():
+                # gRPC call; keeps the worker's event loop free while Gemini answers
+                response = run_blocking(self.model(model_name).generate_content, content_parts, **self._call_options())
+            # Read outside the gateway: a safety-blocked answer raises here, and that is no upstream failure
+            return response.text
+        except Exception:
+            self._count('upstream_errors')
+            raise
+        finally:
+            with self._lock:
+                self._metrics['last_upstream_seconds'] = round(time.monotonic() - started, 3)
+
+    def _generate_stream(self, model_name, content_parts):
+        """ Yields the model's text chunks as they arrive; each wait for the next chunk runs off the event loop. """
+        started = time.monotonic()
+        self._count('upstream_calls')
+        try:
+            # The slot is held until the last chunk has arrived
+            with self._upstream():
+                chunks = iter(run_blocking(self.model(model_name).generate_content, content_parts, stream=True,
+                                           **self._call_options()))
+                while True:
+                    chunk = run_blocking(next, chunks, None)
+                    if chunk is None:
+                        break
+                    if chunk.text:
+                        yield chunk.text
+        except Exception:
+            self._count('upstream_errors')
+            raise
+        finally:
+            with self._lock:
+                self._metrics['last_upstream_seconds'] = round(time.monotonic() - started, 3)
+
+    def _content(self, prompt_text, images):
+        model_name = IMAGE_MODEL if images else TEXT_MODEL
+        return model_name, [SYSTEM_INSTRUCTION] + ([prompt_text] if prompt_text else []) + list(images)
+
+    def _cached(self, key):
+        text, tier = self.cache.get(key)
+        if text is not None:
+            self._count(f"{tier}_hits")
+        return text
+
+    def _join_or_lead(self, key):
+        """ The in-flight call for `key` and whether this caller has to make it. """
+        with self._lock:
+            in_flight = self._in_flight.get(key)
+            if in_flight is not None:
+                self._metrics['coalesced'] += 1
+                return in_flight, False
+            in_flight = self._in_flight[key] = _InFlight()
+            return in_flight, True
+
+    def _wait(self, in_flight):
+        in_flight.done.wait()
+        if in_flight.error is not None:
+            raise in_flight.error
+        return in_flight.text
+
+    def _finish(self, key, in_flight):
+        with self._lock:
+            del self._in_flight[key]
+        in_flight.done.set()
+
+    def ask(self, prompt_text, images=()):
+        """ MediBot's answer to `prompt_text` and any PIL `images`. """
+        self._count('requests')
+        model_name, content_parts = self._content(prompt_text, images)
+        if images:
+            return self._generate(model_name, content_parts)
+
+        key = cache_key(model_name, SYSTEM_INSTRUCTION, prompt_text)
+        text = self._cached(key)
+        if text is not None:
+            return text
+        in_flight, leader = self._join_or_lead(key)
+        if not leader:
+            return self._wait(in_flight)
+        try:
+            in_flight.text = self._generate(model_name, content_parts)
+            self.cache.put(key, model_name, in_flight.text)
+            return in_flight.text
+        except Exception as e:
+            in_flight.error = e
+            raise
+        finally:
+            self._finish(key, in_flight)
+
+    def stream(self, prompt_text, images=()):
+        """ Like ask(), but yields the answer in chunks as the model produces them.
+
+        Cached answers, and answers shared with an identical prompt already in flight, come as one chunk.
+        """
+        self._count('requests')
+        model_name, content_parts = self._content(prompt_text, images)
+        if images:
+            yield from self._generate_stream(model_name, content_parts)
+            return
+
+        key = cache_key(model_name, SYSTEM_INSTRUCTION, prompt_text)
+        text = self._cached(key)
+        if text is not None:
+            yield text
+            return
+        in_flight, leader = self._join_or_lead(key)
+        if not leader:
+            yield self._wait(in_flight)
+            return
+        chunks = []
+        try:
+            for chunk in self._generate_stream(model_name, content_parts):
+                chunks.append(chunk)
+                yield chunk
+            in_flight.text = ''.join(chunks)
+            self.cache.put(key, model_name, in_flight.text)
+        except GeneratorExit:
+            # The browser went away mid-answer; prompts waiting on it are not left hanging
+            in_flight.error = RuntimeError("the streamed answer was abandoned")
+            raise
+        except Exception as e:
+            in_flight.error = e
+            raise
+        finally:
+            self._finish(key, in_flight)
+
+    def record_stream_timing(self, ttfb_seconds, total_seconds):
+        """ Time to the first streamed chunk and to the end of the answer, as seen by the /prompt route. """
+        with self._lock:
+            self._metrics['streams'] += 1
+            self._metrics['stream_ttfb_seconds_sum'] += ttfb_seconds
+            self._metrics['stream_total_seconds_sum'] += total_seconds
+            self._metrics['last_stream_ttfb_seconds'] = round(ttfb_seconds, 3)
+            self._metrics['last_stream_total_seconds'] = round(total_seconds, 3)
+
+    def metrics(self):
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot['in_flight'] = len(self._in_flight)
+        streams = snapshot.pop('streams')
+        ttfb_sum, total_sum = snapshot.pop('stream_ttfb_seconds_sum'), snapshot.pop('stream_total_seconds_sum')
+        snapshot.update(streams=streams,
+                        avg_stream_ttfb_seconds=round(ttfb_sum / streams, 3) if streams else None,
+                        avg_stream_total_seconds=round(total_sum / streams, 3) if streams else None)
+        snapshot['cached_entries'] = len(self.cache)
+        return snapshot
+
+def get_medibot(app):
+    """ The app's MediBot, built on first use; tests can put a stubbed one in app.extensions['medibot'] first. """
+    with _create_lock:
+        bot = app.extensions.get('medibot')
+        if bot is None:
+            bot = app.extensions['medibot'] = MediBot(
+                gemini_model_factory(app.config['GOOGLE_API_KEY']),
+                ResponseCache(app.config['PROMPT_CACHE_MAX_ENTRIES'], app.config['PROMPT_CACHE_TTL_SECONDS'],
+                              app.config['PROMPT_CACHE_PERSISTENT']),
+                AIGateway(
+                    max_concurrent=app.config['AI_MAX_CONCURRENT'],
+                    queue_timeout_seconds=app.config['AI_QUEUE_TIMEOUT_SECONDS'],
+                    timeout_seconds=app.config['AI_TIMEOUT_SECONDS'],
+                    rate_per_minute=app.config['PROMPT_RATE_PER_MINUTE'],
+                    burst=app.config['PROMPT_BURST'],
+                    breaker_failures=app.config['AI_BREAKER_FAILURES'],
+                    breaker_reset_seconds=app.config['AI_BREAKER_RESET_SECONDS'],
+                ),
+            )
+        return bot
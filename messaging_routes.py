@@ -1,9 +1,44 @@
-from flask import Blueprint, render_template, session, redirect, url_for, jsonify, abort
+from datetime import datetime
+from flask import Blueprint, render_template, session, redirect, url_for, jsonify, abort, request
 from sqlalchemy import or_
 from models import db, User, Doctor, Conversation, Message
 
 messaging = Blueprint('messaging', __name__)
 
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 200
+
+# --- Queries (also checked by `flask check-query-plans`) ---
+
+def doctor_chats_query(doctor_id):
+    return db.session.query(Conversation, User).join(
+        User, User.id == Conversation.user_id
+    ).filter(
+        Conversation.doctor_id == doctor_id
+    ).order_by(Conversation.timestamp.desc())
+
+def conversation_query(user_id, doctor_id):
+    return Conversation.query.filter(
+        (Conversation.user_id == user_id) & (Conversation.doctor_id == doctor_id)
+    )
+
+def chat_history_query(conversation_id, limit, before_id=None, after_id=None, since=None):
+    """ A page of the conversation plus one extra row (to tell whether more exist), and whether it runs newest first.
+
+    after_id/since page forwards through newer messages (reconnect delta);
+    otherwise the page runs backwards from the newest message or from before_id.
+    """
+    query = db.session.query(Message.id, Message.sender_type, Message.text, Message.timestamp, Message.client_id).filter(
+        Message.conversation_id == conversation_id
+    )
+    if after_id is not None:
+        return query.filter(Message.id > after_id).order_by(Message.id.asc()).limit(limit + 1), False
+    if since is not None:
+        return query.filter(Message.timestamp > since).order_by(Message.id.asc()).limit(limit + 1), False
+    if before_id is not None:
+        query = query.filter(Message.id < before_id)
+    return query.order_by(Message.id.desc()).limit(limit + 1), True
+
 # --- Route for the Doctor's list of chats ---
 @messaging.route('/chats')
 def list_chats():
@@ -11,11 +46,7 @@ def list_chats():
         abort(403) # Forbidden for non-doctors
     
     doctor_id = session['doctor_id']
-    conversations_with_users = db.session.query(Conversation, User).join(
-        User, User.id == Conversation.user_id
-    ).filter(
-        Conversation.doctor_id == doctor_id
-    ).order_by(Conversation.timestamp.desc()).all()
+    conversations_with_users = doctor_chats_query(doctor_id).all()
 
     return render_template('doctor_chat_list.html', conversations=conversations_with_users)
 
@@ -39,9 +70,7 @@ def chat_with_recipient(recipient_id):
         convo_doctor_id = doctor_id
 
     # Find or create a conversation
-    conversation = Conversation.query.filter(
-        (Conversation.user_id == convo_user_id) & (Conversation.doctor_id == convo_doctor_id)
-    ).first()
+    conversation = conversation_query(convo_user_id, convo_doctor_id).first()
 
     if not conversation:
         conversation = Conversation(user_id=convo_user_id, doctor_id=convo_doctor_id)
@@ -66,7 +95,31 @@ def get_chat_history(conversation_id):
     if (user_id != conversation.user_id and doctor_id != conversation.doctor_id):
         return jsonify({"error": "Forbidden"}), 403
 
-    messages = Message.query.filter_by(conversation_id=conversation_id).order_by(Message.timestamp.asc()).all()
-    
-    # Return message data as a list of dictionaries
-    return jsonify([msg.to_dict() for msg in messages])
\ No newline at end of file
+    limit = request.args.get('limit', HISTORY_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+    before_id = request.args.get('before_id', type=int)
+    after_id = request.args.get('after_id', type=int)
+    since = request.args.get('since')
+
+    if since:
+        try:
+            since = datetime.fromisoformat(since)
+        except ValueError:
+            return jsonify({"error": "Invalid since timestamp"}), 400
+    else:
+        since = None
+
+    query, newest_first = chat_history_query(conversation_id, limit, before_id, after_id, since)
+    rows = query.all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if newest_first:
+        rows.reverse()
+
+    # Serialize straight from the row tuples; no Message objects are built
+    messages = [
+        {'id': id, 'conversation_id': conversation_id, 'sender_type': sender_type, 'text': text,
+         'timestamp': timestamp.isoformat() if timestamp else None, 'client_id': client_id}
+        for id, sender_type, text, timestamp, client_id in rows
+    ]
+    return jsonify({'messages': messages, 'has_more': has_more})
\ No newline at end of file
@@ -1,3 +1,4 @@
+from datetime import datetime
 from extensions import db
 from sqlalchemy import Date, DateTime, func, Text, ForeignKey, Time, Boolean
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -64,6 +65,12 @@ class Appointment(db.Model):
     status = db.Column(db.String(50), nullable=False, default='Pending') 
     created_at = db.Column(db.DateTime, server_default=func.now())
 
+    __table_args__ = (
+        # Doctor's appointment list and a patient's appointment status page
+        db.Index('ix_appointment_doctor_datetime', 'doctor_id', 'appointment_datetime'),
+        db.Index('ix_appointment_user_datetime', 'user_id', 'appointment_datetime'),
+    )
+
 class VideoCall(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -75,6 +82,14 @@ class VideoCall(db.Model):
     user = db.relationship('User', foreign_keys=[user_id])
     doctor = db.relationship('Doctor', foreign_keys=[doctor_id])
 
+    __table_args__ = (
+        # Scheduler tick: approved calls starting inside each reminder lead's window
+        db.Index('ix_video_call_reminder', 'status', 'scheduled_time'),
+        # Doctor's pending/approved call lists and a patient's call status page
+        db.Index('ix_video_call_doctor_status_time', 'doctor_id', 'status', 'scheduled_time'),
+        db.Index('ix_video_call_user_time', 'user_id', 'scheduled_time'),
+    )
+
 class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     message = db.Column(Text, nullable=False)
@@ -83,6 +98,12 @@ class Notification(db.Model):
     recipient_user_id = db.Column(db.Integer, ForeignKey('user.id'), nullable=True)
     recipient_doctor_id = db.Column(db.Integer, ForeignKey('doctor.id'), nullable=True)
 
+    __table_args__ = (
+        # Unread notifications for one recipient, newest first
+        db.Index('ix_notification_user_unread', 'recipient_user_id', 'is_read', 'timestamp'),
+        db.Index('ix_notification_doctor_unread', 'recipient_doctor_id', 'is_read', 'timestamp'),
+    )
+
 class Conversation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -90,14 +111,30 @@ class Conversation(db.Model):
     messages = db.relationship('Message', backref='conversation', lazy=True, cascade="all, delete-orphan")
     timestamp = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
 
+    __table_args__ = (
+        # Find-or-create lookup when a chat is opened, and the doctor's chat list
+        db.Index('ix_conversation_user_doctor', 'user_id', 'doctor_id'),
+        db.Index('ix_conversation_doctor_timestamp', 'doctor_id', 'timestamp'),
+    )
+
 class Message(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'), nullable=False)
     sender_type = db.Column(db.String(10), nullable=False)
     text = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, server_default=func.now())
+    # Id generated by the sending browser; makes resent messages idempotent within their conversation
+    client_id = db.Column(db.String(64), nullable=True)
+
+    __table_args__ = (
+        db.Index('uq_message_conversation_client', 'conversation_id', 'client_id', unique=True),
+        # Chat history pages (keyset on id) and `since` deltas of one conversation
+        db.Index('ix_message_conversation_id', 'conversation_id', 'id'),
+        db.Index('ix_message_conversation_timestamp', 'conversation_id', 'timestamp'),
+    )
+
     def to_dict(self):
-        return {'id': self.id, 'conversation_id': self.conversation_id, 'sender_type': self.sender_type, 'text': self.text, 'timestamp': self.timestamp.isoformat()}
+        return {'id': self.id, 'conversation_id': self.conversation_id, 'sender_type': self.sender_type, 'text': self.text, 'timestamp': self.timestamp.isoformat(), 'client_id': self.client_id}
 
 class BloodBank(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -128,6 +165,13 @@ class BloodBank(db.Model):
     renewal_date = db.Column(db.String(50), nullable=True)
     latitude = db.Column(db.Float, nullable=True)
     longitude = db.Column(db.Float, nullable=True)
+    # Bumped by import_blood_banks.py whenever a row's contents change
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # Natural key used by the importer to upsert rows
+        db.Index('ix_blood_bank_license_name', 'license_no', 'name', 'district', 'city'),
+    )
 
 class Prescription(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -138,9 +182,15 @@ class Prescription(db.Model):
     notes = db.Column(db.Text, nullable=True)
     medications = db.relationship('Medication', backref='prescription', lazy=True, cascade="all, delete-orphan")
 
+    __table_args__ = (
+        db.Index('ix_prescription_user_date', 'user_id', 'date_prescribed'),
+        db.Index('ix_prescription_doctor_date', 'doctor_id', 'date_prescribed'),
+        db.Index('ix_prescription_video_call', 'video_call_id'),
+    )
+
 class Medication(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    prescription_id = db.Column(db.Integer, db.ForeignKey('prescription.id'), nullable=False)
+    prescription_id = db.Column(db.Integer, db.ForeignKey('prescription.id'), nullable=False, index=True)
     name = db.Column(db.String(200), nullable=False)
     dosage = db.Column(db.String(100), nullable=True)
     frequency = db.Column(db.String(100), nullable=True)
@@ -153,8 +203,19 @@ class Reminder(db.Model):
     reminder_datetime = db.Column(db.DateTime, nullable=False)
     custom_message = db.Column(db.Text, nullable=True)
     is_sent = db.Column(db.Boolean, default=False, nullable=False)
+    # Set in the same UPDATE that flips is_sent, so only one scheduler process claims a reminder
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    # Set instead of sending when a claimed reminder cannot be delivered (e.g. its user row is gone)
+    failed_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, server_default=func.now())
 
+    __table_args__ = (
+        # Scheduler tick: unsent reminders that are due
+        db.Index('ix_reminder_due', 'is_sent', 'reminder_datetime'),
+        # A user's upcoming reminders
+        db.Index('ix_reminder_user_pending', 'user_id', 'is_sent', 'reminder_datetime'),
+    )
+
 class PromptHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True) # Can be for a user
@@ -171,5 +232,78 @@ class PromptHistory(db.Model):
     user = db.relationship('User', backref='prompt_history', foreign_keys=[user_id])
     doctor = db.relationship('Doctor', backref='doctor_prompt_history', foreign_keys=[doctor_id])
 
+    __table_args__ = (
+        db.Index('ix_prompt_history_user_timestamp', 'user_id', 'timestamp'),
+    )
+
     def __repr__(self):
-        return f"<PromptHistory {self.id} User:{self.user_id} Doctor:{self.doctor_id}>"
\ No newline at end of file
+        return f"<PromptHistory {self.id} User:{self.user_id} Doctor:{self.doctor_id}>"
+
+class OutboxEmail(db.Model):
+    """ Email queued by a request handler and delivered by the background mail dispatcher. """
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    sender = db.Column(db.String(120), nullable=True)
+    recipients = db.Column(db.Text, nullable=False) # Comma-separated addresses
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending') # pending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # When the row may next be picked up; also serves as the claim lease while sending
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_outbox_email_due', 'status', 'next_attempt_at'),
+    )
+
+class SchedulerLease(db.Model):
+    """ Lock row for leader election: only the process holding an unexpired lease runs the scheduled jobs. """
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(120), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    heartbeat_at = db.Column(db.DateTime, nullable=False)
+
+class JobCheckpoint(db.Model):
+    """ Persisted high-water mark of a scheduled job: everything due up to `high_water` has been handled.
+
+    The job's counters live on the same row, so any process can report what the leader did.
+    """
+    name = db.Column(db.String(50), primary_key=True)
+    high_water = db.Column(db.DateTime, nullable=False)
+    runs = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    sent = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    failed = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Runs dropped because another process advanced the mark first
+    conflicts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_skew_seconds = db.Column(db.Float, nullable=True)
+    last_lateness_seconds = db.Column(db.Float, nullable=True)
+    max_lateness_seconds = db.Column(db.Float, nullable=True)
+
+class TempArtifact(db.Model):
+    """ Manifest entry for a file in temp_uploads/; the janitor deletes it once it expires or the disk quota is exceeded. """
+    filename = db.Column(db.String(255), primary_key=True)
+    call_id = db.Column(db.Integer, nullable=True)
+    size_bytes = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        # Janitor sweep of expired files, and expiring a call's files when it ends
+        db.Index('ix_temp_artifact_expires', 'expires_at'),
+        db.Index('ix_temp_artifact_call', 'call_id'),
+    )
+
+class PromptCacheEntry(db.Model):
+    """ Persistent tier of the MediBot response cache, keyed on a hash of model, system instruction and normalized prompt. """
+    key = db.Column(db.String(64), primary_key=True)
+    model_name = db.Column(db.String(50), nullable=False)
+    response_text = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+class DashboardVersion(db.Model):
+    """ Bumped in the same transaction as any change to a user's dashboard data; keys the dashboard cache and ETag. """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,16 @@
+from extensions import socketio
+
+def recipient_room(user_id=None, doctor_id=None):
+    """ Socket.IO room every connection of a user or doctor joins on connect. """
+    if user_id:
+        return f"user_{user_id}"
+    if doctor_id:
+        return f"doctor_{doctor_id}"
+    return None
+
+def push_notifications(*notifications):
+    """ Pushes freshly committed notifications to their recipients' rooms. """
+    for notification in notifications:
+        room = recipient_room(user_id=notification.recipient_user_id, doctor_id=notification.recipient_doctor_id)
+        if room:
+            socketio.emit('notification', {'id': notification.id, 'message': notification.message}, to=room)
@@ -0,0 +1,52 @@
+import sqlite3
+from extensions import socketio
+
+def run_blocking(fn, *args, **kwargs):
+    """ Calls `fn` on a native OS thread when Socket.IO runs on green threads (eventlet/gevent).
+
+    Monkeypatching makes sockets cooperative, but C extensions and gRPC (PIL, pdf2image, the Gemini
+    client) still hold the only OS thread, stalling every connection on the worker until they return.
+    In threading mode `fn` simply runs in place. `fn` must not rely on the Flask app or request context.
+    """
+    mode = getattr(socketio, 'async_mode', None)
+    if mode == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute(fn, *args, **kwargs)
+    if mode == 'gevent':
+        import gevent
+        return gevent.get_hub().threadpool.apply(fn, args, kwargs)
+    return fn(*args, **kwargs)
+
+class BlockingProxy:
+    """ Wraps a DB-API connection or cursor so every method call goes through run_blocking.
+
+    sqlite3 is a C extension: under eventlet or gevent each query and commit would otherwise hold the
+    worker's only OS thread. Attributes (rowcount, description, isolation_level) pass straight through.
+    """
+
+    def __init__(self, target):
+        object.__setattr__(self, '_target', target)
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if not callable(value):
+            return value
+
+        def call(*args, **kwargs):
+            result = run_blocking(value, *args, **kwargs)
+            # Cursors returned by cursor() and execute() are wrapped too, so fetches run off the loop as well
+            return BlockingProxy(result) if isinstance(result, sqlite3.Cursor) else result
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+def blocking_sqlite_creator(path):
+    """ SQLAlchemy `creator` for the green-thread servers: SQLite connections whose calls run on native threads. """
+    def connect():
+        # Each call may run on a different pool thread; the SQLAlchemy pool still gives a connection to one user at a time
+        return BlockingProxy(sqlite3.connect(path, check_same_thread=False))
+    return connect
@@ -0,0 +1,43 @@
+""" Preprocessing of images attached to MediBot prompts: downsampled, stripped of metadata, stored once per content. """
+import hashlib
+import io
+import os
+import uuid
+from PIL import Image, ImageOps
+
+# Used when PROMPT_IMAGE_MAX_DIMENSION is not configured; the model gains nothing from larger images
+DEFAULT_MAX_DIMENSION = 1536
+STORED_QUALITY = 80
+
+def content_digest(image_bytes):
+    return hashlib.sha256(image_bytes).hexdigest()
+
+def prepare_prompt_image(image_bytes, max_dimension=DEFAULT_MAX_DIMENSION):
+    """ Decodes an upload at no more than `max_dimension` on the long side, upright and without EXIF. """
+    image = Image.open(io.BytesIO(image_bytes))
+    # JPEGs (most phone photos) decode straight at a fraction of their size, which is most of the saving
+    image.draft('RGB', (max_dimension, max_dimension))
+    # Rotate by the EXIF orientation before the metadata is dropped
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_dimension, max_dimension))
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+    # A fresh copy of the pixels carries no EXIF, GPS or other metadata
+    clean = Image.new(image.mode, image.size)
+    clean.paste(image)
+    return clean
+
+def stored_filename(digest):
+    return f"{digest}.webp"
+
+def save_prompt_image(image, digest, folder):
+    """ Writes the image as `<digest>.webp` in `folder` unless that content is already stored. """
+    path = os.path.join(folder, stored_filename(digest))
+    if os.path.exists(path):
+        return path
+    os.makedirs(folder, exist_ok=True)
+    # Write under a temporary name so a concurrent reader never sees a partial file
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    image.save(tmp_path, 'WEBP', quality=STORED_QUALITY)
+    os.replace(tmp_path, path)
+    return path
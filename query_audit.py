@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+import click
+from flask.cli import with_appcontext
+from extensions import db
+from models import TempArtifact
+
+def hot_queries():
+    """ The queries run on every poll, scheduler tick or page load, by name, built by the code that runs them. """
+    from call_reminders import DEFAULT_LEAD_MINUTES, due_calls_query
+    from chat_buffer import stored_messages_query
+    from dashboard_routes import dashboard_counts_query, prompt_history_query
+    from doctor_routes import doctor_appointments_query
+    from main_routes import NOTIFICATION_PAGE_SIZE, unread_notifications_query, user_appointments_query
+    from messaging_routes import HISTORY_PAGE_SIZE, chat_history_query, conversation_query, doctor_chats_query
+    from reminder_engine import WINDOW, due_reminders_query, due_window_query
+    from reminder_routes import upcoming_reminders_query
+    from temp_janitor import ENDED_CALL_GRACE, expire_statement, expired_artifacts_query
+    from video_call_routes import doctor_calls_query
+    now = datetime.now()
+    # Every lead's window open, as on the first tick after a short stall
+    call_reminder_marks = {lead: now - timedelta(seconds=15) for lead in DEFAULT_LEAD_MINUTES}
+    return {
+        'notifications for a user': unread_notifications_query(user_id=1).limit(NOTIFICATION_PAGE_SIZE),
+        'notifications for a doctor': unread_notifications_query(doctor_id=1).limit(NOTIFICATION_PAGE_SIZE),
+        'chat history page': chat_history_query(1, HISTORY_PAGE_SIZE, before_id=1000)[0],
+        'chat history delta': chat_history_query(1, HISTORY_PAGE_SIZE, since=now)[0],
+        'chat reconnect delta': chat_history_query(1, HISTORY_PAGE_SIZE, after_id=1000)[0],
+        'chat write-behind ack lookup': stored_messages_query({(1, 'a'), (2, 'b')}),
+        'conversation lookup': conversation_query(1, 1),
+        'doctor chat list': doctor_chats_query(1),
+        'due medication reminders': due_reminders_query(now),
+        'reminder engine window': due_window_query(now + WINDOW),
+        'upcoming reminders for a user': upcoming_reminders_query(1),
+        'call reminders': due_calls_query(DEFAULT_LEAD_MINUTES, call_reminder_marks, now),
+        'doctor call requests': doctor_calls_query(1, 'Pending'),
+        'doctor appointments': doctor_appointments_query(1),
+        'user appointments': user_appointments_query(1),
+        'dashboard prompt history': prompt_history_query(1),
+        'dashboard counts': dashboard_counts_query(1),
+        'expired temp uploads': expired_artifacts_query(now),
+        'temp uploads of a call': expire_statement(TempArtifact.call_id == 1, now + ENDED_CALL_GRACE),
+    }
+
+def explain(query):
+    """ SQLite's EXPLAIN QUERY PLAN detail lines for a SQLAlchemy query. """
+    # render_postcompile expands IN lists into one placeholder per value
+    # ORM queries carry their statement; Core selects and updates are statements already
+    statement = getattr(query, 'statement', query)
+    compiled = statement.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+    return [row[-1] for row in rows]
+
+def full_scans(plan):
+    # "SCAN <table>" means every row is visited; SEARCH steps use an index.
+    # Scanning a subquery's own result ("SCAN anon_1") reads no table.
+    return [step for step in plan if step.startswith('SCAN') and 'CONSTANT ROW' not in step
+            and not step.startswith('SCAN anon_')]
+
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans_command():
+    """ Fails if any hot query falls back to a full table scan. """
+    failures = 0
+    for name, query in hot_queries().items():
+        plan = explain(query)
+        scans = full_scans(plan)
+        status = 'SCAN' if scans else 'ok'
+        click.echo(f"[{status:>4}] {name}: {'; '.join(plan)}")
+        failures += bool(scans)
+    if failures:
+        raise click.ClickException(f"{failures} hot queries fall back to a table scan.")
@@ -0,0 +1,192 @@
+import heapq
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, select, update
+from extensions import db
+from models import JobCheckpoint, Reminder, User, Medication
+from mail_queue import enqueue_mail
+from job_stats import ensure_checkpoint, run_values, snapshot
+
+# How far ahead due times are loaded into the heap, and how many at most.
+WINDOW = timedelta(minutes=10)
+MAX_HEAP_SIZE = 10000
+# Reload the window this often to pick up reminders created by other processes.
+REFRESH_SECONDS = 30
+# Reminders claimed and queued per transaction.
+CLAIM_BATCH_SIZE = 500
+
+# Counters live on this job_checkpoint row, so every process reports the leader's work
+CHECKPOINT = 'medication_reminders'
+
+_engine = None
+
+def _reminder_body(reminder, user, med):
+    if med:
+        msg_body = (f"Hello {user.full_name},\n\nThis is your reminder to take your medication:\n\n- Medication: {med.name}\n- Dosage: {med.dosage or 'As prescribed'}\n\n")
+        if reminder.custom_message:
+            msg_body += f"Your personal note: '{reminder.custom_message}'\n"
+    else:
+        msg_body = (f"Hello {user.full_name},\n\nThis is your custom reminder from CareSync:\n\n'{reminder.custom_message}'\n")
+    return msg_body
+
+def due_reminders_query(now, limit=CLAIM_BATCH_SIZE):
+    """ Ids of the oldest `limit` unsent reminders due by `now`. """
+    return select(Reminder.id).where(
+        Reminder.is_sent == False, Reminder.reminder_datetime <= now
+    ).order_by(Reminder.reminder_datetime).limit(limit)
+
+def due_window_query(horizon):
+    """ Due times of the unsent reminders before `horizon`, for the engine's heap. """
+    return db.session.query(Reminder.reminder_datetime, Reminder.id).filter(
+        Reminder.is_sent == False, Reminder.reminder_datetime < horizon
+    ).order_by(Reminder.reminder_datetime).limit(MAX_HEAP_SIZE)
+
+def claim_due_reminders(now, limit=CLAIM_BATCH_SIZE):
+    """ Marks up to `limit` due reminders as sent and returns their ids; concurrent callers never get the same row. """
+    return db.session.execute(
+        update(Reminder)
+        .where(Reminder.id.in_(due_reminders_query(now, limit)), Reminder.is_sent == False)
+        .values(is_sent=True, claimed_at=now)
+        .returning(Reminder.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+
+def _fail_undeliverable(claimed, delivered, now):
+    """ Marks claimed reminders that had no user row as failed rather than sent, and logs them. """
+    missing = set(claimed) - delivered
+    if not missing:
+        return 0
+    db.session.execute(
+        update(Reminder)
+        .where(Reminder.id.in_(missing))
+        .values(failed_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    current_app.logger.warning(f"Medication reminders {sorted(missing)} have no user; marked as failed.")
+    return len(missing)
+
+def dispatch_due_reminders():
+    """ Claims every due reminder in batches and queues its email in the same transaction. """
+    dispatched = 0
+    ensure_checkpoint(CHECKPOINT, datetime.now())
+    while True:
+        now = datetime.now()
+        claimed = claim_due_reminders(now)
+        if not claimed:
+            db.session.commit()
+            break
+        rows = db.session.query(Reminder, User, Medication).join(
+            User, User.id == Reminder.user_id
+        ).outerjoin(
+            Medication, Medication.id == Reminder.medication_id
+        ).filter(Reminder.id.in_(claimed)).all()
+        max_lateness = None
+        for reminder, user, med in rows:
+            enqueue_mail("Medication Reminder from CareSync", [user.email], _reminder_body(reminder, user, med))
+            lateness = (now - reminder.reminder_datetime).total_seconds()
+            max_lateness = lateness if max_lateness is None else max(max_lateness, lateness)
+        failed = _fail_undeliverable(claimed, {reminder.id for reminder, user, med in rows}, now)
+        db.session.execute(
+            update(JobCheckpoint)
+            .where(JobCheckpoint.name == CHECKPOINT)
+            .values(high_water=now, **run_values(len(rows), failed, lateness=max_lateness))
+            .execution_options(synchronize_session=False)
+        )
+        # The claim, the queued emails and the counters commit together; the mail dispatcher fans the sends out.
+        db.session.commit()
+        dispatched += len(rows)
+        if len(claimed) < CLAIM_BATCH_SIZE:
+            break
+    return dispatched
+
+def metrics():
+    """ Dispatch counters from the checkpoint row and the reminders due within the engine's window. """
+    checkpoint = db.session.get(JobCheckpoint, CHECKPOINT)
+    stats = snapshot(checkpoint) if checkpoint else {}
+    stats['due_soon'] = db.session.execute(
+        select(func.count(Reminder.id)).where(Reminder.is_sent == False, Reminder.reminder_datetime < datetime.now() + WINDOW)
+    ).scalar()
+    return stats
+
+class ReminderEngine:
+    """ Sleeps until the next due reminder using an in-memory min-heap of upcoming due times. """
+
+    def __init__(self, app):
+        self.app = app
+        self.heap = []
+        self._window_end = None
+        self._next_refresh = datetime.min
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='reminder-engine', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def refresh(self):
+        """ Reloads the heap on the next loop, e.g. after new reminders were created. """
+        self._next_refresh = datetime.min
+        self._wake.set()
+
+    def _load_window(self, now):
+        horizon = now + WINDOW
+        due_times = due_window_query(horizon).all()
+        self.heap = [tuple(row) for row in due_times]
+        heapq.heapify(self.heap)
+        # A full heap only covers up to its last entry; reload once that is reached.
+        self._window_end = due_times[-1][0] if len(due_times) == MAX_HEAP_SIZE else horizon
+        self._next_refresh = min(now + timedelta(seconds=REFRESH_SECONDS), self._window_end)
+        db.session.commit()
+
+    def tick(self):
+        now = datetime.now()
+        if now >= self._next_refresh:
+            self._load_window(now)
+        if self.heap and self.heap[0][0] <= now:
+            while self.heap and self.heap[0][0] <= now:
+                heapq.heappop(self.heap)
+            dispatch_due_reminders()
+
+    def _seconds_until_next(self):
+        now = datetime.now()
+        wake_at = self._next_refresh
+        if self.heap and self.heap[0][0] < wake_at:
+            wake_at = self.heap[0][0]
+        return max((wake_at - now).total_seconds(), 0.0)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    self.tick()
+            except Exception as e:
+                self.app.logger.error(f"Reminder engine error: {e}", exc_info=True)
+                self._next_refresh = datetime.now() + timedelta(seconds=REFRESH_SECONDS)
+            self._wake.wait(self._seconds_until_next())
+            self._wake.clear()
+
+def start_reminder_engine(app):
+    global _engine
+    if _engine is None:
+        _engine = ReminderEngine(app)
+        _engine.start()
+    return _engine
+
+def stop_reminder_engine():
+    global _engine
+    if _engine is not None:
+        _engine.stop()
+        _engine = None
+
+def notify_reminders_changed():
+    """ Lets a running engine pick up reminders created in this process without waiting for a refresh. """
+    if _engine is not None:
+        _engine.refresh()
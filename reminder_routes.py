@@ -1,9 +1,17 @@
 from flask import Blueprint, session, redirect, url_for, request, jsonify
 from models import db, Reminder, Medication, Prescription, User
 from datetime import datetime
+from reminder_engine import notify_reminders_changed
 
 reminder = Blueprint('reminder', __name__)
 
+def upcoming_reminders_query(user_id):
+    """ A user's unsent reminders, soonest first (also checked by `flask check-query-plans`). """
+    return Reminder.query.filter(
+        Reminder.user_id == user_id,
+        Reminder.is_sent == False
+    ).order_by(Reminder.reminder_datetime.asc())
+
 @reminder.route('/reminders/create', methods=['POST'])
 def create_reminders():
     if 'user_id' not in session:
@@ -31,6 +39,7 @@ def create_reminders():
                 db.session.add(new_reminder)
         
         db.session.commit()
+        notify_reminders_changed()
         return jsonify({'message': 'Reminders set successfully!'})
     except Exception as e:
         db.session.rollback()
@@ -43,10 +52,7 @@ def get_reminders():
     if 'user_id' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    reminders = Reminder.query.filter(
-        Reminder.user_id == session['user_id'],
-        Reminder.is_sent == False
-    ).order_by(Reminder.reminder_datetime.asc()).all()
+    reminders = upcoming_reminders_query(session['user_id']).all()
 
     results = []
     for rem in reminders:
@@ -1,62 +1,66 @@
-from datetime import datetime, timedelta, date
-from extensions import db, mail
-from models import VideoCall, User, Doctor, Reminder, Medication
-from flask_mail import Message
-import os
+import atexit
+import signal
+import threading
+from apscheduler.schedulers.background import BackgroundScheduler
+from call_reminders import process_call_reminders, DEFAULT_LEAD_MINUTES
+from reminder_engine import dispatch_due_reminders, start_reminder_engine, stop_reminder_engine
+from leader import LeaderLease
+
+# Short enough that the one-minute reminder is never more than a few seconds late
+CALL_REMINDER_INTERVAL_SECONDS = 15
 
 def send_call_reminders(app):
+    """ Catches up on every call reminder that fell due since the last run, for each configured lead time. """
     with app.app_context():
-        now = datetime.now()
-        reminder_window_start = now + timedelta(minutes=1)
-        reminder_window_end = now + timedelta(minutes=2)
-        calls_to_remind = VideoCall.query.filter(
-            VideoCall.status == 'Approved',
-            VideoCall.reminder_sent == False,
-            VideoCall.scheduled_time >= reminder_window_start,
-            VideoCall.scheduled_time < reminder_window_end
-        ).all()
-        if not calls_to_remind: return
-        sender_email = os.getenv('MAIL_USERNAME')
-        for call in calls_to_remind:
-            user = User.query.get(call.user_id)
-            doctor = Doctor.query.get(call.doctor_id)
-            if not user or not doctor: continue
-            msg_user = Message('Reminder: Your Video Call is about to start!', sender=sender_email, recipients=[user.email])
-            msg_user.body = f"Hello {user.full_name},\n\nThis is a reminder that your video call with Dr. {doctor.full_name} is starting in one minute. The 'Join Call' button is now active."
-            mail.send(msg_user)
-            msg_doc = Message('Reminder: Your Video Call is about to start!', sender=sender_email, recipients=[doctor.email])
-            msg_doc.body = f"Hello Dr. {doctor.full_name},\n\nThis is a reminder that your video call with {user.full_name} is starting in one minute. The 'Join Call' button is now active."
-            mail.send(msg_doc)
-            call.reminder_sent = True
-        db.session.commit()
+        leads = app.config.get('CALL_REMINDER_LEAD_MINUTES') or DEFAULT_LEAD_MINUTES
+        return process_call_reminders(leads, CALL_REMINDER_INTERVAL_SECONDS)
 
 def send_medication_reminders(app):
+    """ One pass over every due reminder; the reminder engine normally runs this as reminders fall due. """
     with app.app_context():
-        now = datetime.now()
-        reminders_to_send = Reminder.query.filter(
-            Reminder.is_sent == False,
-            Reminder.reminder_datetime <= now
-        ).all()
-        if not reminders_to_send: return
-        sender_email = os.getenv('MAIL_USERNAME')
-        for reminder in reminders_to_send:
-            user = User.query.get(reminder.user_id)
-            if reminder.medication_id:
-                med = Medication.query.get(reminder.medication_id)
-                msg_body = (f"Hello {user.full_name},\n\nThis is your reminder to take your medication:\n\n- Medication: {med.name}\n- Dosage: {med.dosage or 'As prescribed'}\n\n")
-                if reminder.custom_message:
-                    msg_body += f"Your personal note: '{reminder.custom_message}'\n"
-            else:
-                msg_body = (f"Hello {user.full_name},\n\nThis is your custom reminder from CareSync:\n\n'{reminder.custom_message}'\n")
-            msg = Message("Medication Reminder from CareSync", sender=sender_email, recipients=[user.email])
-            msg.body = msg_body
-            mail.send(msg)
-            reminder.is_sent = True
-            try:
-                mail.send(msg)
-                print(f"--- DEBUG: Sent reminder email to {user.email} ---")
-                reminder.is_sent = True
-            except Exception as e:
-                print(f"--- DEBUG: FAILED to send reminder email to {user.email}. Error: {e} ---")
-                
-        db.session.commit()
\ No newline at end of file
+        return dispatch_due_reminders()
+
+# --- Job runner, active only in the process holding the scheduler lease ---
+_jobs = None
+
+def _start_job_runner(app):
+    global _jobs
+    _jobs = BackgroundScheduler()
+    _jobs.add_job(send_call_reminders, "interval", seconds=CALL_REMINDER_INTERVAL_SECONDS, args=[app],
+                  coalesce=True, max_instances=1)
+    _jobs.start()
+    # Medication reminders wake on their due time instead of a fixed interval
+    start_reminder_engine(app)
+
+def _stop_job_runner():
+    global _jobs
+    if _jobs is not None:
+        _jobs.shutdown(wait=False)
+        _jobs = None
+    stop_reminder_engine()
+
+def start_jobs(app):
+    """ Joins the scheduler leader election; the jobs run only while this process holds the lease. """
+    lease = LeaderLease(app, 'scheduler', on_elected=lambda: _start_job_runner(app), on_revoked=_stop_job_runner)
+    lease.start()
+    atexit.register(lease.stop)
+    return lease
+
+def run_standalone():
+    """ Runs the jobs and the mail dispatcher without the web server, until SIGINT/SIGTERM. """
+    from app import create_app
+    from mail_queue import start_mail_dispatcher
+    app = create_app()
+    start_mail_dispatcher(app)
+    lease = start_jobs(app)
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stopping.set())
+    signal.signal(signal.SIGINT, lambda *args: stopping.set())
+    print(f"Scheduler {lease.holder} started; waiting for the lease.")
+    stopping.wait()
+    lease.stop()
+
+if __name__ == '__main__':
+    # Run through the module name so app.py and this entry point share one copy of the job state
+    import scheduler
+    scheduler.run_standalone()
@@ -0,0 +1,81 @@
+""" Production entry point: Socket.IO on eventlet or gevent, no debugger, no reloader.
+
+    python serve.py --workers 4 --port 5000 --async-mode eventlet
+
+Each worker is a separate process on its own port (5000, 5001, ...). Put a load balancer with
+sticky sessions in front of them and set SOCKETIO_MESSAGE_QUEUE so rooms span all workers.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run CareSync with a production Socket.IO server.")
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_WORKERS', 1)))
+    parser.add_argument('--async-mode', choices=['eventlet', 'gevent'], default=os.getenv('SOCKETIO_ASYNC_MODE', 'eventlet'))
+    # eventlet's WSGI server otherwise stops accepting at 1024 concurrent connections
+    parser.add_argument('--max-connections', type=int, default=int(os.getenv('MAX_CONNECTIONS', 10000)))
+    return parser.parse_args()
+
+def run_worker(host, port, async_mode, max_connections):
+    # Patch before the app (and with it SQLAlchemy, smtplib, requests) is imported
+    if async_mode == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+    else:
+        from gevent import monkey
+        monkey.patch_all()
+
+    from app import create_app
+    from extensions import socketio
+    from mail_queue import start_mail_dispatcher
+    from scheduler import start_jobs
+    from temp_janitor import start_temp_janitor
+
+    app = create_app(async_mode)
+    start_mail_dispatcher(app)
+    # Uploads live on this worker's disk, so each worker sweeps them itself
+    start_temp_janitor(app)
+    # Leader election keeps the jobs on one process however many workers start them
+    if os.getenv('RUN_SCHEDULER', 'true').lower() == 'true':
+        start_jobs(app)
+
+    server_options = {}
+    if os.getenv('SSL_CERTFILE') and os.getenv('SSL_KEYFILE'):
+        server_options.update(certfile=os.getenv('SSL_CERTFILE'), keyfile=os.getenv('SSL_KEYFILE'))
+    if async_mode == 'eventlet':
+        server_options['max_size'] = max_connections
+    print(f"CareSync worker {os.getpid()} serving on {host}:{port} ({async_mode})")
+    socketio.run(app, host=host, port=port, debug=False, use_reloader=False, log_output=False, **server_options)
+
+def run_workers(args):
+    if not os.getenv('SOCKETIO_MESSAGE_QUEUE'):
+        sys.exit("Several workers need SOCKETIO_MESSAGE_QUEUE (e.g. redis://localhost:6379/0) so rooms span processes.")
+    env = dict(os.environ, WEB_WORKERS='1')
+    workers = [
+        subprocess.Popen([sys.executable, __file__, '--host', args.host, '--port', str(args.port + i),
+                          '--workers', '1', '--async-mode', args.async_mode,
+                          '--max-connections', str(args.max_connections)], env=env)
+        for i in range(args.workers)
+    ]
+
+    def forward(signum, frame):
+        for worker in workers:
+            worker.send_signal(signum)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    sys.exit(max(worker.wait() for worker in workers))
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    load_dotenv()
+    args = parse_args()
+    if args.workers > 1:
+        run_workers(args)
+    else:
+        run_worker(args.host, args.port, args.async_mode, args.max_connections)
@@ -0,0 +1,92 @@
+import uuid
+from datetime import datetime, timezone
+from flask import session, request, current_app
+from flask_socketio import emit, join_room, leave_room
+from extensions import socketio
+from notifications import recipient_room
+from chat_buffer import get_chat_buffer
+from temp_janitor import expire_call_artifacts
+
+# --- Socket.IO Event Handlers ---
+
+def _participants():
+    return current_app.extensions['call_participants']
+
+def handle_connect():
+    # Per-recipient room so notifications can be pushed instead of polled
+    room = recipient_room(user_id=session.get('user_id'), doctor_id=session.get('doctor_id'))
+    if room:
+        join_room(room)
+
+def handle_join_call_room(data):
+    call_id = data.get('call_id')
+    if not call_id: return
+    room = f"call_{call_id}"
+    join_room(room)
+    if _participants().join(call_id, request.sid) == 2:
+        emit('peers_ready', {'initiator_sid': request.sid}, to=room)
+
+def handle_webrtc_signal(data):
+    call_id = data.get('call_id')
+    if not call_id: return
+    room = f"call_{call_id}"
+    emit('webrtc_signal', {'from_sid': request.sid, 'payload': data.get('payload')}, to=room, include_self=False)
+
+def handle_share_document(data):
+    call_id = data.get('call_id')
+    if not call_id: return
+    room = f"call_{call_id}"
+    emit('document_shared', {'urls': data.get('urls')}, to=room, include_self=False)
+
+def _expire_after_call(app, call_id):
+    try:
+        with app.app_context():
+            expire_call_artifacts(call_id)
+    except Exception as e:
+        print(f"--- ERROR: Failed to expire files of call {call_id}: {e} ---")
+
+def _leave_call(call_id, sid):
+    room = f"call_{call_id}"
+    emit('peer_left', {'sid': sid}, to=room)
+    if _participants().leave(call_id, sid) == 0:
+        # The janitor deletes the call's shared pages on its next run; the UPDATE stays off the event handler
+        socketio.start_background_task(_expire_after_call, current_app._get_current_object(), call_id)
+
+def handle_leave_call_room(data):
+    call_id = data.get('call_id')
+    if not call_id: return
+    leave_room(f"call_{call_id}")
+    _leave_call(call_id, request.sid)
+
+def handle_disconnect():
+    # A closed tab never sends leave_call_room; drop it from its calls so the counts stay right
+    for call_id in _participants().calls_of(request.sid):
+        _leave_call(call_id, request.sid)
+
+def handle_join_chat(data):
+    conversation_id = data['conversation_id']
+    room = f"chat_{conversation_id}"
+    join_room(room)
+
+def handle_send_message(data):
+    conversation_id = int(data['conversation_id'])
+    text = data['text']
+    sender_type = data['sender_type']
+    client_id = str(data.get('client_id') or uuid.uuid4())[:64]
+    room = f'chat_{conversation_id}'
+    # Same clock as the column's CURRENT_TIMESTAMP default (UTC)
+    timestamp = datetime.now(timezone.utc).replace(tzinfo=None)
+    # Relay first; the row is written behind and acked to the room with its id
+    emit('new_message', { 'client_id': client_id, 'conversation_id': conversation_id, 'text': text, 'sender_type': sender_type, 'timestamp': timestamp.isoformat() }, to=room, include_self=False)
+    get_chat_buffer(current_app._get_current_object()).submit({'client_id': client_id, 'conversation_id': conversation_id, 'sender_type': sender_type, 'text': text, 'timestamp': timestamp})
+
+def register_socket_handlers(socketio):
+    """ Attaches the handlers; call before socketio.init_app() so every server it creates gets them. """
+    socketio.on('connect')(handle_connect)
+    socketio.on('join_call_room')(handle_join_call_room)
+    socketio.on('webrtc_signal')(handle_webrtc_signal)
+    socketio.on('share_document')(handle_share_document)
+    socketio.on('leave_call_room')(handle_leave_call_room)
+    socketio.on('disconnect')(handle_disconnect)
+    socketio.on('join_chat')(handle_join_chat)
+    socketio.on('send_message')(handle_send_message)
@@ -6,7 +6,22 @@ document.addEventListener('DOMContentLoaded', () => {
     const detailsContainer = document.getElementById('details-container');
     const loader = document.getElementById('loader');
 
-    let allBanksData = []; // Cache the fetched data
+    // The list only needs these; full details are fetched per bank on click.
+    const LIST_FIELDS = 'id,name,city,state,distance';
+    const PAGE_SIZE = 50;
+
+    let currentQuery = null; // Query string of the list being shown
+    let nextCursor = null;
+    let isLoadingPage = false;
+    let searchDebounce = null;
+
+    const buildQuery = (searchTerm, lat, lng) => {
+        let url = `/api/blood-banks?search=${encodeURIComponent(searchTerm)}&fields=${LIST_FIELDS}&limit=${PAGE_SIZE}`;
+        if (lat && lng) {
+            url += `&lat=${lat}&lng=${lng}`;
+        }
+        return url;
+    };
 
     const fetchBloodBanks = (searchTerm = '', lat = null, lng = null) => {
         loader.style.display = 'flex';
@@ -14,29 +29,39 @@ document.addEventListener('DOMContentLoaded', () => {
         listContainer.appendChild(loader);
         showPlaceholder();
 
-        let url = `/api/blood-banks?search=${encodeURIComponent(searchTerm)}`;
-        if (lat && lng) {
-            url += `&lat=${lat}&lng=${lng}`;
-        }
+        currentQuery = buildQuery(searchTerm, lat, lng);
+        nextCursor = null;
+        loadPage(currentQuery, null, true);
+    };
+
+    const loadPage = (query, cursor, replace) => {
+        isLoadingPage = true;
+        const url = cursor ? `${query}&cursor=${encodeURIComponent(cursor)}` : query;
 
         fetch(url)
             .then(response => response.json())
             .then(data => {
-                allBanksData = data;
-                renderList(allBanksData);
+                if (query !== currentQuery) return; // A newer search superseded this one
+                nextCursor = data.next_cursor;
+                renderList(data.results, replace);
             })
             .catch(error => {
                 console.error('Error fetching blood banks:', error);
                 listContainer.innerHTML = '<p class="error-message">Could not load data. Please try again.</p>';
+            })
+            .finally(() => {
+                isLoadingPage = false;
             });
     };
 
-    const renderList = (banks) => {
+    const renderList = (banks, replace = true) => {
         loader.style.display = 'none';
-        listContainer.innerHTML = '';
-        if (banks.length === 0) {
-            listContainer.innerHTML = '<p class="no-results">No blood banks found.</p>';
-            return;
+        if (replace) {
+            listContainer.innerHTML = '';
+            if (banks.length === 0) {
+                listContainer.innerHTML = '<p class="no-results">No blood banks found.</p>';
+                return;
+            }
         }
 
         banks.forEach(bank => {
@@ -98,14 +123,26 @@ document.addEventListener('DOMContentLoaded', () => {
         const targetItem = event.target.closest('.list-item');
         if (targetItem) {
             const bankId = parseInt(targetItem.dataset.id, 10);
-            const bankData = allBanksData.find(b => b.id === bankId);
 
             document.querySelectorAll('.list-item.active').forEach(item => item.classList.remove('active'));
             targetItem.classList.add('active');
 
-            if (bankData) {
-                renderDetails(bankData);
-            }
+            fetch(`/api/blood-banks/${bankId}`)
+                .then(response => response.json())
+                .then(bankData => {
+                    if (targetItem.classList.contains('active')) {
+                        renderDetails(bankData);
+                    }
+                })
+                .catch(error => console.error('Error fetching blood bank details:', error));
+        }
+    });
+
+    // Fetch the next page when the list is scrolled near its end
+    listContainer.addEventListener('scroll', () => {
+        const nearBottom = listContainer.scrollTop + listContainer.clientHeight >= listContainer.scrollHeight - 200;
+        if (nearBottom && nextCursor && !isLoadingPage) {
+            loadPage(currentQuery, nextCursor, false);
         }
     });
 
@@ -124,10 +161,14 @@ document.addEventListener('DOMContentLoaded', () => {
     });
 
     searchInput.addEventListener('input', () => {
-        const searchTerm = searchInput.value;
-        const lat = (filterNearbyBtn.classList.contains('active') && userCoords) ? userCoords.latitude : null;
-        const lng = (filterNearbyBtn.classList.contains('active') && userCoords) ? userCoords.longitude : null;
-        fetchBloodBanks(searchTerm, lat, lng);
+        // Wait for a pause in typing instead of fetching on every keystroke
+        clearTimeout(searchDebounce);
+        searchDebounce = setTimeout(() => {
+            const searchTerm = searchInput.value;
+            const lat = (filterNearbyBtn.classList.contains('active') && userCoords) ? userCoords.latitude : null;
+            const lng = (filterNearbyBtn.classList.contains('active') && userCoords) ? userCoords.longitude : null;
+            fetchBloodBanks(searchTerm, lat, lng);
+        }, 250);
     });
 
     filterAllBtn.addEventListener('click', () => {
@@ -138,6 +138,8 @@ document.addEventListener('DOMContentLoaded', () => {
 
         const formData = new FormData();
         formData.append('document', file);
+        // Pages are pushed to the call room; the server skips this socket
+        formData.append('sid', socket.id);
 
         try {
             const response = await fetch(`/call/${callId}/upload`, {
@@ -151,12 +153,13 @@ document.addEventListener('DOMContentLoaded', () => {
             }
 
             const data = await response.json();
-            socket.emit('share_document', { call_id: callId, urls: data.urls });
-            
-            statusText.textContent = 'Document sent successfully!';
+            // The pages reach the other side one by one as they are watermarked
+            statusText.textContent = data.pages > 1
+                ? `Document sent successfully! (${data.pages} pages)`
+                : 'Document sent successfully!';
             
             setTimeout(() => {
-                if (statusText.textContent === 'Document sent successfully!') {
+                if (statusText.textContent.startsWith('Document sent successfully!')) {
                     statusOverlay.style.display = 'none';
                 }
             }, 2000);
@@ -184,9 +187,39 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
-    // 3. Listen for a shared document (UNCHANGED)
+    // 3. Listen for a shared document, streamed one page per event
+    let currentJobId = null;
     socket.on('document_shared', (data) => {
         const { urls } = data;
+        if (data.job_id) {
+            if (data.job_id !== currentJobId) {
+                // A new document: one slot per page so pages land in order whenever they arrive
+                currentJobId = data.job_id;
+                docImageContainer.innerHTML = '';
+                for (let i = 0; i < data.pages; i++) {
+                    const slot = document.createElement('div');
+                    slot.className = 'doc-page-slot';
+                    docImageContainer.appendChild(slot);
+                }
+                docViewerModal.classList.remove('hidden');
+            }
+            const slot = docImageContainer.children[data.page - 1];
+            if (slot && urls && urls.length > 0) {
+                const thumbnail = data.thumbnails && data.thumbnails[0];
+                const img = document.createElement('img');
+                // Show the small thumbnail at once and swap in the full page when it has downloaded
+                img.src = thumbnail || urls[0];
+                slot.replaceChildren(img);
+                if (thumbnail) {
+                    const full = new Image();
+                    full.onload = () => { img.src = urls[0]; };
+                    full.src = urls[0];
+                }
+            } else if (slot && data.error) {
+                slot.textContent = `Page ${data.page} could not be loaded.`;
+            }
+            return;
+        }
         if (urls && urls.length > 0) {
             docImageContainer.innerHTML = '';
             urls.forEach(url => {
@@ -202,6 +235,7 @@ document.addEventListener('DOMContentLoaded', () => {
     closeDocViewerBtn.addEventListener('click', () => {
         docViewerModal.classList.add('hidden');
         docImageContainer.innerHTML = '';
+        currentJobId = null;
     });
 
     docImageContainer.addEventListener('contextmenu', (event) => {
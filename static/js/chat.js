@@ -7,25 +7,57 @@ document.addEventListener('DOMContentLoaded', () => {
     // Determine sender type based on session variables passed from template
     const senderType = currentDoctorId ? 'doctor' : 'user';
 
+    // Keyset cursors into the history: the oldest message shown and the newest one seen
+    let oldestId = null;
+    let newestId = null;
+    let hasOlder = false;
+    let loadingOlder = false;
+    let historyLoaded = false;
+    // Client ids of every message on screen, so relays, resends and history never show one twice
+    const shownIds = new Set();
+    // Own messages the server has not acked as stored yet; resent after a reconnect
+    const unacked = new Map();
+
     // --- 1. ESTABLISH CONNECTION AND JOIN ROOM ---
     socket.on('connect', () => {
         console.log('Connected to chat server.');
         socket.emit('join_chat', { conversation_id: conversationId });
+        // The server ignores resends of messages it already stored
+        unacked.forEach(messageData => socket.emit('send_message', messageData));
+        // On a reconnect only fetch what was missed while offline
+        if (historyLoaded) {
+            loadMissed();
+        }
     });
 
     // --- 2. LOAD CHAT HISTORY ---
+    async function fetchHistory(params) {
+        const query = new URLSearchParams(params).toString();
+        const response = await fetch(`/api/chat_history/${conversationId}${query ? `?${query}` : ''}`);
+        if (!response.ok) {
+            throw new Error('Failed to fetch chat history.');
+        }
+        return response.json();
+    }
+
+    function trackIds(messages) {
+        messages.forEach(msg => {
+            if (oldestId === null || msg.id < oldestId) oldestId = msg.id;
+            if (newestId === null || msg.id > newestId) newestId = msg.id;
+        });
+    }
+
     async function loadHistory() {
         try {
-            const response = await fetch(`/api/chat_history/${conversationId}`);
-            if (!response.ok) {
-                throw new Error('Failed to fetch chat history.');
-            }
-            const history = await response.json();
+            const page = await fetchHistory({});
             chatMessages.innerHTML = ''; // Clear loading state
-            history.forEach(msg => {
+            page.messages.forEach(msg => {
                 // Pass the sender_type from the history to the display function
-                displayMessage(msg.sender_type, msg.text);
+                displayMessage(msg.sender_type, msg.text, msg.client_id);
             });
+            trackIds(page.messages);
+            hasOlder = page.has_more;
+            historyLoaded = true;
             scrollToBottom();
         } catch (error) {
             console.error(error);
@@ -33,28 +65,104 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // Older pages are prepended when the user scrolls to the top
+    async function loadOlder() {
+        if (!hasOlder || loadingOlder || oldestId === null) return;
+        loadingOlder = true;
+        try {
+            const page = await fetchHistory({ before_id: oldestId });
+            const previousHeight = chatMessages.scrollHeight;
+            const firstChild = chatMessages.firstChild;
+            page.messages.forEach(msg => {
+                if (markShown(msg.client_id)) {
+                    chatMessages.insertBefore(createMessageElement(msg.sender_type, msg.text, msg.client_id), firstChild);
+                }
+            });
+            trackIds(page.messages);
+            hasOlder = page.has_more;
+            // Keep the message the user was looking at in place
+            chatMessages.scrollTop += chatMessages.scrollHeight - previousHeight;
+        } catch (error) {
+            console.error(error);
+        } finally {
+            loadingOlder = false;
+        }
+    }
+
+    // After a reconnect, page forward from the newest message we have
+    async function loadMissed() {
+        try {
+            let hasMore = true;
+            while (hasMore) {
+                const page = newestId === null ? await fetchHistory({}) : await fetchHistory({ after_id: newestId });
+                page.messages.forEach(msg => {
+                    displayMessage(msg.sender_type, msg.text, msg.client_id);
+                });
+                trackIds(page.messages);
+                hasMore = newestId !== null && page.has_more && page.messages.length > 0;
+            }
+            scrollToBottom();
+        } catch (error) {
+            console.error(error);
+        }
+    }
+
+    chatMessages.addEventListener('scroll', () => {
+        if (chatMessages.scrollTop < 50) {
+            loadOlder();
+        }
+    });
+
     // --- 3. HANDLE INCOMING MESSAGES ---
     socket.on('new_message', (data) => {
         if (data.conversation_id === conversationId) {
             // Pass the sender_type from the new message to the display function
-            displayMessage(data.sender_type, data.text);
+            displayMessage(data.sender_type, data.text, data.client_id);
             scrollToBottom();
         }
     });
 
+    // Messages are stored shortly after they are relayed; the ack carries their ids
+    socket.on('message_ack', (data) => {
+        if (data.conversation_id !== conversationId) return;
+        data.messages.forEach(msg => {
+            unacked.delete(msg.client_id);
+            if (newestId === null || msg.id > newestId) newestId = msg.id;
+        });
+    });
+
+    // Messages the server could not store: stop resending ours and flag them, drop relayed ones
+    socket.on('message_failed', (data) => {
+        if (data.conversation_id !== conversationId) return;
+        data.client_ids.forEach(clientId => {
+            const own = unacked.delete(clientId);
+            const element = chatMessages.querySelector(`[data-client-id="${CSS.escape(clientId)}"]`);
+            if (!element) return;
+            if (own) {
+                element.classList.add('failed');
+                element.title = 'Not delivered';
+            } else {
+                element.remove();
+            }
+        });
+    });
+
     // --- 4. SEND MESSAGE ---
     function sendMessage() {
         const messageText = messageInput.value.trim();
         if (messageText) {
+            const clientId = newClientId();
             const messageData = {
+                client_id: clientId,
                 conversation_id: conversationId,
                 text: messageText,
                 sender_type: senderType,
             };
+            unacked.set(clientId, messageData);
             socket.emit('send_message', messageData);
 
             // Display the message locally immediately for better UX
-            displayMessage(senderType, messageText);
+            displayMessage(senderType, messageText, clientId);
             messageInput.value = '';
             scrollToBottom();
         }
@@ -69,9 +177,33 @@ document.addEventListener('DOMContentLoaded', () => {
     });
 
     // --- UTILITY FUNCTIONS ---
-    function displayMessage(sender, text) {
+    function displayMessage(sender, text, clientId) {
+        if (markShown(clientId)) {
+            chatMessages.appendChild(createMessageElement(sender, text, clientId));
+        }
+    }
+
+    // False if the message with this client id is already on screen
+    function markShown(clientId) {
+        if (!clientId) return true;
+        if (shownIds.has(clientId)) return false;
+        shownIds.add(clientId);
+        return true;
+    }
+
+    function newClientId() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return `${Date.now().toString(16)}-${Math.random().toString(16).slice(2)}`;
+    }
+
+    function createMessageElement(sender, text, clientId) {
         const messageDiv = document.createElement('div');
         messageDiv.classList.add('message-bubble');
+        if (clientId) {
+            messageDiv.dataset.clientId = clientId;
+        }
 
         // This is the key logic fix. It compares the sender of the message ('user' or 'doctor')
         // with the type of the person currently viewing the page (senderType).
@@ -82,7 +214,7 @@ document.addEventListener('DOMContentLoaded', () => {
         }
         
         messageDiv.textContent = text;
-        chatMessages.appendChild(messageDiv);
+        return messageDiv;
     }
     
     function scrollToBottom() {
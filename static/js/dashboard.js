@@ -138,7 +138,8 @@ const createStatusChart = (chartData) => {
      */
     const initializeDashboard = async () => {
         try {
-            const response = await fetch('/api/dashboard-data');
+            // Always revalidated: an unchanged dashboard comes back as a 304 and is served from the browser cache
+            const response = await fetch('/api/dashboard-data', { cache: 'no-cache' });
             if (!response.ok) {
                 throw new Error(`HTTP error! Status: ${response.status}`);
             }
@@ -279,22 +279,59 @@ document.addEventListener('DOMContentLoaded', () => {
         selectedImageFiles = [];
         selectedImagePreviewContainer.innerHTML = '';
 
-        // Send data to backend
-        fetch('/prompt', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                prompt: promptText,
-                images: base64Images
-            }),
-        })
-        .then(r => r.json())
-        .then(data => {
-            updateMessageInChat(botBubble, data?.error ? `Error: ${data.error}` : String(data?.response ?? ''));
-        })
-        .catch(() => {
+        // Send data to backend; the answer streams back as Server-Sent Events
+        try {
+            const response = await fetch('/prompt', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    prompt: promptText,
+                    images: base64Images,
+                    stream: true
+                }),
+            });
+            const contentType = response.headers.get('Content-Type') || '';
+            if (!contentType.startsWith('text/event-stream') || !response.body) {
+                // Validation errors still come back as JSON
+                const data = await response.json();
+                updateMessageInChat(botBubble, data?.error ? `Error: ${data.error}` : String(data?.response ?? ''));
+                return;
+            }
+            await readPromptStream(response.body, botBubble);
+        } catch (error) {
             updateMessageInChat(botBubble, 'An unexpected error occurred.');
-        });
+        }
+    }
+
+    // Renders `chunk` events into the bubble as they arrive
+    async function readPromptStream(body, botBubble) {
+        const reader = body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let answer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+            for (const rawEvent of events) {
+                let eventName = 'message';
+                let data = '';
+                rawEvent.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) eventName = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                });
+                const payload = data ? JSON.parse(data) : {};
+                if (eventName === 'chunk') {
+                    answer += payload.text;
+                    updateMessageInChat(botBubble, answer);
+                    chatDisplay.scrollTop = chatDisplay.scrollHeight;
+                } else if (eventName === 'error') {
+                    updateMessageInChat(botBubble, `Error: ${payload.error}`);
+                }
+            }
+        }
     }
 
     if (sendBtn && aiInput) {
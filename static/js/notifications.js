@@ -3,6 +3,16 @@ document.addEventListener('DOMContentLoaded', () => {
     const bellBtn = document.getElementById('notification-bell-btn');
     const countBadge = document.getElementById('notification-count');
     const dropdown = document.getElementById('notification-dropdown');
+    // Pushed notifications arrive over Socket.IO; polling is only a slow fallback
+    const FALLBACK_POLL_MS = 5 * 60 * 1000;
+    let unreadCount = 0;
+
+    const createItem = (message) => {
+        const item = document.createElement('div');
+        item.className = 'notification-item';
+        item.textContent = message;
+        return item;
+    };
 
     const fetchNotifications = async () => {
         try {
@@ -11,16 +21,14 @@ document.addEventListener('DOMContentLoaded', () => {
 
             const data = await response.json();
 
+            unreadCount = data.count;
             if (data.count > 0) {
                 countBadge.textContent = data.count;
                 countBadge.classList.remove('hidden');
                 
                 dropdown.innerHTML = ''; // Clear previous notifications
                 data.notifications.forEach(notif => {
-                    const item = document.createElement('div');
-                    item.className = 'notification-item';
-                    item.textContent = notif.message;
-                    dropdown.appendChild(item);
+                    dropdown.appendChild(createItem(notif.message));
                 });
             } else {
                 countBadge.classList.add('hidden');
@@ -36,6 +44,7 @@ document.addEventListener('DOMContentLoaded', () => {
             await fetch('/notifications/read', {
                 method: 'POST'
             });
+            unreadCount = 0;
             countBadge.classList.add('hidden');
         } catch (error) {
             console.error('Error marking notifications as read:', error);
@@ -62,8 +71,25 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    const showPushedNotification = (notif) => {
+        if (unreadCount === 0) {
+            dropdown.innerHTML = ''; // Drop the "No new notifications." placeholder
+        }
+        unreadCount += 1;
+        countBadge.textContent = unreadCount;
+        countBadge.classList.remove('hidden');
+        dropdown.prepend(createItem(notif.message));
+    };
+
+    if (typeof io !== 'undefined') {
+        const socket = io();
+        socket.on('notification', showPushedNotification);
+        // Catch up on anything sent while the connection was down
+        socket.io.on('reconnect', fetchNotifications);
+    }
+
     // Fetch notifications on page load
     fetchNotifications();
-    // And fetch periodically (e.g., every 60 seconds)
-    setInterval(fetchNotifications, 60000);
+    // And poll rarely in case a push was missed
+    setInterval(fetchNotifications, FALLBACK_POLL_MS);
 });
\ No newline at end of file
@@ -0,0 +1,182 @@
+import atexit
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, select, update
+from extensions import db
+from models import TempArtifact
+
+# Used when TEMP_UPLOAD_TTL_SECONDS / TEMP_UPLOAD_QUOTA_BYTES are not configured
+DEFAULT_TTL_SECONDS = 2 * 60 * 60
+DEFAULT_QUOTA_BYTES = 1024 * 1024 * 1024
+# Spooled uploads are expired by their document job once rendered; this catches jobs that never finished
+SPOOL_TTL_SECONDS = 15 * 60
+# Expired files left after their call ended, kept briefly so in-flight downloads complete
+ENDED_CALL_GRACE = timedelta(minutes=1)
+JANITOR_INTERVAL_SECONDS = 60
+DELETE_BATCH_SIZE = 200
+# Files on disk missing from the manifest (e.g. written before a crash) are looked for this often
+ORPHAN_SWEEP_SECONDS = 60 * 60
+
+_metrics = {'runs': 0, 'deleted_files': 0, 'reclaimed_bytes': 0, 'quota_evictions': 0, 'orphans_removed': 0,
+            'missing_files': 0, 'last_run_seconds': None, 'last_run': None}
+_metrics_lock = threading.Lock()
+_last_orphan_sweep = None
+_janitor_stop = None
+
+def temp_folder(app):
+    return os.path.join(app.root_path, 'temp_uploads')
+
+def track_artifacts(folder, filenames, call_id=None, ttl_seconds=None):
+    """ Records files just written to `folder` in the manifest, so the janitor removes them after `ttl_seconds`. """
+    now = datetime.now()
+    ttl_seconds = ttl_seconds or DEFAULT_TTL_SECONDS
+    for filename in filenames:
+        try:
+            size = os.path.getsize(os.path.join(folder, filename))
+        except OSError:
+            size = 0
+        db.session.add(TempArtifact(filename=filename, call_id=call_id, size_bytes=size,
+                                    created_at=now, expires_at=now + timedelta(seconds=ttl_seconds)))
+    db.session.commit()
+
+def expire_statement(condition, expires_at):
+    """ Brings forward the expiry of the files matching `condition`; never pushes one back. """
+    return (update(TempArtifact)
+            .where(condition, TempArtifact.expires_at > expires_at)
+            .values(expires_at=expires_at)
+            .execution_options(synchronize_session=False))
+
+def _expire(condition, expires_at):
+    db.session.execute(expire_statement(condition, expires_at))
+    db.session.commit()
+
+def expire_call_artifacts(call_id):
+    """ Marks a finished call's files for the next janitor run; the files themselves are deleted off the request path. """
+    _expire(TempArtifact.call_id == call_id, datetime.now() + ENDED_CALL_GRACE)
+
+def expire_artifacts(filenames):
+    """ Marks files as no longer needed, for deletion on the next janitor run. """
+    _expire(TempArtifact.filename.in_(filenames), datetime.now())
+
+def _remove(folder, rows):
+    """ Deletes a batch of manifest rows and their files; returns the bytes reclaimed. """
+    reclaimed = missing = 0
+    for filename, size in rows:
+        try:
+            os.remove(os.path.join(folder, filename))
+            reclaimed += size
+        except FileNotFoundError:
+            # Already removed, e.g. a spooled upload its job cleaned up
+            missing += 1
+        except OSError as e:
+            print(f"--- ERROR: Failed to delete file {filename}: {e} ---")
+    db.session.execute(delete(TempArtifact).where(TempArtifact.filename.in_([filename for filename, size in rows])))
+    db.session.commit()
+    with _metrics_lock:
+        _metrics['deleted_files'] += len(rows) - missing
+        _metrics['missing_files'] += missing
+        _metrics['reclaimed_bytes'] += reclaimed
+    return reclaimed
+
+def expired_artifacts_query(now):
+    return (select(TempArtifact.filename, TempArtifact.size_bytes)
+            .where(TempArtifact.expires_at <= now)
+            .order_by(TempArtifact.expires_at).limit(DELETE_BATCH_SIZE))
+
+def _delete_expired(folder, now):
+    while True:
+        rows = db.session.execute(expired_artifacts_query(now)).all()
+        if rows:
+            _remove(folder, rows)
+        if len(rows) < DELETE_BATCH_SIZE:
+            break
+
+def _enforce_quota(folder, quota_bytes):
+    """ Evicts the oldest files, whatever their expiry, until the tracked total fits `quota_bytes`. """
+    over = (db.session.execute(select(func.sum(TempArtifact.size_bytes))).scalar() or 0) - quota_bytes
+    while over > 0:
+        rows = db.session.execute(
+            select(TempArtifact.filename, TempArtifact.size_bytes)
+            .order_by(TempArtifact.created_at).limit(DELETE_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        batch = []
+        for filename, size in rows:
+            batch.append((filename, size))
+            over -= size
+            if over <= 0:
+                break
+        _remove(folder, batch)
+        with _metrics_lock:
+            _metrics['quota_evictions'] += len(batch)
+
+def _remove_orphans(folder, ttl_seconds):
+    """ Deletes untracked files older than the TTL, such as ones written before the manifest existed. """
+    cutoff = time.time() - ttl_seconds
+    with os.scandir(folder) as entries:
+        stale = [entry.name for entry in entries if entry.is_file() and entry.stat().st_mtime < cutoff]
+    removed = 0
+    for start in range(0, len(stale), DELETE_BATCH_SIZE):
+        names = stale[start:start + DELETE_BATCH_SIZE]
+        tracked = set(db.session.execute(select(TempArtifact.filename).where(TempArtifact.filename.in_(names))).scalars())
+        for name in names:
+            if name in tracked:
+                continue
+            try:
+                os.remove(os.path.join(folder, name))
+                removed += 1
+            except OSError:
+                pass
+    db.session.commit()
+    with _metrics_lock:
+        _metrics['orphans_removed'] += removed
+
+def run_janitor(app):
+    """ One janitor pass: expired files, then the disk quota, then (hourly) untracked leftovers. """
+    global _last_orphan_sweep
+    started = time.monotonic()
+    folder = temp_folder(app)
+    ttl_seconds = app.config.get('TEMP_UPLOAD_TTL_SECONDS') or DEFAULT_TTL_SECONDS
+    with app.app_context():
+        _delete_expired(folder, datetime.now())
+        _enforce_quota(folder, app.config.get('TEMP_UPLOAD_QUOTA_BYTES') or DEFAULT_QUOTA_BYTES)
+        if os.path.isdir(folder) and (_last_orphan_sweep is None or started - _last_orphan_sweep >= ORPHAN_SWEEP_SECONDS):
+            _remove_orphans(folder, ttl_seconds)
+            _last_orphan_sweep = started
+    with _metrics_lock:
+        _metrics['runs'] += 1
+        _metrics['last_run'] = datetime.now().isoformat()
+        _metrics['last_run_seconds'] = round(time.monotonic() - started, 3)
+
+def start_temp_janitor(app):
+    """ Runs the janitor every JANITOR_INTERVAL_SECONDS on a daemon thread of this process.
+
+    Each web process sweeps its own temp_uploads/, which the scheduler leader (possibly
+    another process or host) cannot see.
+    """
+    global _janitor_stop
+    if _janitor_stop is not None:
+        return
+    _janitor_stop = threading.Event()
+
+    def sweep():
+        while not _janitor_stop.wait(JANITOR_INTERVAL_SECONDS):
+            try:
+                run_janitor(app)
+            except Exception as e:
+                app.logger.error(f"Temp upload janitor error: {e}", exc_info=True)
+
+    threading.Thread(target=sweep, name='temp-janitor', daemon=True).start()
+    atexit.register(_janitor_stop.set)
+
+def metrics():
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+    tracked_files, tracked_bytes = db.session.execute(
+        select(func.count(TempArtifact.filename), func.coalesce(func.sum(TempArtifact.size_bytes), 0))
+    ).one()
+    snapshot.update(tracked_files=tracked_files, tracked_bytes=tracked_bytes)
+    return snapshot
@@ -0,0 +1,15 @@
+import pytest
+from flask import Flask
+from extensions import db
+
+@pytest.fixture
+def app(tmp_path):
+    """ A bare app on a fresh SQLite file with every table created, inside an app context. """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + str(tmp_path / 'caresync.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
@@ -0,0 +1,60 @@
+import pytest
+from ai_gateway import AIGateway, GatewayRejected
+from medibot import MediBot
+
+class ServiceUnavailable(Exception):
+    """ Shaped like google.api_core's 503: matched by name and HTTP `code`, without the SDK installed. """
+    code = 503
+
+class InvalidArgument(Exception):
+    code = 400
+
+def _call(gateway, error):
+    with pytest.raises(Exception):
+        with gateway.upstream():
+            raise error
+
+@pytest.fixture
+def gateway():
+    return AIGateway(breaker_failures=2, breaker_reset_seconds=60)
+
+def test_bad_requests_do_not_open_the_breaker(gateway):
+    for _ in range(5):
+        _call(gateway, InvalidArgument("bad prompt"))
+    assert gateway.breaker.state == 'closed'
+    assert gateway.metrics()['request_errors'] == 5
+    assert gateway.metrics()['upstream_failures'] == 0
+
+def test_provider_errors_open_the_breaker(gateway):
+    _call(gateway, ServiceUnavailable("overloaded"))
+    _call(gateway, ConnectionResetError("reset by peer"))
+    assert gateway.breaker.state == 'open'
+    with pytest.raises(GatewayRejected) as rejected:
+        with gateway.upstream():
+            pass
+    assert rejected.value.status == 503
+
+class _BlockedResponse:
+    @property
+    def text(self):
+        raise ValueError("The response was blocked by the safety filters")
+
+class _Model:
+    def generate_content(self, parts, stream=False, request_options=None):
+        return _BlockedResponse()
+
+def test_a_blocked_answer_is_not_an_upstream_failure(gateway):
+    bot = MediBot(lambda model_name: _Model(), gateway=gateway)
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            bot.ask("What helps with a headache?")
+    assert gateway.breaker.state == 'closed'
+    assert gateway.metrics()['upstream_failures'] == 0
+
+def test_a_new_session_gets_its_whole_burst():
+    gateway = AIGateway(rate_per_minute=6, burst=1)
+    gateway.check_rate('user:1')
+    with pytest.raises(GatewayRejected) as rejected:
+        gateway.check_rate('user:1')
+    assert (rejected.value.status, rejected.value.retry_after) == (429, 10)
+    gateway.check_rate('user:2')
@@ -0,0 +1,7 @@
+import pytest
+from app import create_app
+
+def test_unknown_document_image_format_is_refused(monkeypatch):
+    monkeypatch.setenv('DOCUMENT_IMAGE_FORMAT', 'png')
+    with pytest.raises(RuntimeError, match='DOCUMENT_IMAGE_FORMAT'):
+        create_app()
@@ -0,0 +1,45 @@
+import random
+import pytest
+import blood_bank_index
+from blood_bank_index import BloodBankIndex, haversine
+
+@pytest.fixture(params=['numpy', 'pure'])
+def rows(request, monkeypatch):
+    """ Random banks over India (some without coordinates), indexed with and without NumPy. """
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(blood_bank_index, 'np', None)
+    rng = random.Random(7)
+    rows = [(i, rng.uniform(8, 35), rng.uniform(68, 97)) for i in range(1, 400)]
+    rows += [(400, None, None), (401, 20.0, None)]
+    return rows
+
+def _brute_force(rows, lat, lng):
+    located = [(bank_id, haversine(lat, lng, b_lat, b_lng)) for bank_id, b_lat, b_lng in rows if b_lat is not None and b_lng is not None]
+    return sorted(located, key=lambda x: x[1])
+
+def _ids(results):
+    return [bank_id for bank_id, _ in results]
+
+@pytest.mark.parametrize('lat, lng', [(18.52, 73.86), (28.61, 77.21), (8.0, 97.0), (40.0, 60.0)])
+def test_nearest_matches_brute_force(rows, lat, lng):
+    index = BloodBankIndex(rows)
+    expected = _brute_force(rows, lat, lng)
+    for k in (1, 5, 25):
+        assert _ids(index.nearest(lat, lng, k)) == _ids(expected[:k])
+    assert index.nearest(lat, lng, 5)[0][1] == pytest.approx(expected[0][1])
+
+def test_within_radius_and_allowed_ids(rows):
+    index = BloodBankIndex(rows)
+    expected = [(bank_id, d) for bank_id, d in _brute_force(rows, 22.0, 80.0) if d <= 300]
+    assert _ids(index.within(22.0, 80.0, 300)) == _ids(expected)
+    allowed = {bank_id for bank_id, _ in expected[::2]} | {400}
+    assert _ids(index.nearest(22.0, 80.0, 3, allowed=allowed)) == _ids([x for x in expected if x[0] in allowed][:3])
+
+def test_rank_orders_every_located_bank(rows):
+    index = BloodBankIndex(rows)
+    assert len(index) == 399
+    assert _ids(index.rank(12.97, 77.59)) == _ids(_brute_force(rows, 12.97, 77.59))
+    assert _ids(index.rank(12.97, 77.59, allowed={3, 2, 1, 400})) == _ids(
+        [x for x in _brute_force(rows, 12.97, 77.59) if x[0] in (1, 2, 3)])
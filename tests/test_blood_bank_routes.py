@@ -0,0 +1,38 @@
+import pytest
+from blood_bank_routes import blood_bank
+from extensions import db
+from models import BloodBank
+
+@pytest.fixture
+def client(app):
+    app.secret_key = 'test'
+    app.register_blueprint(blood_bank)
+    db.session.add_all([
+        BloodBank(name="Pune Blood Centre", city="Pune", state="Maharashtra", latitude=18.52, longitude=73.86),
+        BloodBank(name="Delhi Red Cross", city="New Delhi", state="Delhi", latitude=28.61, longitude=77.21),
+        BloodBank(name="Unmapped Bank", city="Nagpur", state="Maharashtra"),
+    ])
+    db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    return client
+
+@pytest.mark.parametrize('query', ['lat=91&lng=77', 'lat=-90.5&lng=77', 'lat=28&lng=181', 'lat=nan&lng=77'])
+def test_out_of_range_location_is_rejected(client, query):
+    response = client.get('/api/blood-banks?' + query)
+    assert response.status_code == 400
+
+def test_location_ranks_nearest_first_and_keeps_unmapped_banks(client):
+    response = client.get('/api/blood-banks?lat=28.5&lng=77.2&fields=name,distance')
+    assert response.status_code == 200
+    names = [bank['name'] for bank in response.get_json()['results']]
+    assert names == ["Delhi Red Cross", "Pune Blood Centre", "Unmapped Bank"]
+
+def test_repeat_request_with_matching_etag_is_not_modified(client):
+    first = client.get('/api/blood-banks?search=pune')
+    assert first.status_code == 200
+    again = client.get('/api/blood-banks?search=pune', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    # A changed query string is a different ETag
+    assert client.get('/api/blood-banks?search=delhi', headers={'If-None-Match': first.headers['ETag']}).status_code == 200
@@ -0,0 +1,32 @@
+from types import SimpleNamespace
+import pytest
+from blood_bank_search import BloodBankSearchIndex, edit_distance
+
+@pytest.fixture
+def index():
+    rows = [
+        SimpleNamespace(id=1, name="Delhi Red Cross", city="New Delhi", district="Central", state="Delhi"),
+        SimpleNamespace(id=2, name="Pune Blood Centre", city="Pune", district="Pune", state="Maharashtra"),
+        SimpleNamespace(id=3, name="Chennai Hospital Blood Bank", city="Chennai", district="Chennai", state="Tamil Nadu"),
+    ]
+    return BloodBankSearchIndex(rows)
+
+def test_exact_and_prefix_matches_rank_first(index):
+    assert index.search("delhi") == {1: 1.0}
+    assert index.search("del") == {1: 0.9}
+
+@pytest.mark.parametrize('typo, bank_id', [("dehli", 1), ("edlhi", 1), ("pnue", 2), ("chenai", 3), ("maharahstra", 2)])
+def test_typos_still_find_the_bank(index, typo, bank_id):
+    scores = index.search(typo)
+    assert list(scores) == [bank_id]
+    assert scores[bank_id] < 0.9
+
+def test_every_term_must_match(index):
+    assert list(index.search("dehli red")) == [1]
+    assert index.search("dehli pune") == {}
+    assert index.search("xyzq") == {}
+
+def test_edit_distance_counts_a_swap_as_one_edit():
+    assert edit_distance("dehli", "delhi", 2) == 1
+    assert edit_distance("pune", "pine", 2) == 1
+    assert edit_distance("chennai", "kolkata", 2) == 3
@@ -0,0 +1,37 @@
+import os
+import uuid
+import pytest
+from call_presence import LocalParticipantStore, RedisParticipantStore, create_participant_store
+
+def _stores():
+    yield pytest.param(LocalParticipantStore, id='local')
+    # The same checks run against a real server when one is given, e.g. TEST_REDIS_URL=redis://localhost:6379/15
+    url = os.getenv('TEST_REDIS_URL')
+    yield pytest.param(lambda: RedisParticipantStore(url, prefix=f"test:{uuid.uuid4().hex}"), id='redis',
+                       marks=pytest.mark.skipif(not url, reason="TEST_REDIS_URL not set"))
+
+@pytest.fixture(params=list(_stores()))
+def store(request):
+    return request.param()
+
+def test_second_participant_makes_the_call_ready(store):
+    assert store.join(7, 'sid-a') == 1
+    assert store.join(7, 'sid-b') == 2
+    # A repeated join (e.g. a reconnect) does not count twice
+    assert store.join(7, 'sid-b') == 2
+
+def test_leaving_updates_counts_and_membership(store):
+    store.join(7, 'sid-a')
+    store.join(8, 'sid-a')
+    store.join(7, 'sid-b')
+    assert sorted(store.calls_of('sid-a')) == ['7', '8']
+    assert store.leave(7, 'sid-a') == 1
+    assert store.calls_of('sid-a') == ['8']
+    assert store.leave(7, 'sid-b') == 0
+    assert store.leave(8, 'sid-a') == 0
+    assert store.calls_of('sid-a') == []
+
+def test_store_matches_the_message_queue():
+    assert isinstance(create_participant_store(None), LocalParticipantStore)
+    with pytest.raises(RuntimeError, match='amqp://'):
+        create_participant_store('amqp://guest@localhost//')
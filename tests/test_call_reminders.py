@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+import pytest
+import call_reminders
+from call_reminders import metrics, process_call_reminders
+from extensions import db
+from models import Doctor, JobCheckpoint, OutboxEmail, User, VideoCall
+
+LEADS = (60, 30)
+
+@pytest.fixture
+def people(app):
+    user = User(full_name="Asha Rao", email="asha@example.com")
+    doctor = Doctor(full_name="Vikram Sen", email="vikram@example.com", phone="100", license_number="L-1",
+                    specialization="General", qualifications="MBBS", clinic_name="Sen Clinic", experience_years=10,
+                    clinic_address="Pune")
+    db.session.add_all([user, doctor])
+    db.session.commit()
+    return user, doctor
+
+def _call(people, starts_in):
+    user, doctor = people
+    call = VideoCall(user_id=user.id, doctor_id=doctor.id, status='Approved', scheduled_time=datetime.now() + starts_in)
+    db.session.add(call)
+    db.session.commit()
+    return call
+
+def _stall(minutes):
+    """ Starts the checkpoints and moves them back, as if the scheduler had been down this long. """
+    process_call_reminders(LEADS)
+    db.session.query(JobCheckpoint).update({JobCheckpoint.high_water: datetime.now() - timedelta(minutes=minutes)})
+    db.session.commit()
+
+def test_stalled_tick_catches_up_on_every_lead_once(people):
+    call = _call(people, timedelta(minutes=20))
+    _stall(120)
+    # Both the hour and the half-hour reminder fell due while stalled; each goes to both sides
+    assert process_call_reminders(LEADS) == 2
+    assert OutboxEmail.query.count() == 4
+    assert call.reminder_sent
+    assert process_call_reminders(LEADS) == 0
+    assert OutboxEmail.query.count() == 4
+    stats = metrics()
+    assert stats['sent'] == 2
+    assert stats['max_lateness_seconds'] >= 40 * 60
+
+def test_calls_that_already_started_are_skipped(people):
+    _call(people, -timedelta(minutes=5))
+    _stall(120)
+    assert process_call_reminders(LEADS) == 0
+    assert OutboxEmail.query.count() == 0
+
+def test_conflicting_tick_rolls_back_its_mail(people, monkeypatch):
+    _call(people, timedelta(minutes=20))
+    _stall(120)
+    load = call_reminders._load_checkpoints
+
+    def stale_marks(leads, now):
+        # Another process advanced the marks after this tick read them
+        return {lead: mark - timedelta(seconds=1) for lead, mark in load(leads, now).items()}
+
+    monkeypatch.setattr(call_reminders, '_load_checkpoints', stale_marks)
+    assert process_call_reminders(LEADS) == 0
+    assert OutboxEmail.query.count() == 0
+    assert metrics()['skipped_ticks'] == 1
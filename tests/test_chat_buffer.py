@@ -0,0 +1,72 @@
+import threading
+import time
+from datetime import datetime
+import pytest
+import chat_buffer
+from chat_buffer import ChatWriteBuffer
+from models import Message
+
+@pytest.fixture
+def emitted(monkeypatch):
+    events = []
+    monkeypatch.setattr(chat_buffer.socketio, 'emit', lambda event, data, to=None: events.append((event, to, data)))
+    return events
+
+def _row(conversation_id, client_id, text="Hello doctor"):
+    return {'client_id': client_id, 'conversation_id': conversation_id, 'sender_type': 'user',
+            'text': text, 'timestamp': datetime.now()}
+
+def test_client_ids_are_scoped_to_their_conversation(app, emitted):
+    buffer = ChatWriteBuffer(app)
+    buffer.submit(_row(1, 'abc'))
+    buffer.submit(_row(2, 'abc'))
+    assert buffer.flush() == 2
+    stored = {m.conversation_id: m.id for m in Message.query}
+    assert sorted(stored) == [1, 2]
+    assert emitted == [
+        ('message_ack', 'chat_1', {'conversation_id': 1, 'messages': [{'client_id': 'abc', 'id': stored[1]}]}),
+        ('message_ack', 'chat_2', {'conversation_id': 2, 'messages': [{'client_id': 'abc', 'id': stored[2]}]}),
+    ]
+
+def test_resent_message_is_stored_once(app, emitted):
+    buffer = ChatWriteBuffer(app)
+    buffer.submit(_row(1, 'abc'))
+    buffer.flush()
+    buffer.submit(_row(1, 'abc'))
+    buffer.flush()
+    assert Message.query.count() == 1
+    assert [event for event, to, data in emitted] == ['message_ack', 'message_ack']
+
+def test_dropped_rows_are_reported_to_their_room(app, emitted):
+    buffer = ChatWriteBuffer(app)
+    buffer.submit(_row(1, 'good'))
+    buffer.submit(_row(1, 'bad', text=None))
+    assert buffer.flush() == 1
+    assert [m.client_id for m in Message.query] == ['good']
+    assert emitted[-1] == ('message_failed', 'chat_1', {'conversation_id': 1, 'client_ids': ['bad']})
+
+def test_worker_backs_off_only_when_the_database_fails(app, emitted, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(chat_buffer.time, 'sleep', sleeps.append)
+    buffer = ChatWriteBuffer(app, flush_interval=0.01)
+    buffer.start()
+    # A pass that stores nothing because its only row was rejected must not delay the messages behind it
+    buffer.submit(_row(1, 'bad', text=None))
+    deadline = time.monotonic() + 5
+    while not emitted and time.monotonic() < deadline:
+        threading.Event().wait(0.01)  # time.sleep is patched
+    buffer.submit(_row(1, 'good'))
+    buffer.stop()
+    assert [event for event, to, data in emitted] == ['message_failed', 'message_ack']
+    assert sleeps == []
+
+def test_unreachable_database_puts_the_batch_back(app, emitted):
+    def unreachable(batch):
+        raise chat_buffer.OperationalError('INSERT', {}, Exception('database is locked'))
+    buffer = ChatWriteBuffer(app)
+    buffer._persist = unreachable
+    buffer.submit(_row(1, 'abc'))
+    assert buffer._drain() == (0, False)
+    assert len(buffer._pending) == 1
+    del buffer._persist
+    assert buffer.flush() == 1
@@ -0,0 +1,70 @@
+from datetime import datetime
+import pytest
+from dashboard_cache import dashboard_version
+from dashboard_routes import dashboard
+from extensions import db
+from models import Appointment, Doctor, Prescription, User
+
+@pytest.fixture
+def client(app):
+    app.secret_key = 'test'
+    app.register_blueprint(dashboard)
+    return app.test_client()
+
+@pytest.fixture
+def people(app):
+    user = User(full_name="Asha Rao", email="asha@example.com")
+    doctor = Doctor(full_name="Vikram Sen", email="vikram@example.com", phone="100", license_number="L-1",
+                    specialization="General", qualifications="MBBS", clinic_name="Sen Clinic", experience_years=10,
+                    clinic_address="Pune")
+    db.session.add_all([user, doctor])
+    db.session.commit()
+    return user, doctor
+
+@pytest.fixture
+def appointment(people):
+    user, doctor = people
+    appointment = Appointment(user_id=user.id, doctor_id=doctor.id, appointment_datetime=datetime.now())
+    db.session.add(appointment)
+    db.session.commit()
+    return appointment
+
+def _load(client, user, etag=None):
+    with client.session_transaction() as session:
+        session['user_id'] = user.id
+    headers = {'If-None-Match': etag} if etag else {}
+    return client.get('/api/dashboard-data', headers=headers)
+
+def test_status_change_and_new_prescription_bump_the_version(client, people, appointment):
+    user, doctor = people
+    first = _load(client, user)
+    version = dashboard_version(user.id)
+    appointment.status = 'Approved'
+    db.session.commit()
+    assert dashboard_version(user.id) == version + 1
+    second = _load(client, user)
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert second.get_json() != first.get_json()
+    db.session.add(Prescription(user_id=user.id, doctor_id=doctor.id, notes="Rest"))
+    db.session.commit()
+    assert dashboard_version(user.id) == version + 2
+    assert _load(client, user).headers['ETag'] != second.headers['ETag']
+
+def test_unrelated_update_keeps_the_version(client, people, appointment):
+    user, doctor = people
+    etag = _load(client, user).headers['ETag']
+    version = dashboard_version(user.id)
+    appointment.appointment_datetime = datetime(2030, 1, 1)
+    user.full_name = "Asha R."
+    db.session.commit()
+    assert dashboard_version(user.id) == version
+    assert _load(client, user).headers['ETag'] == etag
+
+def test_repeat_load_with_matching_etag_is_not_modified(client, people, appointment):
+    user, doctor = people
+    first = _load(client, user)
+    assert first.status_code == 200
+    again = _load(client, user, first.headers['ETag'])
+    assert again.status_code == 304
+    assert again.headers['ETag'] == first.headers['ETag']
+    assert again.data == b''
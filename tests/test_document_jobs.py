@@ -0,0 +1,42 @@
+import queue
+import threading
+import pytest
+import document_jobs
+from document_jobs import DocumentWorkerPool
+
+# Stand-in worker: echoes each request back as the reply, and stops answering when asked to hang
+FAKE_WORKER = """
+import json, sys, time
+for line in sys.stdin:
+    request = json.loads(line)
+    if request.get('hang'):
+        time.sleep(60)
+    print(json.dumps({'filename': request['name'], 'thumbnail': request['name'] + '_thumb'}), flush=True)
+"""
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    script = tmp_path / 'fake_worker.py'
+    script.write_text(FAKE_WORKER)
+    monkeypatch.setattr(document_jobs, 'WORKER_SCRIPT', str(script))
+    monkeypatch.setattr(document_jobs.socketio, 'start_background_task',
+                        lambda target, *args: threading.Thread(target=target, args=args, daemon=True).start())
+    pool = DocumentWorkerPool(1, page_timeout=1)
+    pool.start()
+    yield pool
+    pool.stop()
+
+def _render(pool, request):
+    replies = queue.Queue()
+    pool.submit(request, lambda files, error: replies.put((files, error)))
+    return replies.get(timeout=10)
+
+def test_wedged_worker_is_replaced(pool):
+    assert _render(pool, {'name': 'page1'}) == ({'filename': 'page1', 'thumbnail': 'page1_thumb'}, None)
+    wedged = next(iter(pool.processes))
+    files, error = _render(pool, {'name': 'page2', 'hang': True})
+    assert files is None and 'no reply' in error
+    assert wedged.poll() is not None
+    # The next page goes to a fresh worker
+    assert _render(pool, {'name': 'page3'})[0]['filename'] == 'page3'
+    assert wedged not in pool.processes
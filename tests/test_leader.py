@@ -0,0 +1,42 @@
+import time
+from leader import LeaderLease
+
+class Lease(LeaderLease):
+    def __init__(self, app, ttl=15, heartbeat=5):
+        self.events = []
+        super().__init__(app, 'scheduler', lambda: self.events.append('elected'), lambda: self.events.append('revoked'),
+                         ttl=ttl, heartbeat=heartbeat)
+
+def test_only_one_process_leads(app):
+    first, second = Lease(app), Lease(app)
+    first.beat()
+    second.beat()
+    assert (first.is_leader, second.is_leader) == (True, False)
+    first.release()
+    second.beat()
+    assert second.is_leader
+
+def test_leader_survives_a_transient_heartbeat_failure(app, monkeypatch):
+    lease = Lease(app)
+    lease.beat()
+
+    def fail():
+        raise RuntimeError("database is locked")
+    monkeypatch.setattr(lease, 'try_acquire', fail)
+    lease.beat()
+    assert lease.is_leader
+    assert lease.events == ['elected']
+    # Within one heartbeat of expiry a standby may take over, so the jobs stop
+    lease._renewed_at -= 10
+    lease.beat()
+    assert not lease.is_leader
+    assert lease.events == ['elected', 'revoked']
+
+def test_leader_steps_down_when_another_holds_the_lease(app):
+    first, second = Lease(app, ttl=0), Lease(app)
+    first.beat()
+    # A zero TTL lease has expired by the next tick of the database clock
+    time.sleep(1.1)
+    second.beat()
+    first.beat()
+    assert (first.is_leader, second.is_leader) == (False, True)
@@ -0,0 +1,107 @@
+import socket
+from datetime import datetime, timedelta
+import pytest
+from aiosmtpd.controller import Controller
+import mail_queue
+from extensions import db, mail
+from mail_queue import MAX_ATTEMPTS, RETRY_BASE_SECONDS, dispatch_batch, enqueue_mail
+from models import OutboxEmail
+
+class RecordingHandler:
+    """ Local SMTP stand-in: keeps every accepted message, or rejects them all while `reject` is set. """
+
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+        self.reject = False
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.reject:
+            return '451 4.3.0 Try again later'
+        self.messages.append(envelope)
+        return '250 OK'
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def smtp(app):
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=_free_port())
+    controller.start()
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=controller.port, MAIL_USE_TLS=False,
+                      MAIL_USE_SSL=False, MAIL_USERNAME=None, MAIL_PASSWORD=None)
+    mail.init_app(app)
+    yield handler
+    controller.stop()
+
+def _enqueue(count):
+    for i in range(count):
+        enqueue_mail(f"Reminder {i}", [f"patient{i}@example.com"], "Take your medication.", sender='caresync@example.com')
+    db.session.commit()
+
+def _make_due():
+    db.session.query(OutboxEmail).update({OutboxEmail.next_attempt_at: datetime.now() - timedelta(seconds=1)})
+    db.session.commit()
+
+def test_sends_in_batches_over_one_connection(smtp):
+    _enqueue(5)
+    assert dispatch_batch(3) == 3
+    assert len(smtp.messages) == 3
+    assert smtp.connections == 1
+    assert dispatch_batch(3) == 2
+    assert dispatch_batch(3) == 0
+    assert sorted(envelope.rcpt_tos[0] for envelope in smtp.messages) == [f"patient{i}@example.com" for i in range(5)]
+    assert smtp.connections == 2
+    assert {email.status for email in OutboxEmail.query} == {'sent'}
+    stats = mail_queue.metrics()
+    assert (stats['enqueued'], stats['sent'], stats['pending']) == (5, 5, 0)
+
+def test_rejected_mail_backs_off_then_fails(smtp):
+    smtp.reject = True
+    _enqueue(1)
+    failed_before = mail_queue.metrics()['failed']
+    delays = []
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        started = datetime.now()
+        assert dispatch_batch(10) == 1
+        email = db.session.get(OutboxEmail, 1)
+        assert email.attempts == attempt
+        if attempt < MAX_ATTEMPTS:
+            assert email.status == 'pending'
+            delays.append(round((email.next_attempt_at - started).total_seconds()))
+            # Not due again until the backoff has passed
+            assert dispatch_batch(10) == 0
+            _make_due()
+    assert delays == [RETRY_BASE_SECONDS * 2 ** n for n in range(MAX_ATTEMPTS - 1)]
+    assert email.status == 'failed'
+    assert '451' in email.last_error
+    assert smtp.messages == []
+    assert mail_queue.metrics()['failed'] == failed_before + 1
+    assert mail_queue.metrics()['retried'] == MAX_ATTEMPTS - 1
+
+def test_retry_succeeds_once_the_server_accepts(smtp):
+    smtp.reject = True
+    _enqueue(1)
+    dispatch_batch(10)
+    smtp.reject = False
+    _make_due()
+    assert dispatch_batch(10) == 1
+    email = db.session.get(OutboxEmail, 1)
+    assert (email.status, email.attempts) == ('sent', 1)
+    assert len(smtp.messages) == 1
+
+def test_enqueued_is_counted_on_commit_only(app):
+    before = mail_queue.metrics()['enqueued']
+    enqueue_mail("Dropped", ["a@example.com"], "body", sender='caresync@example.com')
+    db.session.rollback()
+    assert mail_queue.metrics()['enqueued'] == before
+    _enqueue(2)
+    assert mail_queue.metrics()['enqueued'] == before + 2
@@ -0,0 +1,111 @@
+import threading
+import time
+from types import SimpleNamespace
+from medibot import MediBot, ResponseCache
+
+class StubModel:
+    """ Stands in for a Gemini client; holds every call at `gate` until the test releases it. """
+
+    def __init__(self, answer="Rest and drink fluids.", error=None):
+        self.answer = answer
+        self.error = error
+        self.calls = 0
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def generate_content(self, parts, stream=False, request_options=None):
+        self.calls += 1
+        self.gate.wait(5)
+        if self.error:
+            raise self.error
+        if stream:
+            return iter([SimpleNamespace(text=word + ' ') for word in self.answer.split()])
+        return SimpleNamespace(text=self.answer)
+
+def _bot(model, cache=None):
+    return MediBot(lambda model_name: model, cache=cache)
+
+def _wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def _ask_in_threads(bot, count):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(_outcome(bot.ask, "I have a cold"))) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+def _outcome(fn, *args):
+    try:
+        return fn(*args)
+    except Exception as e:
+        return e
+
+def test_expired_answers_are_dropped():
+    cache = ResponseCache(ttl_seconds=0)
+    cache.put('k', 'model', 'answer')
+    assert cache.get('k') == (None, None)
+    assert len(cache) == 0
+
+def test_least_recently_used_answer_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.put('a', 'model', 'A')
+    cache.put('b', 'model', 'B')
+    assert cache.get('a') == ('A', 'memory')
+    cache.put('c', 'model', 'C')
+    assert cache.get('b') == (None, None)
+    assert (cache.get('a'), cache.get('c')) == (('A', 'memory'), ('C', 'memory'))
+
+def test_persistent_tier_answers_after_memory_is_cleared(app):
+    cache = ResponseCache(persistent=True)
+    cache.put('k', 'model', 'answer')
+    # As after a restart, or in another worker
+    cache._entries.clear()
+    assert cache.get('k') == ('answer', 'persistent')
+    assert cache.get('k') == ('answer', 'memory')
+
+def test_identical_concurrent_prompts_share_one_upstream_call():
+    model = StubModel()
+    model.gate.clear()
+    bot = _bot(model)
+    threads, results = _ask_in_threads(bot, 5)
+    _wait_for(lambda: bot.metrics()['coalesced'] == 4)
+    model.gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert model.calls == 1
+    assert results == [model.answer] * 5
+    # The answer is cached for later prompts too
+    assert bot.ask("i have a cold?") == model.answer and model.calls == 1
+
+def test_upstream_error_reaches_every_waiting_prompt():
+    model = StubModel(error=RuntimeError("upstream down"))
+    model.gate.clear()
+    bot = _bot(model)
+    threads, results = _ask_in_threads(bot, 3)
+    _wait_for(lambda: bot.metrics()['coalesced'] == 2)
+    model.gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert model.calls == 1
+    assert [str(result) for result in results] == ["upstream down"] * 3
+    assert bot.metrics()['in_flight'] == 0
+
+def test_abandoned_stream_releases_its_waiters():
+    model = StubModel(answer="Rest well and drink fluids")
+    bot = _bot(model)
+    stream = bot.stream("I have a cold")
+    assert next(stream) == "Rest "
+    threads, results = _ask_in_threads(bot, 1)
+    _wait_for(lambda: bot.metrics()['coalesced'] == 1)
+    # The browser disconnects mid-answer
+    stream.close()
+    threads[0].join(5)
+    assert not threads[0].is_alive()
+    assert isinstance(results[0], RuntimeError)
+    assert bot.metrics()['in_flight'] == 0
+    # Nothing partial was cached, so the next prompt asks the model again
+    assert bot.ask("I have a cold") == model.answer and model.calls == 2
\ No newline at end of file
@@ -0,0 +1,46 @@
+import pytest
+from extensions import db, socketio
+from models import Notification
+from notifications import push_notifications
+from socket_events import handle_connect
+
+@pytest.fixture
+def connect(app):
+    """ Opens a Socket.IO connection with the given session, as a logged-in browser would. """
+    app.secret_key = 'test'
+    socketio.init_app(app, async_mode='threading')
+    socketio.on_event('connect', handle_connect)
+    clients = []
+
+    def connect(**session_values):
+        http = app.test_client()
+        with http.session_transaction() as session:
+            session.update(session_values)
+        client = socketio.test_client(app, flask_test_client=http)
+        clients.append(client)
+        return client
+    yield connect
+    for client in clients:
+        client.disconnect()
+
+def _notifications(client):
+    return [event['args'][0] for event in client.get_received() if event['name'] == 'notification']
+
+def test_notification_reaches_only_its_recipient(app, connect):
+    patient, other_patient, doctor = connect(user_id=1), connect(user_id=2), connect(doctor_id=1)
+    for_patient = Notification(recipient_user_id=1, message="Appointment approved")
+    for_doctor = Notification(recipient_doctor_id=1, message="New appointment request")
+    db.session.add_all([for_patient, for_doctor])
+    db.session.commit()
+    push_notifications(for_patient, for_doctor)
+    assert _notifications(patient) == [{'id': for_patient.id, 'message': "Appointment approved"}]
+    assert _notifications(doctor) == [{'id': for_doctor.id, 'message': "New appointment request"}]
+    assert _notifications(other_patient) == []
+
+def test_anonymous_socket_joins_no_recipient_room(app, connect):
+    anonymous = connect()
+    notification = Notification(recipient_user_id=1, message="Appointment approved")
+    db.session.add(notification)
+    db.session.commit()
+    push_notifications(notification)
+    assert _notifications(anonymous) == []
@@ -0,0 +1,10 @@
+from query_audit import explain, full_scans, hot_queries
+
+def test_hot_queries_use_indexes(app):
+    plans = {name: explain(query) for name, query in hot_queries().items()}
+    scans = {name: plan for name, plan in plans.items() if full_scans(plan)}
+    assert scans == {}
+
+def test_full_scans_flags_table_scans():
+    assert full_scans(['SCAN message', 'SEARCH message USING INDEX ix_message_conversation_id (conversation_id=?)']) == ['SCAN message']
+    assert full_scans(['SCAN anon_1', 'SCAN CONSTANT ROW']) == []
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+from extensions import db
+from models import OutboxEmail, Reminder, User
+from reminder_engine import dispatch_due_reminders, metrics
+
+def _reminder(user_id, minutes_ago=1):
+    reminder = Reminder(user_id=user_id, reminder_datetime=datetime.now() - timedelta(minutes=minutes_ago),
+                        custom_message="Drink water")
+    db.session.add(reminder)
+    return reminder
+
+def test_due_reminders_are_claimed_once_and_queued(app):
+    user = User(full_name="Asha Rao", email="asha@example.com")
+    db.session.add(user)
+    db.session.flush()
+    due, upcoming = _reminder(user.id), _reminder(user.id, minutes_ago=-30)
+    db.session.commit()
+    assert dispatch_due_reminders() == 1
+    assert dispatch_due_reminders() == 0
+    assert (due.is_sent, upcoming.is_sent) == (True, False)
+    assert [email.recipients for email in OutboxEmail.query] == ["asha@example.com"]
+    # Read back from the checkpoint row, as any worker serving the admin route would
+    stats = metrics()
+    assert (stats['sent'], stats['failed'], stats['due_soon']) == (1, 0, 0)
+    assert stats['max_lateness_seconds'] >= 60
+
+def test_reminder_without_a_user_is_marked_failed(app):
+    orphan = _reminder(user_id=999)
+    db.session.commit()
+    assert dispatch_due_reminders() == 0
+    db.session.refresh(orphan)
+    assert orphan.is_sent
+    assert orphan.failed_at is not None
+    assert OutboxEmail.query.count() == 0
+    assert metrics()['failed'] == 1
@@ -0,0 +1,34 @@
+import os
+from models import TempArtifact
+from temp_janitor import expire_call_artifacts, run_janitor, temp_folder, track_artifacts
+
+def _write(folder, name, size=10):
+    with open(os.path.join(folder, name), 'wb') as f:
+        f.write(b'x' * size)
+
+def test_ended_call_files_are_swept_after_the_grace(app, tmp_path):
+    app.root_path = str(tmp_path)
+    folder = temp_folder(app)
+    os.makedirs(folder)
+    _write(folder, 'call_7_page.webp')
+    _write(folder, 'call_8_page.webp')
+    track_artifacts(folder, ['call_7_page.webp'], call_id=7, ttl_seconds=-1)
+    track_artifacts(folder, ['call_8_page.webp'], call_id=8)
+    run_janitor(app)
+    assert os.listdir(folder) == ['call_8_page.webp']
+    expire_call_artifacts(8)
+    # Still inside the grace period for in-flight downloads
+    run_janitor(app)
+    assert os.listdir(folder) == ['call_8_page.webp']
+    assert [row.filename for row in TempArtifact.query] == ['call_8_page.webp']
+
+def test_quota_evicts_the_oldest_files_first(app, tmp_path):
+    app.root_path = str(tmp_path)
+    app.config['TEMP_UPLOAD_QUOTA_BYTES'] = 25
+    folder = temp_folder(app)
+    os.makedirs(folder)
+    for name in ('a', 'b', 'c'):
+        _write(folder, name)
+        track_artifacts(folder, [name])
+    run_janitor(app)
+    assert sorted(os.listdir(folder)) == ['b', 'c']
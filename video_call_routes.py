@@ -1,9 +1,7 @@
 from flask import Blueprint, render_template, session, redirect, url_for, request, flash, jsonify
 from models import db, Doctor, User, VideoCall
 from datetime import datetime, timedelta
-from flask_mail import Message
-from extensions import mail
-import os
+from mail_queue import enqueue_mail
 
 video_call = Blueprint('video_call', __name__)
 
@@ -32,28 +30,25 @@ def request_call(doctor_id):
             status='Pending'
         )
         db.session.add(new_call)
-        db.session.commit()
 
-        # --- Email Notifications ---
+        # --- Email Notifications (queued; the mail dispatcher sends them) ---
         user = User.query.get(user_id)
         doctor = Doctor.query.get(doctor_id)
-        sender_email = os.getenv('MAIL_USERNAME')
 
         # Mail to Doctor
-        msg_doc = Message('New Video Call Request', sender=sender_email, recipients=[doctor.email])
-        msg_doc.body = f"Hello Dr. {doctor.full_name},\n\nYou have received a new video call request from {user.full_name} for {scheduled_time.strftime('%B %d, %Y at %I:%M %p')}.\nPlease log in to your dashboard to approve or reject it."
-        
-        print("--- DEBUG: Attempting to send email to doctor ---")
-        mail.send(msg_doc)
-        print("--- DEBUG: Doctor email sent successfully ---")
+        enqueue_mail(
+            'New Video Call Request', [doctor.email],
+            f"Hello Dr. {doctor.full_name},\n\nYou have received a new video call request from {user.full_name} for {scheduled_time.strftime('%B %d, %Y at %I:%M %p')}.\nPlease log in to your dashboard to approve or reject it."
+        )
 
         # Mail to User
-        msg_user = Message('Your Video Call Request has been Sent', sender=sender_email, recipients=[user.email])
-        msg_user.body = f"Hello {user.full_name},\n\nYour video call request to Dr. {doctor.full_name} for {scheduled_time.strftime('%B %d, %Y at %I:%M %p')} has been sent. You will be notified once the doctor responds."
+        enqueue_mail(
+            'Your Video Call Request has been Sent', [user.email],
+            f"Hello {user.full_name},\n\nYour video call request to Dr. {doctor.full_name} for {scheduled_time.strftime('%B %d, %Y at %I:%M %p')} has been sent. You will be notified once the doctor responds."
+        )
 
-        print("--- DEBUG: Attempting to send email to user ---")
-        mail.send(msg_user)
-        print("--- DEBUG: User email sent successfully ---")
+        # The call and both emails are committed together
+        db.session.commit()
 
         return jsonify({'message': 'Call request sent successfully!'}), 201
 
@@ -62,6 +57,10 @@ def request_call(doctor_id):
         print(f"--- DEBUG: AN ERROR OCCURRED! Error: {e} ---")
         return jsonify({'error': str(e)}), 500
 
+def doctor_calls_query(doctor_id, status):
+    """ A doctor's calls in `status` with their patients, soonest first (also checked by `flask check-query-plans`). """
+    return db.session.query(VideoCall, User).join(User).filter(VideoCall.doctor_id == doctor_id, VideoCall.status == status).order_by(VideoCall.scheduled_time.asc())
+
 # Page for the DOCTOR to see their call requests
 # In video_call_routes.py
 
@@ -73,8 +72,8 @@ def view_call_requests():
     
     doctor_id = session['doctor_id']
     
-    pending_calls = db.session.query(VideoCall, User).join(User).filter(VideoCall.doctor_id == doctor_id, VideoCall.status == 'Pending').order_by(VideoCall.scheduled_time.asc()).all()
-    approved_calls = db.session.query(VideoCall, User).join(User).filter(VideoCall.doctor_id == doctor_id, VideoCall.status == 'Approved').order_by(VideoCall.scheduled_time.asc()).all()
+    pending_calls = doctor_calls_query(doctor_id, 'Pending').all()
+    approved_calls = doctor_calls_query(doctor_id, 'Approved').all()
 
     # --- FIX: Pass 'now' and 'timedelta' to the doctor's template ---
     return render_template('doctor_call_list.html', pending_calls=pending_calls, approved_calls=approved_calls, now=datetime.now(), timedelta=timedelta)
@@ -105,16 +104,15 @@ def update_call_status(call_id):
     action = request.form.get('action')
     if action in ['Approved', 'Rejected']:
         call.status = action
-        db.session.commit()
 
-        # --- Email Notification to User ---
+        # --- Email Notification to User (queued with the status change) ---
         user = User.query.get(call.user_id)
         doctor = Doctor.query.get(call.doctor_id)
-        sender_email = os.getenv('MAIL_USERNAME')
-        
-        msg = Message(f'Your Video Call Request has been {action}', sender=sender_email, recipients=[user.email])
-        msg.body = f"Hello {user.full_name},\n\nYour video call request with Dr. {doctor.full_name} for {call.scheduled_time.strftime('%B %d, %Y at %I:%M %p')} has been {action}."
-        mail.send(msg)
+        enqueue_mail(
+            f'Your Video Call Request has been {action}', [user.email],
+            f"Hello {user.full_name},\n\nYour video call request with Dr. {doctor.full_name} for {call.scheduled_time.strftime('%B %d, %Y at %I:%M %p')} has been {action}."
+        )
+        db.session.commit()
 
         flash(f'Call has been {action.lower()}.', 'success')
     return redirect(url_for('video_call.view_call_requests'))
\ No newline at end of file
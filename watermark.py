@@ -0,0 +1,149 @@
+""" Page rendering and watermarking for documents shared in calls.
+
+Runs inside the document worker processes, so it imports nothing from Flask or the app.
+"""
+import io
+import os
+import uuid
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+from pdf2image import convert_from_path
+
+# Pages are never rendered sharper than this, and never larger than MAX_PAGE_DIMENSION on the long side,
+# so a worker holds at most one bounded page in memory however large or long the document is.
+MAX_RENDER_DPI = 150
+MAX_PAGE_DIMENSION = 2400
+# Images bigger than this are refused before decoding (PNG and friends cannot decode at reduced size)
+MAX_SOURCE_PIXELS = 60_000_000
+
+# Watermark text colour and opacity (0-255)
+WATERMARK_COLOR = (50, 50, 50)
+WATERMARK_OPACITY = 140
+# Full-view pages are lossy WebP or JPEG; quality steps down until a page fits its byte budget
+OUTPUT_FORMATS = {'webp': ('WEBP', '.webp'), 'jpeg': ('JPEG', '.jpg')}
+DEFAULT_QUALITY = 80
+MIN_QUALITY = 40
+QUALITY_STEP = 10
+# ...and past that the page shrinks, but stays legible
+DOWNSCALE_STEP = 0.8
+MIN_PAGE_DIMENSION = 1000
+# Thumbnails are small progressive JPEGs the viewer shows while the full page loads
+THUMBNAIL_SIZE = 320
+THUMBNAIL_QUALITY = 60
+# Page masks are as large as the page; a handful covers every page size of the documents in flight
+PAGE_MASK_CACHE_SIZE = 4
+
+@lru_cache(maxsize=16)
+def _font(font_size):
+    try:
+        # Attempt to load a common bold font
+        return ImageFont.truetype("arialbd.ttf", font_size) # Arial Bold
+    except IOError:
+        return ImageFont.load_default() # Fallback
+
+@lru_cache(maxsize=32)
+def watermark_tile(text, font_size):
+    """ The text rendered once as an opacity mask and rotated 45 degrees. """
+    font = _font(font_size)
+    left, top, right, bottom = ImageDraw.Draw(Image.new('L', (1, 1))).textbbox((0, 0), text, font=font)
+    tile = Image.new('L', (right - left + 50, bottom - top + 50), 0)
+    ImageDraw.Draw(tile).text((-left, -top), text, font=font, fill=WATERMARK_OPACITY)
+    return tile.rotate(45, expand=1)
+
+@lru_cache(maxsize=PAGE_MASK_CACHE_SIZE)
+def watermark_mask(text, font_size, size):
+    """ Tiles the rotated text over a page of `size` in a staggered diagonal pattern. """
+    tile = watermark_tile(text, font_size)
+    tile_width, tile_height = tile.size
+    width, height = size
+    mask = Image.new('L', size, 0)
+    for row, y in enumerate(range(-tile_height // 2, height, tile_height)):
+        # Offset every other row by half a tile so the text forms a diagonal lattice
+        offset = -tile_width // 2 if row % 2 else 0
+        for x in range(offset, width, tile_width):
+            mask.paste(tile, (x, y))
+    return mask
+
+def apply_watermark(image, watermark_base_text):
+    """ Stamps the viewer/timestamp text diagonally across `image`, in place and in its own mode.
+
+    Only the text changes between uploads, so its tile and page mask are cached and every page
+    costs a single compositing pass of the watermark colour through the mask.
+    """
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    font_size = max(int(image.width / 15), 1) # Dynamic font size based on image width
+    color = WATERMARK_COLOR if image.mode == 'RGB' else WATERMARK_COLOR[0]
+    image.paste(color, (0, 0) + image.size, watermark_mask(watermark_base_text, font_size, image.size))
+    return image
+
+def render_dpi(page_size_pts, dpi=MAX_RENDER_DPI):
+    """ `dpi` capped so a page of `page_size_pts` (width, height in points) fits MAX_PAGE_DIMENSION. """
+    dpi = min(dpi, MAX_RENDER_DPI)
+    if page_size_pts:
+        dpi = min(dpi, MAX_PAGE_DIMENSION * 72 / max(page_size_pts))
+    return max(int(dpi), 1)
+
+def load_page(source_path, mimetype, page_number, dpi=MAX_RENDER_DPI):
+    """ Renders just one page of the upload (1-based); images have a single page. """
+    if mimetype == 'application/pdf':
+        page = convert_from_path(source_path, dpi=dpi, first_page=page_number, last_page=page_number, thread_count=1)[0]
+        # The DPI is picked from the first page; an oversized later page is still scaled to the cap
+        page.thumbnail((MAX_PAGE_DIMENSION, MAX_PAGE_DIMENSION))
+        return page
+    with Image.open(source_path) as image:
+        if image.width * image.height > MAX_SOURCE_PIXELS:
+            raise ValueError(f"image of {image.width}x{image.height} pixels is too large")
+        # JPEGs decode straight to the reduced size; other formats are scaled after loading
+        image.thumbnail((MAX_PAGE_DIMENSION, MAX_PAGE_DIMENSION))
+        image.load()
+        return image
+
+def encode_page(image, image_format='webp', quality=DEFAULT_QUALITY, max_bytes=None):
+    """ Encodes `image` lossily to fit `max_bytes`: the quality steps down to MIN_QUALITY first,
+    then the page is scaled down until it fits or reaches MIN_PAGE_DIMENSION.
+    """
+    pil_format = OUTPUT_FORMATS[image_format][0]
+    while True:
+        buffer = io.BytesIO()
+        image.save(buffer, pil_format, quality=quality, optimize=True)
+        if not max_bytes or buffer.tell() <= max_bytes:
+            return buffer.getvalue()
+        if quality > MIN_QUALITY:
+            quality = max(quality - QUALITY_STEP, MIN_QUALITY)
+        elif max(image.size) * DOWNSCALE_STEP >= MIN_PAGE_DIMENSION:
+            image = image.resize((int(image.width * DOWNSCALE_STEP), int(image.height * DOWNSCALE_STEP)), Image.LANCZOS)
+        else:
+            return buffer.getvalue()
+
+def _write(out_dir, filename, data):
+    with open(os.path.join(out_dir, filename), 'wb') as f:
+        f.write(data)
+
+def render_page(source_path, mimetype, page_number, watermark_base_text, out_dir, prefix, dpi=MAX_RENDER_DPI,
+                image_format='webp', quality=DEFAULT_QUALITY, max_bytes=None, thumbnail_size=THUMBNAIL_SIZE):
+    """ Renders, watermarks and writes one page to `out_dir` as a full view and a thumbnail.
+
+    Returns the two file names as {'filename': ..., 'thumbnail': ...}.
+    """
+    watermarked_image = apply_watermark(load_page(source_path, mimetype, page_number, dpi), watermark_base_text)
+    name = f"{prefix}_{uuid.uuid4().hex}"
+    filename = name + OUTPUT_FORMATS[image_format][1]
+    _write(out_dir, filename, encode_page(watermarked_image, image_format, quality, max_bytes))
+    # The thumbnail is cut from the watermarked page, so it carries the watermark too
+    watermarked_image.thumbnail((thumbnail_size, thumbnail_size))
+    thumbnail = f"{name}_thumb.jpg"
+    watermarked_image.save(os.path.join(out_dir, thumbnail), 'JPEG', quality=THUMBNAIL_QUALITY, progressive=True, optimize=True)
+    return {'filename': filename, 'thumbnail': thumbnail}
+
+if __name__ == '__main__':
+    # Document worker process: one JSON page request per stdin line, one JSON reply per stdout line
+    import json
+    import sys
+    for line in sys.stdin:
+        try:
+            reply = render_page(**json.loads(line))
+        except Exception as e:
+            reply = {'error': f"{type(e).__name__}: {e}"}
+        sys.stdout.write(json.dumps(reply) + '\n')
+        sys.stdout.flush()